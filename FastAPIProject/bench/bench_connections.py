@@ -0,0 +1,156 @@
+"""
+업스트림 연결 비용 벤치마크: 잡마다 새 연결(requests.post / 잡마다 새 OpenAI 클라이언트) vs 공유 연결 풀
+
+    python bench/bench_connections.py --jobs 20 --llm-calls 6 --tls
+
+로컬 대역 서버 하나가 Clova(/recognizer/upload), OpenAI·Claude(/v1/...), 업로드(/upload) 를 모두 흉내내고
+서버가 accept 한 TCP 연결 수를 센다. 한 "잡" = Clova 1회 + LLM N회 + Claude 1회 + 업로드 1회.
+--tls 면 openssl 로 만든 자체 서명 인증서로 HTTPS 를 띄워 TLS 핸드셰이크 비용까지 포함한다.
+(원격 업스트림에서는 RTT 가 더해지므로 차이가 더 커진다)
+"""
+import argparse, contextlib, io, json, os, ssl, subprocess, sys, tempfile, threading, time
+from http.server import ThreadingHTTPServer
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from stub_llm import LLMStub  # noqa: E402
+
+
+class CountingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connections = 0
+        self._count_lock = threading.Lock()
+
+    def get_request(self):
+        conn, addr = super().get_request()
+        with self._count_lock:
+            self.connections += 1
+        return conn, addr
+
+
+def make_handler(stub: LLMStub):
+    base = stub.handler()
+
+    class Handler(base):
+        # 헤더와 본문을 한 번에 내보낸다 (keep-alive 에서 Nagle + delayed ACK 로 생기는 지연 방지)
+        wbufsize = 64 * 1024
+
+        def do_POST(self):
+            if not self.path.endswith("/upload"):
+                return super().do_POST()
+            self.rfile.read(int(self.headers.get("Content-Length", "0")))
+            # Clova 업로드와 요약 업로드 모두 이 응답으로 충분
+            self._send(200, {"text": "벤치마크 전사", "segments": []})
+
+    return Handler
+
+
+def self_signed_cert(tmpdir: str) -> tuple[str, str]:
+    cert, key = os.path.join(tmpdir, "cert.pem"), os.path.join(tmpdir, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-keyout", key, "-out", cert, "-subj", "/CN=127.0.0.1",
+         "-addext", "subjectAltName=IP:127.0.0.1"],
+        check=True, capture_output=True,
+    )
+    return cert, key
+
+
+def run_job(main, mode: str, wav_path: str, llm_calls: int):
+    """잡 하나에서 나가는 업스트림 호출들. mode=fresh 는 기존 방식(매번 새 연결)"""
+    import requests
+    from openai import OpenAI
+
+    s = main.settings
+    cfg = main._clova_config()
+    media = ("bench.wav", [(wav_path, 0, os.path.getsize(wav_path))], "audio/wav")
+    if mode == "fresh":
+        filename, pieces, ctype = media
+        body = main.MultipartStream([("media", filename, ctype, pieces),
+                                     ("params", None, "application/json", [b"{}"])])
+        headers = {**cfg["headers"], "Content-Type": body.content_type, "Content-Length": str(len(body))}
+        requests.post(cfg["endpoint"], headers=headers, data=body, timeout=60).raise_for_status()
+        body.close()
+        oai = OpenAI(api_key=s.gms_key, base_url=s.gms_openai_base + "/v1")
+    else:
+        main._post_clova(cfg, media, timeout=60).raise_for_status()
+        oai = main._load_openai_clients()[0]
+
+    for i in range(llm_calls):
+        main._llm_text(oai, s.openai_summary_model, "bench", f"note {i}", 0.2, use_cache=False)
+
+    if mode == "fresh":
+        oai.close()
+        requests.post(f"{s.gms_anthropic_base}/v1/messages", json={"model": "bench", "messages": []},
+                      timeout=60).raise_for_status()
+        requests.post(s.summary_upload_url, data={"class_id": "bench"},
+                      files={"summary_md": ("summary.md", b"# bench")}, timeout=60).raise_for_status()
+    else:
+        assert main._claude_reduce(s.gms_anthropic_base, s.gms_key, "note", use_cache=False)
+        assert main.send_summary_to_api("bench", None, b"# bench")["ok"]
+
+
+def main_():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--jobs", type=int, default=20)
+    ap.add_argument("--llm-calls", type=int, default=6, help="잡 하나당 LLM 호출 수(clean/map)")
+    ap.add_argument("--tls", action="store_true", help="HTTPS(자체 서명)로 띄워 TLS 핸드셰이크 포함")
+    args = ap.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_conn_")
+    server = CountingServer(("127.0.0.1", 0), make_handler(LLMStub()))
+    scheme = "http"
+    if args.tls:
+        cert, key = self_signed_cert(tmpdir)
+        ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        ctx.load_cert_chain(cert, key)
+        server.socket = ctx.wrap_socket(server.socket, server_side=True)
+        os.environ["REQUESTS_CA_BUNDLE"] = os.environ["SSL_CERT_FILE"] = cert
+        scheme = "https"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"{scheme}://127.0.0.1:{server.server_address[1]}"
+
+    # main 을 import 하기 전에 모든 업스트림을 대역 서버로 돌린다
+    os.environ.update(
+        CLOVA_INVOKE_URL=f"{base}/external/v1/1/bench", CLOVA_SECRET_KEY="bench",
+        USE_GMS_OPENAI="true", GMS_KEY="bench", GMS_OPENAI_BASE=base,
+        USE_GMS_CLAUDE="true", GMS_ANTHROPIC_BASE=base,
+        SUMMARY_UPLOAD_URL=f"{base}/upload", MERGE_OUT_DIR=tmpdir,
+    )
+    import main
+
+    wav_path = os.path.join(tmpdir, "bench.wav")
+    with open(wav_path, "wb") as fw:
+        fw.write(main._wav_header(1, 2, 16000, 32000) + b"\0" * 32000)
+
+    results = {}
+    for mode in ("fresh", "pooled"):
+        with contextlib.redirect_stdout(io.StringIO()):  # main 의 진행 로그는 숨긴다
+            run_job(main, mode, wav_path, args.llm_calls)  # 워밍업 (import/첫 연결 제외)
+            before = server.connections
+            times = []
+            for _ in range(args.jobs):
+                t = time.perf_counter()
+                run_job(main, mode, wav_path, args.llm_calls)
+                times.append(time.perf_counter() - t)
+        times.sort()
+        results[mode] = {
+            "job_ms_mean": round(sum(times) / len(times) * 1000, 2),
+            "job_ms_p95": round(times[int(len(times) * 0.95) - 1] * 1000, 2),
+            "connections_per_job": round((server.connections - before) / args.jobs, 2),
+        }
+    main._close_clients()
+    server.shutdown()
+
+    saved = results["fresh"]["job_ms_mean"] - results["pooled"]["job_ms_mean"]
+    print(json.dumps({"scheme": scheme, "jobs": args.jobs, "llm_calls": args.llm_calls, **results,
+                      "setup_ms_saved_per_job": round(saved, 2)}, ensure_ascii=False, indent=1))
+
+
+if __name__ == "__main__":
+    main_()
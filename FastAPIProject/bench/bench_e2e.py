@@ -0,0 +1,301 @@
+"""
+오프라인 end-to-end 벤치마크: 합성 청크 + 로컬 대역 서버(Clova / OpenAI·Claude / 요약 업로드)로 merge_audio 부하 측정
+
+    python bench/bench_e2e.py --classes 1 2 4 8 --chunks 6 30 --seconds 10 --rate 16000 44100 --channels 1 2
+    python bench/bench_e2e.py --llm-latency 0.3 --rate-limit 0.05 --out after.json --compare before.json
+
+청크 구성(개수 × 길이 × 샘플레이트 × 채널)마다 동시 수업 수 1..N 으로 merge_audio 를 동시에 호출하고
+처리량(수업/분, 오디오 초/초), 전체 지연과 단계별(merge/vad/stt/clean/map/reduce/pdf/upload) p50/p95 를 잰다.
+결과는 --out JSON 으로 저장되고, --compare 로 이전 결과와 p95 를 비교한다.
+합성 오디오는 톤 구간과 무음 구간을 번갈아 넣어(--speech-ratio) VAD 압축도 실제처럼 돈다.
+"""
+import argparse, contextlib, io, itertools, json, os, shutil, subprocess, sys, tempfile, threading, time, wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from stub_clova import ClovaStub, DEFAULT_PAYLOAD, load_payload  # noqa: E402
+from stub_llm import LLMStub  # noqa: E402
+
+STAGE_ORDER = ("merge", "vad", "stt", "clean", "map", "reduce", "pdf", "upload", "cleanup")
+
+
+class UploadSink:
+    """SUMMARY_UPLOAD_URL 대역: 본문을 읽고 버린 뒤 latency 만큼 늦게 200 을 준다"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+
+    def handler(self):
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def read_body(self) -> int:
+                if self.headers.get("Transfer-Encoding", "").lower() != "chunked":
+                    return len(self.rfile.read(int(self.headers.get("Content-Length", "0"))))
+                n = 0  # SUMMARY_UPLOAD_EARLY=true 면 chunked 로 온다
+                while True:
+                    size = int(self.rfile.readline().split(b";")[0], 16)
+                    self.rfile.read(size + 2)
+                    if not size:
+                        return n
+                    n += size
+
+            def do_POST(self):
+                n = self.read_body()
+                with sink._lock:
+                    sink.requests += 1
+                    sink.bytes_received += n
+                time.sleep(sink.latency)
+                data = b'{"ok": true}'
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def serve(self) -> ThreadingHTTPServer:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), self.handler())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def make_chunk_set(d: str, n: int, seconds: int, rate: int, channels: int, speech_ratio: float, seed: int = 0):
+    """톤(발화 흉내) + 무음이 번갈아 나오는 16bit PCM 청크 n 개"""
+    os.makedirs(d, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    period = 4.0  # 초: period * speech_ratio 만큼 소리, 나머지 무음
+    t = np.arange(seconds * rate) / rate
+    for i in range(1, n + 1):
+        phase = (t + i * seconds) % period
+        voiced = phase < period * speech_ratio
+        tone = np.sin(2 * np.pi * (180 + 40 * rng.random()) * t) * 6000 + rng.standard_normal(t.size) * 300
+        x = np.where(voiced, tone, rng.standard_normal(t.size) * 15).astype("<i2")
+        if channels > 1:
+            x = np.repeat(x[:, None], channels, axis=1).reshape(-1)
+        with wave.open(os.path.join(d, f"chunk_{i}.wav"), "wb") as w:
+            w.setnchannels(channels)
+            w.setsampwidth(2)
+            w.setframerate(rate)
+            w.writeframes(x.tobytes())
+
+
+def link_chunks(src: str, dst: str):
+    os.makedirs(dst, exist_ok=True)
+    for fn in os.listdir(src):
+        os.link(os.path.join(src, fn), os.path.join(dst, fn))
+
+
+def pct(values: list, q: float) -> float | None:
+    """nearest-rank 백분위"""
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[max(0, min(len(values) - 1, int(round(q / 100 * len(values))) - 1))], 3)
+
+
+class StageClock:
+    """
+    progress 콜백으로 단계별 구간을 잰다. 단계는 다음 단계가 처음 보고될 때(또는 자기 마지막 보고) 끝난다.
+    clean/map 처럼 청크마다 겹쳐 도는 단계는 시작 보고 없이 done>0 으로 처음 나타나므로
+    앞 단계와 같은 시각에 시작한 것으로 본다 (map = clean 시작 ~ 마지막 map 완료).
+    """
+
+    def __init__(self):
+        self.first: dict[str, float] = {}
+        self.last: dict[str, float] = {}
+        self.overlapped: set[str] = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, stage: str, done=None, total=None):
+        now = time.perf_counter()
+        with self._lock:
+            if stage not in self.first:
+                self.first[stage] = now
+                if done:
+                    self.overlapped.add(stage)
+            self.last[stage] = now
+
+    def durations(self, finished: float) -> dict:
+        seen = sorted(self.first, key=self.first.get)
+        out = {}
+        for i, stage in enumerate(seen):
+            nxt = seen[i + 1] if i + 1 < len(seen) else None
+            start = self.first[seen[i - 1]] if stage in self.overlapped and i else self.first[stage]
+            end = max(self.last[stage], self.first[nxt] if nxt else finished)
+            out[stage] = end - start
+        return out
+
+
+def run_level(main, template: str, audio_dir: str, scenario: str, concurrency: int, rounds: int,
+              audio_sec: float) -> dict:
+    """동시 수업 concurrency 개를 rounds 번 돌려 처리량/지연/단계별 분포를 모은다"""
+    e2e, stages, failures = [], {}, {}
+    started = time.perf_counter()
+    for r in range(rounds):
+        runs = []
+        for i in range(concurrency):
+            class_id = f"{scenario}-c{concurrency}-r{r}-{i}"
+            link_chunks(template, os.path.join(audio_dir, class_id))
+            runs.append({"class_id": class_id, "clock": StageClock()})
+
+        def one(run):
+            t0 = time.perf_counter()
+            try:
+                res = main.run_stt_pipeline(run["class_id"], {"meeting_id": run["class_id"]}, progress=run["clock"])
+                run["status"] = res.get("status")
+                if not (res.get("upload_result") or {}).get("ok"):
+                    run["status"] = f"{run['status']}/upload_failed"
+            except Exception as e:
+                run["status"] = f"error:{getattr(e, 'detail', e)}"
+            run["finished"] = time.perf_counter()
+            run["took"] = run["finished"] - t0
+
+        threads = [threading.Thread(target=one, args=(run,)) for run in runs]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for run in runs:
+            e2e.append(run["took"])
+            if run["status"] != "summary_done":
+                failures[run["status"]] = failures.get(run["status"], 0) + 1
+            for stage, sec in run["clock"].durations(run["finished"]).items():
+                stages.setdefault(stage, []).append(sec)
+    wall = time.perf_counter() - started
+    done = concurrency * rounds
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "classes": done,
+        "wall_sec": round(wall, 3),
+        "throughput_classes_per_min": round(done / wall * 60, 2),
+        "audio_sec_per_sec": round(done * audio_sec / wall, 2),
+        "e2e_sec": {"p50": pct(e2e, 50), "p95": pct(e2e, 95), "max": round(max(e2e), 3)},
+        "stages_sec": {s: {"p50": pct(v, 50), "p95": pct(v, 95)}
+                       for s, v in sorted(stages.items(), key=lambda kv: STAGE_ORDER.index(kv[0])
+                                          if kv[0] in STAGE_ORDER else len(STAGE_ORDER))},
+        "failures": failures,
+    }
+
+
+def compare(prev: dict, cur: dict):
+    """같은 (scenario, concurrency) 끼리 e2e/단계별 p95 변화율을 출력"""
+    old = {(r["scenario"], r["concurrency"]): r for r in prev.get("runs", [])}
+    print(f"\n비교: {prev.get('version')} → {cur.get('version')} (p95, + 는 느려짐)")
+    for r in cur["runs"]:
+        o = old.get((r["scenario"], r["concurrency"]))
+        if not o:
+            continue
+        cols = [("e2e", o["e2e_sec"]["p95"], r["e2e_sec"]["p95"])]
+        cols += [(s, o["stages_sec"].get(s, {}).get("p95"), v["p95"]) for s, v in r["stages_sec"].items()]
+        diffs = [f"{name} {(b - a) / a * 100:+.0f}%" for name, a, b in cols if a and b is not None]
+        print(f"  {r['scenario']} x{r['concurrency']}: " + ", ".join(diffs))
+
+
+def git_version() -> str | None:
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main_():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--classes", type=int, nargs="+", default=[1, 2, 4], help="동시 수업 수 단계")
+    ap.add_argument("--rounds", type=int, default=2, help="단계마다 반복 횟수")
+    ap.add_argument("--chunks", type=int, nargs="+", default=[6], help="수업당 청크 수")
+    ap.add_argument("--seconds", type=int, nargs="+", default=[10], help="청크 길이(초)")
+    ap.add_argument("--rate", type=int, nargs="+", default=[16000], help="샘플레이트 (예: 16000 44100)")
+    ap.add_argument("--channels", type=int, nargs="+", default=[1], help="채널 수 (1=mono, 2=stereo)")
+    ap.add_argument("--speech-ratio", type=float, default=0.6, help="청크 중 소리가 있는 비율")
+    ap.add_argument("--clova-rtf", type=float, default=0.01, help="Clova 대역: 오디오 1초당 처리 시간")
+    ap.add_argument("--clova-latency", type=float, default=0.05)
+    ap.add_argument("--llm-latency", type=float, default=0.1)
+    ap.add_argument("--llm-per-kchar", type=float, default=0.0)
+    ap.add_argument("--rate-limit", type=float, default=0.0, help="LLM 대역이 429 를 돌려줄 확률")
+    ap.add_argument("--claude-latency", type=float, default=0.0)
+    ap.add_argument("--fail-claude", action="store_true")
+    ap.add_argument("--upload-latency", type=float, default=0.02)
+    ap.add_argument("--early-upload", action="store_true", help="SUMMARY_UPLOAD_EARLY=true (PDF 렌더와 업로드 겹치기)")
+    ap.add_argument("--out", default="bench_e2e.json", help="결과 JSON 경로")
+    ap.add_argument("--compare", default=None, help="이전 결과 JSON (p95 비교)")
+    ap.add_argument("--keep", action="store_true", help="임시 디렉토리를 지우지 않음")
+    args = ap.parse_args()
+
+    clova = ClovaStub(load_payload(DEFAULT_PAYLOAD), rtf=args.clova_rtf, latency=args.clova_latency)
+    llm = LLMStub(latency=args.llm_latency, per_kchar=args.llm_per_kchar, rate_limit=args.rate_limit,
+                  fail_claude=args.fail_claude, claude_latency=args.claude_latency)
+    sink = UploadSink(args.upload_latency)
+    servers = [clova.serve(), llm.serve(), sink.serve()]
+    clova_port, llm_port, sink_port = (s.server_address[1] for s in servers)
+    llm_base = f"http://127.0.0.1:{llm_port}"
+
+    tmp = tempfile.mkdtemp(prefix="bench_e2e_")
+    audio_dir, out_dir = os.path.join(tmp, "audio"), os.path.join(tmp, "out")
+    os.makedirs(audio_dir)
+    os.makedirs(out_dir)
+    # main 을 import 하기 전에 모든 업스트림/작업 디렉토리를 대역으로 돌린다
+    os.environ.update(
+        AUDIO_BASE_DIR=audio_dir, MERGE_OUT_DIR=out_dir, LLM_CACHE_DIR=os.path.join(tmp, "llm_cache"),
+        LLM_CACHE_BYPASS="true",
+        CLOVA_INVOKE_URL=f"http://127.0.0.1:{clova_port}/external/v1/1/bench", CLOVA_SECRET_KEY="bench",
+        USE_GMS_OPENAI="true", GMS_KEY="bench", GMS_OPENAI_BASE=llm_base,
+        USE_GMS_CLAUDE="true", GMS_ANTHROPIC_BASE=llm_base,
+        SUMMARY_UPLOAD_URL=f"http://127.0.0.1:{sink_port}/upload",
+        SUMMARY_UPLOAD_EARLY=str(args.early_upload).lower(),
+    )
+    import main
+
+    result = {"version": git_version(), "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "config": vars(args), "runs": []}
+    for n, seconds, rate, channels in itertools.product(args.chunks, args.seconds, args.rate, args.channels):
+        scenario = f"{n}x{seconds}s-{rate // 1000}k-{'stereo' if channels > 1 else 'mono'}"
+        template = os.path.join(tmp, "templates", scenario)
+        make_chunk_set(template, n, seconds, rate, channels, args.speech_ratio)
+        if not result["runs"]:
+            # 워밍업: 연결 풀, PDF 렌더 프로세스 기동 등 첫 잡에만 드는 비용은 결과에서 뺀다
+            with contextlib.redirect_stdout(io.StringIO()):
+                run_level(main, template, audio_dir, "warmup", 1, 1, n * seconds)
+        for c in args.classes:
+            print(f"▶ {scenario} x{c}", file=sys.stderr)
+            with contextlib.redirect_stdout(io.StringIO()):  # main 의 진행 로그는 숨긴다
+                row = run_level(main, template, audio_dir, scenario, c, args.rounds, n * seconds)
+            result["runs"].append(row)
+            print(f"  {row['throughput_classes_per_min']} classes/min, e2e p50 {row['e2e_sec']['p50']}s "
+                  f"p95 {row['e2e_sec']['p95']}s, failures {row['failures'] or 0}", file=sys.stderr)
+    result["upstreams"] = {
+        "clova_requests": clova.requests, "clova_bytes": clova.bytes_received,
+        "llm_calls": llm.calls, "llm_429": llm.rate_limited, "llm_max_in_flight": llm.max_in_flight,
+        "upload_requests": sink.requests, "upload_bytes": sink.bytes_received,
+    }
+
+    main._close_clients()
+    for s in servers:
+        s.shutdown()
+    if not args.keep:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    with open(args.out, "w", encoding="utf-8") as fw:
+        json.dump(result, fw, ensure_ascii=False, indent=1)
+    print(json.dumps(result, ensure_ascii=False, indent=1))
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(json.load(f), result)
+
+
+if __name__ == "__main__":
+    main_()
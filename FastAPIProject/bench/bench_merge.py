@@ -0,0 +1,100 @@
+"""
+WAV 병합 벤치마크: 기존 wave.readframes/writeframes 루프 vs merge_wav_files(커널 복사)
+
+    python bench/bench_merge.py --chunks 300 --seconds 10 --rate 44100
+
+임시 디렉토리에 청크를 만들고 두 구현을 번갈아 실행해 최솟값/중앙값을 출력한다.
+"""
+import argparse, os, sys, tempfile, time, wave, statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import main  # noqa: E402
+
+
+def legacy_merge(input_files, out_path):
+    """baseline 의 merge_wav_files (파일별 헤더 로그 + _is_riff + wave 블록 복사)"""
+    for p in input_files:
+        os.path.getsize(p)
+        with open(p, "rb") as f:
+            f.read(12)
+    with wave.open(input_files[0], "rb") as w0:
+        params = (w0.getnchannels(), w0.getsampwidth(), w0.getframerate(), w0.getcomptype())
+        compname = w0.getcompname()
+    with wave.open(out_path, "wb") as out:
+        out.setnchannels(params[0])
+        out.setsampwidth(params[1])
+        out.setframerate(params[2])
+        out.setcomptype(params[3], compname)
+        for fpath in input_files:
+            with open(fpath, "rb") as f:
+                assert f.read(4) == b"RIFF"
+            with wave.open(fpath, "rb") as w:
+                assert (w.getnchannels(), w.getsampwidth(), w.getframerate(), w.getcomptype()) == params
+                remaining = w.getnframes()
+                while remaining > 0:
+                    chunk = min(remaining, 64 * 1024)
+                    out.writeframes(w.readframes(chunk))
+                    remaining -= chunk
+    return out_path
+
+
+def make_chunks(d, n, seconds, rate, channels):
+    frame = os.urandom(rate * channels * 2)  # 1초 분량 노이즈
+    files = []
+    for i in range(1, n + 1):
+        p = os.path.join(d, f"chunk_{i}.wav")
+        with wave.open(p, "wb") as w:
+            w.setnchannels(channels)
+            w.setsampwidth(2)
+            w.setframerate(rate)
+            for _ in range(seconds):
+                w.writeframes(frame)
+        files.append(p)
+    return files
+
+
+def timeit(fn, files, out_path, repeat):
+    took = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(files, out_path)
+        took.append(time.perf_counter() - t0)
+        os.remove(out_path)
+    return took
+
+
+def main_():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chunks", type=int, default=300)
+    ap.add_argument("--seconds", type=int, default=10)
+    ap.add_argument("--rate", type=int, default=44100)
+    ap.add_argument("--channels", type=int, default=1)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--dir", default=None, help="청크를 만들 디렉토리 (기본: 임시 디렉토리)")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as d:
+        files = make_chunks(d, args.chunks, args.seconds, args.rate, args.channels)
+        total = sum(os.path.getsize(p) for p in files)
+        print(f"{args.chunks} chunks x {args.seconds}s @ {args.rate}Hz ch={args.channels} "
+              f"→ {total / 1e6:.1f} MB")
+
+        out_path = os.path.join(d, "Merge__bench.wav")
+        # 결과 동일성 확인
+        legacy_merge(files, out_path)
+        with open(out_path, "rb") as f:
+            ref = f.read()
+        main.merge_wav_files(files, out_path)
+        with open(out_path, "rb") as f:
+            assert f.read() == ref, "병합 결과가 baseline 과 다릅니다"
+        os.remove(out_path)
+
+        for name, fn in (("wave loop", legacy_merge), ("byte-range copy", main.merge_wav_files)):
+            took = timeit(fn, files, out_path, args.repeat)
+            print(f"{name:>16}: min {min(took) * 1000:8.1f} ms  median {statistics.median(took) * 1000:8.1f} ms"
+                  f"  ({total / min(took) / 1e6:.0f} MB/s)")
+        print(f"copy mode: {main._copy_mode[0]}")
+
+
+if __name__ == "__main__":
+    main_()
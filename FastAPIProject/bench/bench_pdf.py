@@ -0,0 +1,123 @@
+"""
+요약 PDF 렌더링 벤치마크: 기존 방식(매번 폰트 탐색 + add_font 3회) vs 폰트 캐시 vs 폰트 캐시 + 렌더 프로세스
+
+    python bench/bench_pdf.py --pages 1 5 20 --repeat 5
+    python bench/bench_pdf.py --font /path/to/NotoSansKR-Regular.ttf
+
+--font 를 안 주면 main.pick_local_font() 가 찾은 폰트를 쓴다(PDF_FONT_PATH → fonts/ → ../backend/fonts).
+한글 글리프가 없는 폰트로 돌리면 --latin 으로 영문 본문을 만든다.
+"""
+import argparse, contextlib, io, json, os, sys, tempfile, time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+KO_LINE = "오늘 회의에서는 다음 분기 일정과 담당자 배정, 배포 전 점검 항목을 논의했습니다."
+EN_LINE = "Today we discussed the next quarter schedule, owner assignments and the pre-release checklist."
+
+
+def make_markdown(pages: int, latin: bool) -> str:
+    """A4 한 페이지에 대략 맞는 분량(제목 + 글머리 + 본문 + 코드)을 pages 번 반복"""
+    line = EN_LINE if latin else KO_LINE
+    out = ["# 회의 요약" if not latin else "# Meeting summary"]
+    for p in range(pages):
+        out.append(f"## {p + 1}")
+        out += [f"- {line}" for _ in range(8)]
+        out += [line * 2 for _ in range(12)]
+        out += ["```", "make deploy --env=prod", "```", ""]
+    return "\n".join(out)
+
+
+def render_legacy(main, md_text: str, pdf_path: str):
+    """폰트 캐시 전의 markdown_to_pdf: 렌더마다 폰트를 찾고 같은 TTF 를 세 번 등록"""
+    from fpdf import FPDF
+    pdf = FPDF(format="A4", unit="mm")
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+    font_path = main.pick_local_font()
+    for family in ("KR", "KR-B", "KR-Mono"):
+        pdf.add_font(family, "", font_path, uni=True)
+        pdf.fonts[family.lower()]["ttffile"] = font_path  # 커밋된 .pkl 의 경로 보정(측정 대상 아님)
+    base, bold, mono = "KR", "KR-B", "KR-Mono"
+    pdf.set_font(base, size=12)
+    in_code = False
+    for line in md_text.splitlines():
+        if line.strip().startswith("```"):
+            in_code = not in_code
+            pdf.set_font(mono if in_code else base, size=10 if in_code else 12)
+            continue
+        if in_code:
+            pdf.multi_cell(0, 6, txt=line); continue
+        for prefix, size, h in (("### ", 12, 7), ("## ", 14, 8), ("# ", 16, 9)):
+            if line.startswith(prefix):
+                pdf.set_font(bold, size=size); pdf.multi_cell(0, h, line[len(prefix):].strip())
+                pdf.set_font(base, size=12); pdf.ln(1)
+                break
+        else:
+            if line.strip().startswith("- "):
+                pdf.multi_cell(0, 6, "• " + line.strip()[2:])
+            elif not line.strip():
+                pdf.ln(1)
+            else:
+                pdf.multi_cell(0, 6, line)
+    pdf.output(pdf_path)
+
+
+def count_pages(path: str) -> int:
+    with open(path, "rb") as f:
+        data = f.read()
+    return max(1, data.count(b"/Type /Page") - data.count(b"/Type /Pages"))
+
+
+def main_():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, nargs="+", default=[1, 5, 20])
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--font", default=None, help="TTF 경로 (기본: main.pick_local_font())")
+    ap.add_argument("--latin", action="store_true", help="영문 본문 (한글 글리프 없는 폰트용)")
+    args = ap.parse_args()
+
+    if args.font:
+        os.environ["PDF_FONT_PATH"] = args.font
+    import main
+
+    font = main.pick_local_font()
+    if not font:
+        sys.exit("폰트를 찾지 못했습니다: --font 로 TTF 경로를 지정하세요")
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_pdf_")
+    def to_file(render):
+        def run(md, path):
+            with open(path, "wb") as fw:  # legacy 도 pdf.output(path) 로 파일까지 쓴다
+                fw.write(render(md))
+        return run
+
+    modes = {
+        "legacy": lambda md, p: render_legacy(main, md, p),
+        "cached": to_file(main.markdown_to_pdf),
+        "cached_process": to_file(main.render_summary_pdf),
+    }
+    results = {"font": font, "repeat": args.repeat, "runs": []}
+    with contextlib.redirect_stdout(io.StringIO()):  # main 의 진행 로그는 숨긴다
+        main.render_summary_pdf("warmup")  # 렌더 프로세스 기동 제외
+    for n in args.pages:
+        md = make_markdown(n, args.latin)
+        row = {"pages_requested": n}
+        for mode, render in modes.items():
+            path = os.path.join(tmpdir, f"{mode}_{n}.pdf")
+            times = []
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(args.repeat):
+                    t = time.perf_counter()
+                    render(md, path)
+                    times.append(time.perf_counter() - t)
+            pages = count_pages(path)
+            row["pages"] = pages
+            row[f"{mode}_ms"] = round(min(times) * 1000, 1)
+            row[f"{mode}_ms_per_page"] = round(min(times) * 1000 / pages, 2)
+        results["runs"].append(row)
+    print(json.dumps(results, ensure_ascii=False, indent=1))
+
+
+if __name__ == "__main__":
+    main_()
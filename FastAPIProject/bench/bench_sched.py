@@ -0,0 +1,113 @@
+"""
+잡 스케줄러 벤치마크: 수업이 동시에 끝나 잡이 한꺼번에 몰릴 때 fifo vs sjf(aging) 의 완료 지연 비교
+
+    python bench/bench_sched.py --lengths 600 30 300 20 450 60 120 30 --workers 1
+    python bench/bench_sched.py --policies fifo sjf --aging 4 --priority 3=2
+
+--lengths 의 녹음(초)마다 합성 청크를 만들어 같은 순간에 submit_stt_job 으로 넣고,
+잡별 완료 지연(finished_at - created_at)의 p50/평균/p95/최대를 정책별로 잰다.
+업스트림은 bench_e2e 와 같은 로컬 대역이다 (Clova 처리시간 ∝ 오디오 길이 --clova-rtf).
+"""
+import argparse, contextlib, io, json, os, shutil, sys, tempfile, time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_e2e import UploadSink, link_chunks, make_chunk_set, pct  # noqa: E402
+from stub_clova import ClovaStub, DEFAULT_PAYLOAD, load_payload  # noqa: E402
+from stub_llm import LLMStub  # noqa: E402
+
+CHUNK_SEC = 10
+
+
+def run_burst(main, policy: str, templates: dict, audio_dir: str, lengths: list, priorities: dict) -> dict:
+    os.environ["STT_SCHEDULER"] = policy
+    jobs = []
+    for i, sec in enumerate(lengths):
+        class_id = f"{policy}-{i}"
+        link_chunks(templates[sec], os.path.join(audio_dir, class_id))
+        jobs.append((i, sec, class_id))
+    submitted = [main.submit_stt_job(class_id, {"meeting_id": class_id, "priority": priorities.get(i, 0)})
+                 for i, _, class_id in jobs]
+    while any(j["status"] in ("queued", "running") for j in submitted):
+        time.sleep(0.05)
+    latency = [j["finished_at"] - j["created_at"] for j in submitted]
+    order = sorted(range(len(submitted)), key=lambda k: submitted[k]["finished_at"])
+    return {
+        "policy": policy,
+        "latency_sec": {"p50": pct(latency, 50), "mean": round(sum(latency) / len(latency), 3),
+                        "p95": pct(latency, 95), "max": round(max(latency), 3)},
+        "by_job": [{"audio_sec": sec, "priority": priorities.get(i, 0),
+                    "estimated_audio_sec": submitted[i]["estimated_audio_sec"],
+                    "latency_sec": round(latency[i], 3), "status": submitted[i]["status"]}
+                   for i, sec, _ in jobs],
+        "completion_order": [lengths[k] for k in order],
+        "makespan_sec": round(max(j["finished_at"] for j in submitted) - min(j["created_at"] for j in submitted), 3),
+    }
+
+
+def main_():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--lengths", type=int, nargs="+", default=[600, 30, 300, 20, 450, 60, 120, 30],
+                    help="잡별 녹음 길이(초), 이 순서로 동시에 제출")
+    ap.add_argument("--workers", type=int, default=1, help="STT_WORKERS")
+    ap.add_argument("--policies", nargs="+", default=["fifo", "sjf"])
+    ap.add_argument("--aging", type=float, default=None, help="STT_SCHED_AGING")
+    ap.add_argument("--priority", nargs="*", default=[], metavar="IDX=P", help="잡 번호별 priority (예: 3=2)")
+    ap.add_argument("--clova-rtf", type=float, default=0.01)
+    ap.add_argument("--llm-latency", type=float, default=0.05)
+    ap.add_argument("--out", default=None, help="결과 JSON 경로")
+    args = ap.parse_args()
+    priorities = {int(k): int(v) for k, v in (p.split("=") for p in args.priority)}
+
+    clova = ClovaStub(load_payload(DEFAULT_PAYLOAD), rtf=args.clova_rtf)
+    llm = LLMStub(latency=args.llm_latency)
+    sink = UploadSink()
+    servers = [clova.serve(), llm.serve(), sink.serve()]
+    clova_port, llm_port, sink_port = (s.server_address[1] for s in servers)
+    llm_base = f"http://127.0.0.1:{llm_port}"
+
+    tmp = tempfile.mkdtemp(prefix="bench_sched_")
+    audio_dir, out_dir = os.path.join(tmp, "audio"), os.path.join(tmp, "out")
+    os.makedirs(audio_dir)
+    os.makedirs(out_dir)
+    os.environ.update(
+        AUDIO_BASE_DIR=audio_dir, MERGE_OUT_DIR=out_dir, LLM_CACHE_DIR=os.path.join(tmp, "llm_cache"),
+        LLM_CACHE_BYPASS="true", STT_WORKERS=str(args.workers),
+        CLOVA_INVOKE_URL=f"http://127.0.0.1:{clova_port}/external/v1/1/bench", CLOVA_SECRET_KEY="bench",
+        USE_GMS_OPENAI="true", GMS_KEY="bench", GMS_OPENAI_BASE=llm_base,
+        USE_GMS_CLAUDE="true", GMS_ANTHROPIC_BASE=llm_base,
+        SUMMARY_UPLOAD_URL=f"http://127.0.0.1:{sink_port}/upload",
+    )
+    if args.aging is not None:
+        os.environ["STT_SCHED_AGING"] = str(args.aging)
+    import main
+
+    templates = {}
+    for sec in sorted(set(args.lengths)):
+        templates[sec] = os.path.join(tmp, "templates", str(sec))
+        make_chunk_set(templates[sec], max(1, sec // CHUNK_SEC), CHUNK_SEC, 16000, 1, 0.6)
+
+    results = {"lengths": args.lengths, "workers": args.workers, "priorities": priorities, "runs": []}
+    with contextlib.redirect_stdout(io.StringIO()):  # main 의 진행 로그는 숨긴다
+        run_burst(main, "warmup", templates, audio_dir, [min(args.lengths)], {})  # 연결/렌더 프로세스 기동 제외
+        for policy in args.policies:
+            results["runs"].append(run_burst(main, policy, templates, audio_dir, args.lengths, priorities))
+    main._close_clients()
+    for s in servers:
+        s.shutdown()
+    shutil.rmtree(tmp, ignore_errors=True)
+
+    for r in results["runs"]:
+        lat = r["latency_sec"]
+        print(f"{r['policy']:>6}: p50 {lat['p50']}s  mean {lat['mean']}s  p95 {lat['p95']}s  max {lat['max']}s  "
+              f"(makespan {r['makespan_sec']}s, 완료 순서 {r['completion_order']})", file=sys.stderr)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fw:
+            json.dump(results, fw, ensure_ascii=False, indent=1)
+    print(json.dumps(results, ensure_ascii=False, indent=1))
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,104 @@
+"""
+STT 업로드 메모리 벤치마크: requests files=(본문 전체를 메모리에 구성) vs MultipartStream(디스크 스트리밍)
+
+    python bench/bench_upload_memory.py --mb 100 --concurrency 1 4 16
+
+로컬 싱크 서버(본문을 읽고 버림)를 띄우고, 모드/동시성 조합마다 별도 프로세스에서
+N 개 스레드가 같은 WAV 를 동시에 업로드한 뒤 그 프로세스의 최대 RSS 를 측정한다.
+"""
+import argparse, json, os, resource, subprocess, sys, tempfile, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+
+class SinkHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        remaining = int(self.headers.get("Content-Length", "0"))
+        while remaining > 0:
+            buf = self.rfile.read(min(remaining, 1024 * 1024))
+            if not buf:
+                break
+            remaining -= len(buf)
+        data = b'{"text": "", "segments": []}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def worker(mode: str, n: int, url: str, path: str):
+    """자식 프로세스: n 개 동시 업로드 후 최대 RSS(MB) 를 JSON 으로 출력"""
+    import requests
+    import main
+
+    cfg = {"endpoint": url, "headers": {"X-CLOVASPEECH-API-KEY": "bench"}}
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    def upload():
+        if mode == "files":
+            with open(path, "rb") as f:
+                files = {
+                    "media": f,
+                    "params": (None, json.dumps(main.CLOVA_REQUEST_BODY).encode("UTF-8"), "application/json"),
+                }
+                r = requests.post(url, headers=cfg["headers"], files=files, timeout=600)
+        else:
+            r = main._post_clova(cfg, ("bench.wav", [(path, 0, os.path.getsize(path))], "audio/wav"))
+        r.raise_for_status()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=upload) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(json.dumps({
+        "base_rss_mb": round(base_rss, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "took": round(time.perf_counter() - started, 2),
+    }))
+
+
+def main_():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mb", type=int, default=100, help="업로드할 WAV 크기(MB)")
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    ap.add_argument("--worker", nargs=4, metavar=("MODE", "N", "URL", "PATH"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        mode, n, url, path = args.worker
+        return worker(mode, int(n), url, path)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SinkHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/recognizer/upload"
+
+    with tempfile.NamedTemporaryFile(suffix=".wav") as tmp:
+        block = os.urandom(1024 * 1024)
+        for _ in range(args.mb):
+            tmp.write(block)
+        tmp.flush()
+
+        print(f"WAV {args.mb} MB")
+        print(f"{'mode':>8} {'N':>4} {'base RSS':>10} {'peak RSS':>10} {'delta':>10} {'took':>8}")
+        for mode in ("files", "stream"):
+            for n in args.concurrency:
+                out = subprocess.run(
+                    [sys.executable, __file__, "--worker", mode, str(n), url, tmp.name],
+                    capture_output=True, text=True, check=True,
+                ).stdout.strip().splitlines()[-1]
+                r = json.loads(out)
+                print(f"{mode:>8} {n:>4} {r['base_rss_mb']:>8.1f}MB {r['peak_rss_mb']:>8.1f}MB "
+                      f"{r['peak_rss_mb'] - r['base_rss_mb']:>8.1f}MB {r['took']:>7.2f}s")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main_()
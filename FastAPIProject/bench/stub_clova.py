@@ -0,0 +1,130 @@
+"""
+로컬 CLOVA Speech 대역 서버: stt_response_debug.txt 형식의 응답을 재생한다.
+
+    python bench/stub_clova.py --port 18081 --payload 202/stt_response_debug.txt --rtf 0.02
+    CLOVA_INVOKE_URL=http://127.0.0.1:18081/external/v1/1/stub CLOVA_SECRET_KEY=x uvicorn main:app
+
+받은 media WAV 길이에 맞춰 payload 의 segments 를 반복 배치해 돌려준다.
+--rtf(처리시간/오디오길이), --latency, --fail-rate 로 지연과 실패를 흉내낸다.
+"""
+import argparse, json, os, random, struct, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PAYLOAD = os.path.join(os.path.dirname(HERE), "202", "stt_response_debug.txt")
+
+
+def load_payload(path: str) -> dict:
+    """stt_response_debug.txt 는 'HTTP 200' 등 헤더 몇 줄 뒤에 JSON 이 온다"""
+    with open(path, "r", encoding="utf-8") as f:
+        raw = f.read()
+    return json.loads(raw[raw.index("{"):])
+
+
+def wav_duration_ms(body: bytes) -> int:
+    i = body.find(b"RIFF")
+    if i < 0:
+        return 0
+    pos, rate, block = i + 12, 0, 0
+    while pos + 8 <= len(body):
+        ck_id, ck_size = struct.unpack_from("<4sI", body, pos)
+        if ck_id == b"fmt ":
+            _, ch, rate, _, block, _ = struct.unpack_from("<HHIIHH", body, pos + 8)
+        elif ck_id == b"data":
+            size = min(ck_size, len(body) - pos - 8)
+            return int(size / (rate * block) * 1000) if rate and block else 0
+        pos += 8 + ck_size + (ck_size & 1)
+    return 0
+
+
+def replay(payload: dict, duration_ms: int) -> dict:
+    """payload segments 를 duration_ms 만큼 반복 배치"""
+    src = payload.get("segments") or []
+    span = max((s["end"] for s in src), default=0)
+    segments = []
+    if span > 0:
+        offset = 0
+        while offset < duration_ms:
+            for s in src:
+                if offset + s["start"] >= duration_ms:
+                    break
+                seg = dict(s)
+                seg["start"] = offset + s["start"]
+                seg["end"] = min(duration_ms, offset + s["end"])
+                segments.append(seg)
+            offset += span
+    out = dict(payload)
+    out["segments"] = segments
+    out["text"] = " ".join(s["text"] for s in segments)
+    return out
+
+
+class ClovaStub:
+    def __init__(self, payload: dict, rtf: float = 0.0, latency: float = 0.0, fail_rate: float = 0.0):
+        self.payload, self.rtf, self.latency, self.fail_rate = payload, rtf, latency, fail_rate
+        self.requests = 0
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                if not self.path.endswith("/recognizer/upload"):
+                    return self._send(404, {"message": "not found"})
+                if not self.headers.get("X-CLOVASPEECH-API-KEY"):
+                    return self._send(401, {"message": "no key"})
+                if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+                    body = b""
+                    while True:
+                        n = int(self.rfile.readline().strip(), 16)
+                        if n == 0:
+                            self.rfile.readline()
+                            break
+                        body += self.rfile.read(n)
+                        self.rfile.readline()
+                else:
+                    body = self.rfile.read(int(self.headers.get("Content-Length", "0")))
+                with stub._lock:
+                    stub.requests += 1
+                    stub.bytes_received += len(body)
+                duration_ms = wav_duration_ms(body)
+                time.sleep(stub.latency + stub.rtf * duration_ms / 1000)
+                if random.random() < stub.fail_rate:
+                    return self._send(500, {"message": "injected failure"})
+                self._send(200, replay(stub.payload, duration_ms))
+
+            def _send(self, status, obj):
+                data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json;charset=UTF-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def serve(self, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+        """백그라운드 스레드로 띄우고 서버 객체를 돌려준다 (port=0 이면 임의 포트)"""
+        server = ThreadingHTTPServer((host, port), self.handler())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=18081)
+    ap.add_argument("--payload", default=DEFAULT_PAYLOAD)
+    ap.add_argument("--rtf", type=float, default=0.0, help="오디오 1초당 처리 시간(초)")
+    ap.add_argument("--latency", type=float, default=0.0)
+    ap.add_argument("--fail-rate", type=float, default=0.0)
+    args = ap.parse_args()
+    stub = ClovaStub(load_payload(args.payload), args.rtf, args.latency, args.fail_rate)
+    server = ThreadingHTTPServer((args.host, args.port), stub.handler())
+    print(f"CLOVA stub: http://{args.host}:{args.port}/external/v1/1/stub/recognizer/upload")
+    server.serve_forever()
@@ -0,0 +1,172 @@
+"""
+로컬 LLM 대역 서버: OpenAI 호환(/v1/responses, /v1/chat/completions)과 Anthropic(/v1/messages)
+
+    python bench/stub_llm.py --port 18082 --latency 0.5 --rate-limit 0.1
+    USE_GMS_OPENAI=true GMS_KEY=x GMS_OPENAI_BASE=http://127.0.0.1:18082 \\
+    USE_GMS_CLAUDE=true GMS_ANTHROPIC_BASE=http://127.0.0.1:18082 uvicorn main:app
+
+응답은 입력 앞부분을 잘라 만든 짧은 마크다운이다. --latency(고정) + --per-kchar(입력 1000자당)
+지연, --rate-limit 확률로 429(Retry-After 포함), --no-responses 로 Responses API 미지원을 흉내낸다.
+--fail-claude / --claude-latency 로 Claude(/v1/messages) 만 실패시키거나 느리게 만든다.
+요청에 "stream": true 가 있으면 8글자씩 SSE 로 나눠 보낸다(--stream-delay 간격).
+"""
+import argparse, json, random, threading, time, uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class LLMStub:
+    def __init__(self, latency: float = 0.0, per_kchar: float = 0.0, rate_limit: float = 0.0,
+                 retry_after: float = 0.2, responses_api: bool = True, fail_claude: bool = False,
+                 claude_latency: float = 0.0, stream_delay: float = 0.02):
+        self.latency, self.per_kchar, self.claude_latency = latency, per_kchar, claude_latency
+        self.stream_delay = stream_delay
+        self.rate_limit, self.retry_after = rate_limit, retry_after
+        self.responses_api, self.fail_claude = responses_api, fail_claude
+        self.calls: dict[str, int] = {}
+        self.rate_limited = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def reply_for(text: str) -> str:
+        body = " ".join(text.split())[-120:]
+        return f"# 요약\n\n- {body}\n"
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", "0"))) or b"{}")
+                route = self.path.rstrip("/").rsplit("/v1/", 1)[-1]
+                with stub._lock:
+                    stub.calls[route] = stub.calls.get(route, 0) + 1
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                try:
+                    self._handle(route, body)
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+            def _handle(self, route, body):
+                prompt = json.dumps(body, ensure_ascii=False)
+                time.sleep(stub.latency + stub.per_kchar * len(prompt) / 1000)
+                if random.random() < stub.rate_limit:
+                    with stub._lock:
+                        stub.rate_limited += 1
+                    return self._send(429, {"error": {"message": "rate limited", "type": "rate_limit"}},
+                                      {"retry-after": str(stub.retry_after)})
+                text = stub.reply_for(prompt)
+                if route == "responses" and not stub.responses_api:
+                    return self._send(404, {"error": {"message": "Not Found"}})
+                if route == "messages":
+                    time.sleep(stub.claude_latency)
+                    if stub.fail_claude:
+                        return self._send(529, {"type": "error", "error": {"type": "overloaded_error"}})
+                if body.get("stream") and route in ("responses", "chat/completions", "messages"):
+                    return self._stream(route, body, text)
+                if route == "responses":
+                    return self._send(200, {
+                        "id": "resp_" + uuid.uuid4().hex, "object": "response", "created_at": int(time.time()),
+                        "model": body.get("model"), "status": "completed",
+                        "output": [{"type": "message", "id": "msg_1", "status": "completed", "role": "assistant",
+                                    "content": [{"type": "output_text", "text": text, "annotations": []}]}],
+                        "usage": {"input_tokens": len(prompt) // 2, "output_tokens": len(text) // 2,
+                                  "total_tokens": (len(prompt) + len(text)) // 2},
+                    })
+                if route == "chat/completions":
+                    return self._send(200, {
+                        "id": "chatcmpl_" + uuid.uuid4().hex, "object": "chat.completion",
+                        "created": int(time.time()), "model": body.get("model"),
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": text}}],
+                        "usage": {"prompt_tokens": len(prompt) // 2, "completion_tokens": len(text) // 2,
+                                  "total_tokens": (len(prompt) + len(text)) // 2},
+                    })
+                if route == "messages":
+                    return self._send(200, {
+                        "id": "msg_" + uuid.uuid4().hex, "type": "message", "role": "assistant",
+                        "model": body.get("model"), "content": [{"type": "text", "text": text}],
+                        "usage": {"input_tokens": len(prompt) // 2, "output_tokens": len(text) // 2},
+                    })
+                self._send(404, {"error": {"message": f"unknown route {route}"}})
+
+            def _stream(self, route, body, text):
+                """stream=true: 8글자씩 SSE 로 흘려보내고 연결을 닫는다"""
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                pieces = [text[i:i + 8] for i in range(0, len(text), 8)]
+                for seq, piece in enumerate(pieces):
+                    if route == "responses":
+                        ev = {"type": "response.output_text.delta", "item_id": "msg_1", "output_index": 0,
+                              "content_index": 0, "delta": piece, "sequence_number": seq, "logprobs": []}
+                        self._event(ev["type"], ev)
+                    elif route == "chat/completions":
+                        self._event(None, {"id": "chatcmpl_stream", "object": "chat.completion.chunk",
+                                           "created": int(time.time()), "model": body.get("model"),
+                                           "choices": [{"index": 0, "delta": {"content": piece},
+                                                        "finish_reason": None}]})
+                    else:
+                        self._event("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                                            "delta": {"type": "text_delta", "text": piece}})
+                    time.sleep(stub.stream_delay)
+                if route == "responses":
+                    self._event("response.completed", {"type": "response.completed", "sequence_number": len(pieces),
+                                                       "response": {"id": "resp_stream", "object": "response",
+                                                                    "status": "completed", "output": []}})
+                elif route == "chat/completions":
+                    self.wfile.write(b"data: [DONE]\n\n")
+                else:
+                    self._event("message_stop", {"type": "message_stop"})
+
+            def _event(self, name, obj):
+                head = f"event: {name}\n" if name else ""
+                self.wfile.write((head + "data: " + json.dumps(obj, ensure_ascii=False) + "\n\n").encode("utf-8"))
+                self.wfile.flush()
+
+            def _send(self, status, obj, headers=None):
+                data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def serve(self, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+        server = ThreadingHTTPServer((host, port), self.handler())
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=18082)
+    ap.add_argument("--latency", type=float, default=0.0)
+    ap.add_argument("--per-kchar", type=float, default=0.0)
+    ap.add_argument("--rate-limit", type=float, default=0.0, help="429 를 돌려줄 확률")
+    ap.add_argument("--retry-after", type=float, default=0.2)
+    ap.add_argument("--no-responses", action="store_true", help="/v1/responses 를 404 로 응답")
+    ap.add_argument("--fail-claude", action="store_true")
+    ap.add_argument("--claude-latency", type=float, default=0.0, help="/v1/messages 에만 더하는 지연(헤징 확인용)")
+    ap.add_argument("--stream-delay", type=float, default=0.02, help="stream=true 응답 조각 사이 간격")
+    args = ap.parse_args()
+    stub = LLMStub(args.latency, args.per_kchar, args.rate_limit, args.retry_after,
+                   not args.no_responses, args.fail_claude, args.claude_latency, args.stream_delay)
+    server = ThreadingHTTPServer((args.host, args.port), stub.handler())
+    print(f"LLM stub: http://{args.host}:{args.port}/v1/...")
+    server.serve_forever()
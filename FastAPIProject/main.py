@@ -1,7 +1,19 @@
 # main.py
-from fastapi import FastAPI, HTTPException
+from fastapi import BackgroundTasks, FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-import os, re, glob, wave, traceback, subprocess, requests, time, json, shutil
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+import os, re, sys, glob, wave, traceback, subprocess, requests, time, json, shutil, logging
+import threading, queue, uuid, struct, math, multiprocessing, bisect, hashlib, collections, heapq, weakref
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from dataclasses import dataclass
+import httpx
+import numpy as np
+from scipy.signal import resample_poly
+from starlette.concurrency import run_in_threadpool
+from fastapi import Request
 from dotenv import load_dotenv
 from openai import OpenAI
 from fpdf import FPDF
@@ -13,6 +25,9 @@ app.add_middleware(
 )
 
 HERE = os.path.dirname(os.path.abspath(__file__))
+ENV_PATH = os.path.normpath(os.path.join(HERE, "..", "backend", ".env"))
+# ../backend/.env 는 기동 시 한 번만 읽는다 (이미 설정된 환경변수가 우선)
+load_dotenv(ENV_PATH)
 BASE_AUDIO_DIR = os.environ.get(
     "AUDIO_BASE_DIR",
     os.path.normpath(os.path.join(HERE, "..", "backend", "audio"))
@@ -23,6 +38,159 @@ MERGE_OUT_DIR = os.environ.get(
 )
 os.makedirs(MERGE_OUT_DIR, exist_ok=True)
 
+
+# ─────────────────────────────────────────────────────────────
+# 관측: 단계별 소요시간 히스토그램, 업로드 바이트/LLM 토큰/캐시/실패 카운터, 진행 중 잡 게이지를
+# GET /metrics 에서 Prometheus 텍스트 형식으로 내보낸다 (외부 라이브러리 없이 여기서 직접 센다).
+# 로그는 모두 log(edumeet.stt) 로 남긴다. 단계 시작/완료는 INFO, 재시도·폴백은 WARNING,
+# 요청마다 찍던 상세 로그(Clova 설정, curl 예시, 응답 헤더/덤프, 세그먼트/폰트/렌더 세부 등)는 DEBUG 에서만 남긴다.
+#   LOG_LEVEL : 로그 레벨 (기본 INFO, DEBUG 면 상세 로그 + stt_response_debug.txt 덤프)
+# ─────────────────────────────────────────────────────────────
+log = logging.getLogger("edumeet.stt")
+if not log.handlers:
+    _log_handler = logging.StreamHandler(sys.stdout)
+    _log_handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(_log_handler)
+    log.propagate = False
+log.setLevel(getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO))
+
+METRICS_PREFIX = "edumeet_"
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+_metrics: list["_Metric"] = []
+
+
+def _metric_value(v) -> str:
+    v = float(v)
+    return str(int(v)) if v.is_integer() else repr(v)
+
+
+def _metric_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in zip(names, values)) + "}"
+
+
+class _Metric:
+    """
+    라벨 조합별 값을 들고 있는 지표. collect 를 주면 값을 따로 세지 않고
+    스크레이프 때 collect() -> {라벨 값 튜플: 값} 을 불러 기존 통계(dict)를 그대로 내보낸다.
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, doc: str, labels: tuple = (), collect=None):
+        self.name = METRICS_PREFIX + name
+        self.doc = doc
+        self.labels = tuple(labels)
+        self._collect = collect
+        self._values: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(k, "")) for k in self.labels)
+
+    def samples(self):
+        """(접미사, 라벨 이름, 라벨 값, 값)"""
+        if self._collect is not None:
+            values = self._collect()
+        else:
+            with self._lock:
+                values = dict(self._values)
+        for key, v in sorted(values.items()):
+            yield "", self.labels, key, v
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, names, values, v in self.samples():
+            lines.append(f"{self.name}{suffix}{_metric_labels(names, values)} {_metric_value(v)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labels: tuple = (), buckets: tuple = STAGE_BUCKETS):
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            st = self._values.get(key)
+            if st is None:
+                st = self._values[key] = [[0] * len(self.buckets), 0.0, 0]  # 구간별 개수, 합, 총 개수
+            i = bisect.bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                st[0][i] += 1
+            st[1] += value
+            st[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = {k: (list(c), total, n) for k, (c, total, n) in self._values.items()}
+        le = self.labels + ("le",)
+        for key, (counts, total, n) in sorted(values.items()):
+            cum = 0
+            for bound, c in zip(self.buckets, counts):
+                cum += c
+                yield "_bucket", le, key + (_metric_value(bound),), cum
+            yield "_bucket", le, key + ("+Inf",), n
+            yield "_sum", self.labels, key, total
+            yield "_count", self.labels, key, n
+
+
+def render_metrics() -> str:
+    lines = []
+    for m in _metrics:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = Histogram("stage_duration_seconds", "파이프라인 단계별 소요 시간(초)", ("stage",))
+STAGE_FAILURES = Counter("stage_failures_total", "단계별 실패 수", ("stage",))
+STAGE_SKIPPED = Counter("stage_skipped_total", "체크포인트로 건너뛴 단계 수", ("stage",))
+UPLOAD_BYTES = Counter("upload_bytes_total", "업스트림으로 보낸 바이트 (clova: STT 음성, summary: 요약 md/pdf)",
+                       ("target",))
+LLM_SECONDS = Histogram("llm_request_duration_seconds", "LLM 호출 1회 소요 시간(초, 캐시 적중 제외)", ("provider",))
+LLM_TOKENS = Counter("llm_tokens_total", "LLM 입력/출력 토큰 (응답에 usage 가 없으면 추정치)",
+                     ("provider", "direction"))
+JOBS_IN_FLIGHT = Gauge("jobs_in_flight", "실행 중인 파이프라인 수")
+
+
 def _numeric_key(path: str) -> int:
     """audio_12.wav -> 12 정렬키"""
     name = os.path.basename(path)
@@ -37,17 +205,172 @@ def _peek_header(path: str, n=16) -> bytes:
         return b""
 
 
-def _is_riff(path: str) -> bool:
-    try:
-        with open(path, "rb") as f:
-            return f.read(4) == b"RIFF"
-    except Exception:
-        return False
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def _read_wav_info(path: str) -> dict:
+    """
+    RIFF 헤더를 한 번만 읽어 fmt/data 청크 위치를 돌려준다.
+    LIST/fact 등 부가 청크는 건너뛰고, 녹음기가 data 크기를 0/0xFFFFFFFF 로 남긴 경우 파일 끝까지로 본다.
+    반환: {channels, sampwidth, framerate, data_offset, data_size}
+    """
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+            raise ValueError(f"RIFF(WAV)가 아닌 파일: {path} (header={riff[:12]!r})")
+
+        fmt = None
+        pos = 12
+        while pos + 8 <= file_size:
+            f.seek(pos)
+            ck_id, ck_size = struct.unpack("<4sI", f.read(8))
+            body = pos + 8
+            if ck_id == b"fmt ":
+                raw = f.read(min(ck_size, 40))
+                if len(raw) < 16:
+                    raise ValueError(f"fmt 청크가 너무 짧습니다: {path}")
+                tag, channels, framerate, _, _, bits = struct.unpack("<HHIIHH", raw[:16])
+                if tag == WAVE_FORMAT_EXTENSIBLE and len(raw) >= 26:
+                    tag = struct.unpack("<H", raw[24:26])[0]
+                fmt = {"format_tag": tag, "channels": channels, "framerate": framerate,
+                       "sampwidth": (bits + 7) // 8}
+            elif ck_id == b"data":
+                if fmt is None:
+                    raise ValueError(f"fmt 청크보다 data 청크가 먼저 나옵니다: {path}")
+                if fmt["format_tag"] != WAVE_FORMAT_PCM:
+                    raise ValueError(f"PCM 이 아닌 WAV 입니다(format={fmt['format_tag']:#x}): {path}")
+                avail = file_size - body
+                size = ck_size if 0 < ck_size <= avail else avail
+                block = fmt["channels"] * fmt["sampwidth"]
+                size -= size % block if block else 0
+                return {
+                    "channels": fmt["channels"],
+                    "sampwidth": fmt["sampwidth"],
+                    "framerate": fmt["framerate"],
+                    "data_offset": body,
+                    "data_size": size,
+                }
+            pos = body + ck_size + (ck_size & 1)  # 청크는 2바이트 정렬
+    raise ValueError(f"data 청크가 없습니다: {path}")
+
+
+def _wav_header(channels: int, sampwidth: int, framerate: int, data_size: int) -> bytes:
+    """PCM 44바이트 표준 헤더"""
+    block_align = channels * sampwidth
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE",
+        b"fmt ", 16, WAVE_FORMAT_PCM, channels, framerate, framerate * block_align, block_align, sampwidth * 8,
+        b"data", data_size,
+    )
+
+
+def _same_params(a: dict, b: dict) -> bool:
+    return (a["channels"], a["sampwidth"], a["framerate"]) == (b["channels"], b["sampwidth"], b["framerate"])
+
+
+# ─────────────────────────────────────────────────────────────
+# 인프로세스 변환: PCM 디코드 → 모노 다운믹스 → 폴리페이즈 리샘플(16kHz) → int16
+# ffmpeg 프로세스나 .conv.wav 임시파일 없이 병합 중에 바로 출력으로 쓴다.
+#   AUDIO_TARGET_RATE       : STT 로 보낼 샘플레이트 (기본 16000, 0 이면 변환 안 함 = 입력 그대로)
+#   AUDIO_CONVERT_WORKERS   : 변환 프로세스 풀 크기 (기본 CPU 수)
+#   AUDIO_CONVERT_POOL_MIN  : 변환할 청크가 이 개수 이상일 때만 프로세스 풀 사용 (기본 8)
+# ─────────────────────────────────────────────────────────────
+def _target_rate() -> int:
+    return int(os.getenv("AUDIO_TARGET_RATE", "16000"))
+
+
+def _target_params(info: dict) -> dict:
+    rate = _target_rate()
+    if rate <= 0:
+        return {k: info[k] for k in ("channels", "sampwidth", "framerate")}
+    return {"channels": 1, "sampwidth": 2, "framerate": rate}
+
+
+def _resample_ratio(src_rate: int, dst_rate: int) -> tuple[int, int]:
+    g = math.gcd(src_rate, dst_rate)
+    return dst_rate // g, src_rate // g
+
+
+def _converted_size(info: dict, target: dict) -> int:
+    """변환 결과 data 바이트 수 (resample_poly 출력 길이 = ceil(n * up / down))"""
+    nframes = info["data_size"] // (info["channels"] * info["sampwidth"])
+    up, down = _resample_ratio(info["framerate"], target["framerate"])
+    return math.ceil(nframes * up / down) * target["channels"] * target["sampwidth"]
+
+
+def _decode_pcm(raw: bytes, sampwidth: int, channels: int) -> np.ndarray:
+    """PCM 바이트 → (frames,) float32 모노 [-1, 1]"""
+    if sampwidth == 1:
+        x = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif sampwidth == 2:
+        x = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif sampwidth == 3:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        v = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        v = np.where(v & 0x800000, v - 0x1000000, v)
+        x = v.astype(np.float32) / 8388608.0
+    elif sampwidth == 4:
+        x = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"지원하지 않는 샘플 폭: {sampwidth} bytes")
+    if channels > 1:
+        x = x.reshape(-1, channels).mean(axis=1)
+    return x
+
+
+def _convert_chunk(path: str, info: dict, target: dict) -> bytes:
+    """WAV 한 개의 data 구간을 target(모노 int16 / target rate) PCM 바이트로 변환"""
+    with open(path, "rb") as f:
+        f.seek(info["data_offset"])
+        raw = f.read(info["data_size"])
+    x = _decode_pcm(raw, info["sampwidth"], info["channels"])
+    up, down = _resample_ratio(info["framerate"], target["framerate"])
+    if up != down:
+        x = resample_poly(x, up, down)
+    return (np.clip(x, -1.0, 1.0) * 32767.0).astype("<i2").tobytes()
+
+
+_convert_pool: ProcessPoolExecutor | None = None
+_convert_pool_lock = threading.Lock()
+
+
+def _get_convert_pool() -> ProcessPoolExecutor:
+    global _convert_pool
+    with _convert_pool_lock:
+        if _convert_pool is None:
+            workers = int(os.getenv("AUDIO_CONVERT_WORKERS", "0")) or (os.cpu_count() or 2)
+            # 워커 스레드가 떠 있는 프로세스에서 fork 하지 않도록 forkserver/spawn 사용
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _convert_pool = ProcessPoolExecutor(max_workers=workers,
+                                                mp_context=multiprocessing.get_context(method))
+        return _convert_pool
+
+
+def _converted_chunks(jobs: list[tuple[str, dict]], target: dict):
+    """변환 대상 (path, info) 들을 입력 순서대로 변환해 yield. 개수가 많으면 프로세스 풀 사용."""
+    global _convert_pool
+    if len(jobs) >= int(os.getenv("AUDIO_CONVERT_POOL_MIN", "8")):
+        pool = _get_convert_pool()
+        try:
+            yield from pool.map(_convert_chunk, [p for p, _ in jobs], [i for _, i in jobs],
+                                [target] * len(jobs), chunksize=4)
+        except BrokenProcessPool:
+            # 워커가 죽은 풀은 재사용할 수 없으므로 다음 병합에서 새로 만든다
+            with _convert_pool_lock:
+                if _convert_pool is pool:
+                    _convert_pool = None
+            raise
+    else:
+        for p, i in jobs:
+            yield _convert_chunk(p, i, target)
 
 
 def ensure_wav(file_path: str) -> str:
     # 이미 WAV(RIFF)이면 그대로 사용
-    print("ensure_wav 시작")
+    log.debug("ensure_wav 시작: %s", file_path)
     try:
         with open(file_path, 'rb') as f:
             if f.read(4) == b'RIFF':
@@ -55,9 +378,8 @@ def ensure_wav(file_path: str) -> str:
     except Exception:
         pass
 
-    # ffmpeg가 없으면 원본 파일 그대로 사용 (임시 해결책)
-    print(f"ffmpeg 없음 - 원본 파일 사용: {file_path}")
-
+    # RIFF PCM 은 병합 중 인프로세스로 변환되므로 여기로 오는 건 webm/opus 등 컨테이너 포맷뿐
+    log.debug(f"RIFF 아님 - ffmpeg 로 디코드: {file_path}")
 
     # 변환 경로
     base, _ = os.path.splitext(file_path)
@@ -65,7 +387,8 @@ def ensure_wav(file_path: str) -> str:
 
     # ffmpeg 변환 (16kHz, mono, PCM 16-bit)
     cmd = ["ffmpeg", "-y", "-i", file_path, "-ar", "16000", "-ac", "1", "-acodec", "pcm_s16le", wav_path]
-    subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    with STAGE_SECONDS.time(stage="ensure_wav"):
+        subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
 
     # 변환 결과 검증
     with open(wav_path, 'rb') as f:
@@ -75,94 +398,381 @@ def ensure_wav(file_path: str) -> str:
     return wav_path
 
 
+_copy_mode = ["copy_file_range" if hasattr(os, "copy_file_range") else
+              "sendfile" if hasattr(os, "sendfile") else "readwrite"]
+
+
+def _copy_range(src_fd: int, offset: int, count: int, dst_fd: int):
+    """
+    src_fd 의 [offset, offset+count) 바이트를 dst_fd 현재 위치에 커널 내부 복사로 붙인다.
+    copy_file_range → sendfile → read/write 순으로 폴백하며, 한 번 실패한 방식은 다시 시도하지 않는다.
+    """
+    while count > 0:
+        mode = _copy_mode[0]
+        try:
+            if mode == "copy_file_range":
+                n = os.copy_file_range(src_fd, dst_fd, count, offset)
+            elif mode == "sendfile":
+                n = os.sendfile(dst_fd, src_fd, offset, count)
+            else:
+                buf = os.pread(src_fd, min(count, 1024 * 1024), offset)
+                n = os.write(dst_fd, buf) if buf else 0
+        except OSError as e:
+            if mode == "readwrite":
+                raise
+            # EXDEV(다른 파일시스템), ENOSYS/EINVAL(미지원 커널/FS) 등 → 다음 방식으로
+            log.warning(f"[merge] {mode} 사용 불가({e}), 폴백")
+            _copy_mode[0] = "sendfile" if mode == "copy_file_range" and hasattr(os, "sendfile") else "readwrite"
+            continue
+        if n == 0:
+            raise IOError(f"입력이 예상보다 짧습니다 (남은 {count} bytes)")
+        offset += n
+        count -= n
+
+
+def _write_all(fd: int, data: bytes):
+    mv = memoryview(data)
+    while mv:
+        mv = mv[os.write(fd, mv):]
+
+
 def merge_wav_files(input_files, out_path):
     """
-    wave 모듈로 WAV 병합 (메모리 절약을 위해 블록 단위로 읽어서 씀)
-    모든 입력 파일의 (channels, sampwidth, framerate, comptype) 동일해야 함
+    WAV 병합: 각 입력의 RIFF 헤더를 한 번만 파싱해 data 청크 위치/길이를 구하고,
+    전체 길이로 헤더를 먼저 쓴 뒤 PCM 을 순서대로 이어 붙인다.
+    - 이미 목표 포맷(모노/16bit/AUDIO_TARGET_RATE)인 입력: 커널 복사(copy_file_range/sendfile)
+    - 그 외 PCM 입력: 인프로세스 다운믹스+리샘플 후 기록 (청크가 많으면 프로세스 풀)
+    AUDIO_TARGET_RATE=0 이면 변환 없이 모든 입력의 (channels, sampwidth, framerate) 가 같아야 한다.
+    RIFF 가 아닌 입력은 ensure_wav 로 변환.
     """
     if not input_files:
         raise ValueError("병합할 WAV 파일이 없습니다.")
 
+    # 1) 헤더 파싱 (파일당 1회)
+    infos = []
+    for fpath in input_files:
+        try:
+            info = _read_wav_info(fpath)
+        except ValueError:
+            fpath = ensure_wav(fpath)
+            try:
+                info = _read_wav_info(fpath)
+            except ValueError as ve:
+                raise HTTPException(status_code=415, detail=f"WAV 파싱 실패: {fpath} ({ve})")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"파일 처리 중 예외: {fpath} ({e})")
+        infos.append((fpath, info))
+
+    base = _target_params(infos[0][1])
+    log.debug(f"[merge] {len(infos)} files, out params: ch={base['channels']}, "
+          f"width={base['sampwidth']}, rate={base['framerate']}")
+    convert = _target_rate() > 0
+    plan = []  # (fpath, info, out_bytes, needs_convert)
+    for fpath, info in infos:
+        if _same_params(info, base):
+            plan.append((fpath, info, info["data_size"], False))
+        elif convert:
+            plan.append((fpath, info, _converted_size(info, base), True))
+        else:
+            raise HTTPException(
+                status_code=415,
+                detail=(f"오디오 파라미터 불일치: {os.path.basename(fpath)} "
+                        f"(ch={info['channels']}, width={info['sampwidth']}, rate={info['framerate']}) "
+                        f"vs 기준(ch={base['channels']}, width={base['sampwidth']}, rate={base['framerate']})")
+            )
 
-    print("[merge] input_files:")
-    for p in input_files:
-        size = os.path.getsize(p) if os.path.exists(p) else -1
-        hdr = _peek_header(p, 12)
-        print(f"  - {p} (size={size} bytes, header={hdr})")
-
-     # 1) 기준 파라미터 확보 (첫 파일 오픈에서 에러가 나면 WAV가 아닐 가능성 큼)
-    try:
-        with wave.open(input_files[0], "rb") as w0:
-            nchannels = w0.getnchannels()
-            sampwidth = w0.getsampwidth()
-            framerate = w0.getframerate()
-            comptype = w0.getcomptype()
-            compname = w0.getcompname()
-            print(f"[merge] base params: ch={nchannels}, width={sampwidth}, rate={framerate}, comp={comptype}")
-    except wave.Error as we:
-        # RIFF가 아닌 경우 대부분 여기서 터짐
-        raise HTTPException(status_code=415, detail=f"첫 파일이 WAV가 아닙니다: {input_files[0]} ({we})")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"첫 파일 오픈 중 예외: {input_files[0]} ({e})")
-
+    total = sum(n for _, _, n, _ in plan)
+    if total + 36 > 0xFFFFFFFF:
+        raise HTTPException(status_code=413, detail=f"병합 결과가 WAV 최대 크기(4GB)를 넘습니다: {total} bytes")
 
-    # 2) 출력 파일 생성
+    # 2) 헤더를 먼저 쓰고 PCM 구간을 순서대로 기록
+    n_convert = sum(1 for *_, c in plan if c)
+    started = time.time()
     try:
-        with wave.open(out_path, "wb") as out:
-            out.setnchannels(nchannels)
-            out.setsampwidth(sampwidth)
-            out.setframerate(framerate)
-            out.setcomptype(comptype, compname)
-
-            # 3) 순서대로 이어붙이기
-            for fpath in input_files:
-                # 빠른 헤더 체크
-                if not _is_riff(fpath):
-                    raise HTTPException(status_code=415, detail=f"RIFF(WAV)가 아닌 파일: {fpath}")
-
+        converted = _converted_chunks([(p, i) for p, i, _, c in plan if c], base)
+        dst_fd = os.open(out_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.write(dst_fd, _wav_header(base["channels"], base["sampwidth"], base["framerate"], total))
+            for fpath, info, size, needs_convert in plan:
+                if needs_convert:
+                    pcm = next(converted)
+                    if len(pcm) != size:
+                        raise IOError(f"변환 길이 불일치: {fpath} ({len(pcm)} != {size})")
+                    _write_all(dst_fd, pcm)
+                    continue
+                src_fd = os.open(fpath, os.O_RDONLY)
                 try:
-                    with wave.open(fpath, "rb") as w:
-                        # 파라미터 일치 검사
-                        if (w.getnchannels() != nchannels or
-                            w.getsampwidth() != sampwidth or
-                            w.getframerate() != framerate or
-                            w.getcomptype() != comptype):
-                            raise HTTPException(
-                                status_code=415,
-                                detail=(f"오디오 파라미터 불일치: {os.path.basename(fpath)} "
-                                        f"(ch={w.getnchannels()}, width={w.getsampwidth()}, "
-                                        f"rate={w.getframerate()}, comp={w.getcomptype()}) "
-                                        f"vs 기준(ch={nchannels}, width={sampwidth}, "
-                                        f"rate={framerate}, comp={comptype})")
-                            )
-
-                        # 블록 단위 복사 (frame 단위)
-                        block_frames = 64 * 1024
-                        remaining = w.getnframes()
-                        while remaining > 0:
-                            chunk = min(remaining, block_frames)
-                            data = w.readframes(chunk)
-                            out.writeframes(data)
-                            remaining -= chunk
-                except wave.Error as we:
-                    # 특정 파일에서만 WAV 파싱 오류
-                    raise HTTPException(status_code=415, detail=f"WAV 파싱 실패: {fpath} ({we})")
-                except HTTPException:
-                    # 위에서 상태코드 정해 올린 경우 그대로 던짐
-                    raise
-                except Exception as e:
-                    traceback.print_exc()
-                    raise HTTPException(status_code=500, detail=f"파일 처리 중 예외: {fpath} ({e})")
-    except HTTPException:
-        raise
+                    _copy_range(src_fd, info["data_offset"], info["data_size"], dst_fd)
+                finally:
+                    os.close(src_fd)
+        finally:
+            os.close(dst_fd)
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"출력 파일 작성 중 예외: {out_path} ({e})")
 
-
+    log.info(f"[merge] {out_path} ({total} bytes PCM, converted={n_convert}/{len(plan)}, "
+          f"copy={_copy_mode[0]}, took={time.time() - started:.2f}s)")
     return out_path
 
 
+# ─────────────────────────────────────────────────────────────
+# VAD(무음 압축): 병합 PCM 의 프레임별 에너지/영교차율로 발화 구간을 찾고,
+# 긴 무음은 VAD_KEEP_SILENCE_MS 만큼만 남긴 채 잘라낸다. 잘린 파일의 시각 → 원본 시각
+# 매핑(offset map)을 vad_map.json 에 남겨 STT 타임스탬프를 원본 기준으로 되돌린다.
+#   VAD_ENABLE            : true/false (기본 true)
+#   VAD_MIN_SILENCE_MS    : 이보다 긴 무음만 압축 (기본 1500)
+#   VAD_KEEP_SILENCE_MS   : 압축 후 남길 무음 길이 (기본 400, 앞뒤 절반씩)
+#   VAD_ENERGY_DB         : 발화 판정 최소 에너지 dBFS (기본 -45)
+#   VAD_MARGIN_DB         : 잡음 바닥(하위 10% 프레임) 대비 여유 (기본 10)
+#   VAD_ZCR               : 에너지가 약간 낮아도 이 영교차율 이상이면 발화(마찰음) (기본 0.25)
+# ─────────────────────────────────────────────────────────────
+VAD_FRAME_MS = 30
+
+
+def _vad_frame_features(path: str, info: dict, win: int, block_frames: int = 2000):
+    """프레임별 (에너지 dBFS, 영교차율). 긴 녹음도 메모리를 덜 쓰도록 블록 단위로 계산"""
+    ch = info["channels"]
+    nframes = info["data_size"] // (ch * info["sampwidth"])
+    n = nframes // win
+    pcm = np.memmap(path, dtype="<i2", mode="r", offset=info["data_offset"], shape=(nframes * ch,))
+    energy = np.empty(n, dtype=np.float32)
+    zcr = np.empty(n, dtype=np.float32)
+    for b in range(0, n, block_frames):
+        e = min(n, b + block_frames)
+        x = np.asarray(pcm[b * win * ch:e * win * ch], dtype=np.float32) / 32768.0
+        if ch > 1:
+            x = x.reshape(-1, ch).mean(axis=1)
+        x = x.reshape(e - b, win)
+        energy[b:e] = 10.0 * np.log10(np.square(x).mean(axis=1) + 1e-10)
+        zcr[b:e] = (np.abs(np.diff(np.signbit(x), axis=1)).sum(axis=1)) / (win - 1)
+    return energy, zcr, nframes
+
+
+def _speech_mask(energy: np.ndarray, zcr: np.ndarray) -> np.ndarray:
+    floor = float(np.percentile(energy, 10)) if energy.size else -100.0
+    thr = max(float(os.getenv("VAD_ENERGY_DB", "-45")), floor + float(os.getenv("VAD_MARGIN_DB", "10")))
+    zcr_thr = float(os.getenv("VAD_ZCR", "0.25"))
+    return (energy > thr) | ((energy > thr - 10.0) & (zcr > zcr_thr))
+
+
+def _keep_spans(speech: np.ndarray, win: int, nframes: int, rate: int) -> list[tuple[int, int]]:
+    """남길 샘플 구간 [(start, end)] — 긴 무음은 앞뒤 keep/2 만 남긴다"""
+    min_sil = int(float(os.getenv("VAD_MIN_SILENCE_MS", "1500")) / VAD_FRAME_MS)
+    keep = int(float(os.getenv("VAD_KEEP_SILENCE_MS", "400")) / VAD_FRAME_MS)
+    half = keep // 2
+
+    # 무음 run 경계 (프레임 단위)
+    padded = np.concatenate(([True], speech, [True]))
+    d = np.diff(padded.astype(np.int8))
+    starts = np.flatnonzero(d == -1)  # 무음 시작
+    ends = np.flatnonzero(d == 1)     # 무음 끝 (exclusive)
+
+    spans, cur = [], 0  # cur: 다음 남길 구간의 시작 샘플
+    for s, e in zip(starts.tolist(), ends.tolist()):
+        if e - s <= max(min_sil, keep):
+            continue
+        cut_s = 0 if s == 0 else (s + half) * win                          # 녹음 앞 무음은 전부 제거
+        cut_e = nframes if e == len(speech) else (e - (keep - half)) * win  # 녹음 끝 무음도 제거
+        if cut_s > cur:
+            spans.append((cur, cut_s))
+        cur = cut_e
+    if cur < nframes:
+        spans.append((cur, nframes))
+    return spans
+
+
+def vad_trim(in_path: str, out_path: str) -> dict:
+    """
+    in_path 의 긴 무음을 압축해 out_path 로 쓴다.
+    반환: {ok, path, original_sec, kept_sec, removed_sec, offset_map:[[trimmed_ms, original_ms, length_ms]]}
+    """
+    info = _read_wav_info(in_path)
+    rate, ch, width = info["framerate"], info["channels"], info["sampwidth"]
+    if width != 2:
+        return {"ok": False, "path": in_path, "detail": f"16bit PCM 만 지원 (sampwidth={width})"}
+
+    started = time.time()
+    win = max(1, int(rate * VAD_FRAME_MS / 1000))
+    energy, zcr, nframes = _vad_frame_features(in_path, info, win)
+    spans = _keep_spans(_speech_mask(energy, zcr), win, nframes, rate)
+    kept = sum(e - s for s, e in spans)
+    report = {
+        "original_sec": round(nframes / rate, 2),
+        "kept_sec": round(kept / rate, 2),
+        "removed_sec": round((nframes - kept) / rate, 2),
+        "removed_ratio": round(1 - kept / nframes, 4) if nframes else 0.0,
+    }
+    if kept == nframes or not spans:
+        # 잘라낼 게 없거나 전부 무음이면 원본 그대로 (STT 가 판단)
+        return {"ok": True, "path": in_path, "offset_map": [[0, 0, int(nframes * 1000 / rate)]],
+                **report, "removed_sec": 0.0, "removed_ratio": 0.0, "kept_sec": report["original_sec"]}
+
+    block = ch * width
+    offset_map, t = [], 0
+    with _atomic_output(out_path) as tmp:
+        dst_fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        src_fd = os.open(in_path, os.O_RDONLY)
+        try:
+            os.write(dst_fd, _wav_header(ch, width, rate, kept * block))
+            for s, e in spans:
+                _copy_range(src_fd, info["data_offset"] + s * block, (e - s) * block, dst_fd)
+                offset_map.append([int(t * 1000 / rate), int(s * 1000 / rate), int((e - s) * 1000 / rate)])
+                t += e - s
+        finally:
+            os.close(src_fd)
+            os.close(dst_fd)
+
+    _write_json(os.path.join(os.path.dirname(out_path), "vad_map.json"), offset_map)
+    log.info(f"🔇 [VAD] {report['original_sec']}s → {report['kept_sec']}s "
+          f"(-{report['removed_sec']}s, {len(spans)} spans, took={time.time() - started:.2f}s)")
+    return {"ok": True, "path": out_path, "offset_map": offset_map, **report}
+
+
+def _map_trimmed_ms(ms: int, offset_map: list, starts: list | None = None) -> int:
+    """VAD 로 잘린 파일 기준 시각(ms) → 원본 녹음 기준 시각(ms)"""
+    if not offset_map:
+        return ms
+    if starts is None:
+        starts = [m[0] for m in offset_map]
+    i = max(0, bisect.bisect_right(starts, ms) - 1)
+    trimmed, original, length = offset_map[i]
+    return original + min(ms - trimmed, length)
+
+
+def _remap_segments(segments: list, offset_map: list) -> list:
+    starts = [m[0] for m in offset_map]
+    out = []
+    for seg in segments:
+        seg = dict(seg)
+        for key in ("start", "end"):
+            if key in seg:
+                seg[key] = _map_trimmed_ms(seg[key], offset_map, starts)
+        out.append(seg)
+    return out
+
+
+# ─────────────────────────────────────────────────────────────
+# 설정/업스트림 클라이언트: 자격증명·엔드포인트는 기동 시 한 번 읽어 settings 에 두고,
+# Clova·GMS(Claude)·업로드용 requests.Session 과 OpenAI 클라이언트를 앱 수명 동안 재사용한다.
+# (잡마다 새 TCP/TLS 연결을 맺지 않고 keep-alive 연결을 돌려 쓴다)
+# startup 에서 만들고 shutdown 에서 닫는다. 엔드포인트 밖(벤치/스크립트)에서는 첫 사용 시 만든다.
+#   HTTP_POOL_CLOVA        : Clova 연결 풀 크기 (기본 8, STT_SEGMENT_CONCURRENCY 이상 권장)
+#   HTTP_POOL_GMS          : GMS Claude 연결 풀 크기 (기본 8)
+#   HTTP_POOL_UPLOAD       : 요약 업로드 연결 풀 크기 (기본 4)
+#   OPENAI_MAX_CONNECTIONS : OpenAI 클라이언트 최대 연결 수 (기본 16, LLM_CONCURRENCY 이상 권장)
+# ─────────────────────────────────────────────────────────────
+@dataclass(frozen=True)
+class Settings:
+    clova_invoke_url: str
+    clova_secret_key: str
+    use_gms_openai: bool
+    use_gms_claude: bool
+    gms_key: str
+    gms_openai_base: str
+    gms_anthropic_base: str
+    openai_api_key: str
+    openai_clean_model: str
+    openai_summary_model: str
+    summary_upload_url: str
+    summary_upload_api_key: str
+    summary_upload_early: bool
+    pool_clova: int
+    pool_gms: int
+    pool_upload: int
+    openai_max_connections: int
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        env = os.getenv
+        return cls(
+            clova_invoke_url=env("CLOVA_INVOKE_URL", ""),
+            clova_secret_key=env("CLOVA_SECRET_KEY", ""),
+            use_gms_openai=env("USE_GMS_OPENAI", "false").lower() == "true",
+            use_gms_claude=env("USE_GMS_CLAUDE", "false").lower() == "true",
+            gms_key=env("GMS_KEY", "").strip(),
+            gms_openai_base=env("GMS_OPENAI_BASE", "").strip().rstrip("/"),
+            gms_anthropic_base=env("GMS_ANTHROPIC_BASE", "https://gms.ssafy.io/gmsapi/api.anthropic.com").rstrip("/"),
+            openai_api_key=env("OPENAI_API_KEY", "").strip(),
+            openai_clean_model=env("OPENAI_CLEAN_MODEL", "gpt-4o-mini"),
+            openai_summary_model=env("OPENAI_SUMMARY_MODEL", "gpt-4o-mini"),
+            summary_upload_url=env("SUMMARY_UPLOAD_URL", "").strip(),
+            summary_upload_api_key=env("SUMMARY_UPLOAD_API_KEY", "").strip(),
+            summary_upload_early=env("SUMMARY_UPLOAD_EARLY", "false").lower() == "true",
+            pool_clova=int(env("HTTP_POOL_CLOVA", "8")),
+            pool_gms=int(env("HTTP_POOL_GMS", "8")),
+            pool_upload=int(env("HTTP_POOL_UPLOAD", "4")),
+            openai_max_connections=int(env("OPENAI_MAX_CONNECTIONS", "16")),
+        )
+
+
+settings = Settings.from_env()
+
+
+class Upstreams:
+    """업스트림별 연결 풀. 스레드 간 공유해도 된다 (요청마다 상태를 바꾸지 않음)"""
+
+    def __init__(self, cfg: Settings):
+        self.clova = self._session(cfg.pool_clova)
+        self.gms = self._session(cfg.pool_gms)
+        self.upload = self._session(cfg.pool_upload)
+        self.openai = None
+        if cfg.use_gms_openai and cfg.gms_key and cfg.gms_openai_base:
+            # GMS 프록시 경유 (중요: /v1 붙이기)
+            self.openai = self._openai(cfg, cfg.gms_key, cfg.gms_openai_base + "/v1")
+        elif not cfg.use_gms_openai and cfg.openai_api_key:
+            self.openai = self._openai(cfg, cfg.openai_api_key, None)
+
+    @staticmethod
+    def _openai(cfg: Settings, api_key: str, base_url: str | None) -> OpenAI:
+        http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=cfg.openai_max_connections,
+                                max_keepalive_connections=cfg.openai_max_connections),
+            timeout=httpx.Timeout(600, connect=10),
+        )
+        return OpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+
+    @staticmethod
+    def _session(pool_size: int) -> requests.Session:
+        sess = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        sess.mount("https://", adapter)
+        sess.mount("http://", adapter)
+        return sess
+
+    def close(self):
+        for sess in (self.clova, self.gms, self.upload):
+            sess.close()
+        if self.openai is not None:
+            self.openai.close()
+
+
+_upstreams: Upstreams | None = None
+_upstreams_lock = threading.Lock()
+
+
+def _clients() -> Upstreams:
+    global _upstreams
+    with _upstreams_lock:
+        if _upstreams is None:
+            _upstreams = Upstreams(settings)
+        return _upstreams
+
+
+@app.on_event("startup")
+def _open_clients():
+    _clients()
+
+
+@app.on_event("shutdown")
+def _close_clients():
+    global _upstreams
+    with _upstreams_lock:
+        if _upstreams is not None:
+            _upstreams.close()
+            _upstreams = None
+
+
 def _normalize_base_url(url: str) -> str:
     """
     .env에는 base만 있어도 되고, 만약 /recognizer, /recognizer/url, /recognizer/upload가 붙어있으면 떼어낸다.
@@ -177,16 +787,25 @@ def _normalize_base_url(url: str) -> str:
     return url
 
 
-def Start_STT(out_path: str, class_id: str) -> dict:
-    print(f"▶️ [STT] 시작: {out_path} (class_id={class_id})")
+# A 방법: 화자 인식/워드 얼라인먼트 OFF
+CLOVA_REQUEST_BODY = {
+    "language": "ko-KR",
+    "completion": "sync",
+    "callback": None,
+    "userdata": None,
+    "wordAlignment": False,           # OFF
+    "fullText": True,
+    "forbiddens": None,
+    "boostings": None,
+    "diarization": {"enable": False}, # OFF
+    "sed": None,
+}
 
-    # ../backend/.env 로드
-    env_path = os.path.join(os.path.dirname(__file__), "../backend/.env")
-    print(f"🧩 env 경로: {env_path} exists= {os.path.exists(env_path)}")
-    load_dotenv(env_path)
 
-    raw_url = os.getenv("CLOVA_INVOKE_URL", "")
-    secret  = os.getenv("CLOVA_SECRET_KEY", "")
+def _clova_config() -> dict:
+    """CLOVA 엔드포인트/키 확인. 실패 시 {"ok": False, "detail": ...}"""
+    raw_url = settings.clova_invoke_url
+    secret  = settings.clova_secret_key
 
     # BASE URL 정규화 → /recognizer/upload 붙여 사용
     try:
@@ -195,529 +814,1873 @@ def Start_STT(out_path: str, class_id: str) -> dict:
         return {"ok": False, "detail": he.detail}
 
     endpoint = base_url + "/recognizer/upload"
-    print("🌐 BASE_URL:", base_url)
-    print("🔚 ENDPOINT:", endpoint)
-    print("🔑 SECRET_KEY head:", (secret[:6] + "…") if secret else "None")
-    print("🌐 BASE_URL raw repr:", repr(base_url))
-    try:
-        part = base_url.split("/external/v1/")[1]
-        app_id, domain_id = part.split("/")[0], part.split("/")[1]
-        print(f"🔎 app_id={app_id}, domain_id={domain_id}")
-    except Exception:
-        pass
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("🌐 BASE_URL: %r", base_url)
+        log.debug("🔚 ENDPOINT: %s", endpoint)
+        log.debug("🔑 SECRET_KEY head: %s", (secret[:6] + "…") if secret else "None")
+        try:
+            part = base_url.split("/external/v1/")[1]
+            app_id, domain_id = part.split("/")[0], part.split("/")[1]
+            log.debug(f"🔎 app_id={app_id}, domain_id={domain_id}")
+        except Exception:
+            pass
 
     if not secret:
         return {"ok": False, "detail": "CLOVA_SECRET_KEY 가 비어 있습니다."}
-    if not os.path.isfile(out_path):
-        return {"ok": False, "detail": f"파일 없음: {out_path}"}
-
-    # 파일 헤더/크기 로그
-    hdr12 = _peek_header(out_path, 12)
-    size = os.path.getsize(out_path)
-    print(f"📦 업로드 파일 크기: {size} bytes, 헤더: {hdr12!r}")
-
-    # A 방법: 화자 인식/워드 얼라인먼트 OFF
-    request_body = {
-        "language": "ko-KR",
-        "completion": "sync",
-        "callback": None,
-        "userdata": None,
-        "wordAlignment": False,           # OFF
-        "fullText": True,
-        "forbiddens": None,
-        "boostings": None,
-        "diarization": {"enable": False}, # OFF
-        "sed": None,
-    }
 
     headers = {
         "Accept": "application/json;UTF-8",
         "X-CLOVASPEECH-API-KEY": secret,
     }
+    return {"ok": True, "endpoint": endpoint, "headers": headers, "secret": secret}
 
-    # 재현용 curl
-    safe_path = out_path.replace("\\", "/")
-    print("🐚 curl 예시:")
-    print(
-        'curl -X POST "{url}" '
-        '-H "X-CLOVASPEECH-API-KEY: {key}" '
-        '-H "Accept: application/json;UTF-8" '
-        '-F "media=@{path}" '
-        '-F "params={params};type=application/json"'
-        .format(url=endpoint, key=(secret[:6] + "…"),
-                path=safe_path, params=json.dumps(request_body, ensure_ascii=False))
-    )
 
-    started = time.time()
-    try:
-        with open(out_path, "rb") as f:
-            files = {
-                # 공식 예제와 동일: 파일 핸들을 그대로 전달
-                "media": f,
-                "params": (None, json.dumps(request_body, ensure_ascii=False).encode("UTF-8"), "application/json"),
-            }
-            resp = requests.post(endpoint, headers=headers, files=files, timeout=600)
-    except requests.Timeout as e:
-        print("⏱️ 타임아웃:", e)
-        return {"ok": False, "detail": f"요청 타임아웃: {e}"}
-    except Exception as e:
-        print("⚠️ 요청 예외:", e)
-        return {"ok": False, "detail": f"요청 실패: {e}"}
+def _multipart_head(boundary: str, name: str, filename: str | None = None, ctype: str | None = None) -> bytes:
+    disp = f'form-data; name="{name}"'
+    if filename:
+        disp += f'; filename="{filename}"'
+    head = f"--{boundary}\r\nContent-Disposition: {disp}\r\n"
+    if ctype:
+        head += f"Content-Type: {ctype}\r\n"
+    return (head + "\r\n").encode("utf-8")
 
-    took = time.time() - started
-    ctype = resp.headers.get("content-type", "")
-    print(f"✅ 응답: status={resp.status_code}, content-type={ctype}, took={took:.2f}s")
-    try:
-        print("🔁 resp headers:", dict(resp.headers))
-    except Exception:
-        pass
-    preview = (resp.text or "")[:300].replace("\n", " ")
-    print("📝 응답 미리보기:", preview)
 
-    # 응답 덤프
-    transcript_dir = os.path.dirname(out_path)
-    debug_path = os.path.join(transcript_dir, "stt_response_debug.txt")
+class MultipartStream:
+    """
+    multipart/form-data 본문을 디스크에서 block_size 씩 읽어 흘려보내는 file-like 객체.
+    requests 의 files= 는 본문 전체를 메모리에 만들지만, 이 객체는 길이(__len__)를 미리 계산해
+    Content-Length 로 보내고 내용은 read() 할 때마다 조금씩 채운다.
+
+    parts: [(name, filename | None, content_type | None, pieces)]
+      pieces: bytes 또는 (path, offset, length) 의 리스트
+    """
+
+    def __init__(self, parts: list, block_size: int = 256 * 1024):
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        self.block_size = block_size
+        self._pieces = []
+        for name, filename, ctype, pieces in parts:
+            self._pieces.append(_multipart_head(self.boundary, name, filename, ctype))
+            self._pieces.extend(pieces)
+            self._pieces.append(b"\r\n")
+        self._pieces.append(f"--{self.boundary}--\r\n".encode("utf-8"))
+        self._length = sum(len(p) if isinstance(p, bytes) else p[2] for p in self._pieces)
+        self._idx, self._pos, self._fh = 0, 0, None
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self._length
+        out = []
+        while size > 0 and self._idx < len(self._pieces):
+            piece = self._pieces[self._idx]
+            if isinstance(piece, bytes):
+                buf = piece[self._pos:self._pos + size]
+                total = len(piece)
+            else:
+                path, offset, total = piece
+                if self._fh is None:
+                    self._fh = open(path, "rb")
+                self._fh.seek(offset + self._pos)
+                buf = self._fh.read(min(size, total - self._pos))
+                if not buf:
+                    raise IOError(f"업로드 중 파일이 짧아졌습니다: {path}")
+            out.append(buf)
+            size -= len(buf)
+            self._pos += len(buf)
+            if self._pos >= total:
+                self._next_piece()
+        return b"".join(out)
+
+    def _next_piece(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        self._idx += 1
+        self._pos = 0
+
+    def __iter__(self):
+        while True:
+            buf = self.read(self.block_size)
+            if not buf:
+                break
+            yield buf
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+
+def _post_clova(cfg: dict, media: tuple, timeout: float = 600):
+    """
+    media: (filename, pieces, content_type) — pieces 는 MultipartStream 형식.
+    본문은 디스크에서 스트리밍되므로 녹음 길이와 상관없이 메모리 사용량이 일정하다.
+    """
+    filename, pieces, ctype = media
+    body = MultipartStream([
+        ("media", filename, ctype, pieces),
+        ("params", None, "application/json",
+         [json.dumps(CLOVA_REQUEST_BODY, ensure_ascii=False).encode("UTF-8")]),
+    ])
+    headers = dict(cfg["headers"])
+    headers["Content-Type"] = body.content_type
+    headers["Content-Length"] = str(len(body))
+    UPLOAD_BYTES.inc(len(body), target="clova")
     try:
-        with open(debug_path, "w", encoding="utf-8") as fw:
-            fw.write(f"HTTP {resp.status_code}\nContent-Type: {ctype}\nTook: {took:.2f}s\n\n")
-            fw.write(resp.text or "")
-        print("💾 응답 덤프:", debug_path)
-    except Exception as e:
-        print("⚠️ 응답 덤프 저장 실패:", e)
+        with STAGE_SECONDS.time(stage="stt_upload"):  # 업로드 + Clova 인식까지 왕복
+            return _clients().clova.post(cfg["endpoint"], headers=headers, data=body, timeout=timeout)
+    finally:
+        body.close()
 
+
+def _clova_error_detail(resp) -> str | None:
     # 에러 처리 (메시지 보강)
     if resp.status_code == 404:
         hint = "404=경로 미매핑. 같은 도메인의 Invoke URL/Secret Key인지, URL 끝 경로(/recognizer/upload) 확인."
-        return {"ok": False, "detail": f"HTTP 404: {resp.text} | HINT: {hint}"}
+        return f"HTTP 404: {resp.text} | HINT: {hint}"
     if resp.status_code in (401, 403):
-        return {"ok": False, "detail": "키/권한 오류. Secret Key/도메인 짝을 확인하세요."}
+        return "키/권한 오류. Secret Key/도메인 짝을 확인하세요."
     if resp.status_code == 415:
-        return {"ok": False, "detail": "전송 형식 오류. multipart(media/params) 구성 확인."}
+        return "전송 형식 오류. multipart(media/params) 구성 확인."
     if resp.status_code == 400:
-        return {"ok": False, "detail": f"요청 파라미터 오류: {resp.text}"}  # (이전 'speaker detect is off' 같은 케이스)
+        return f"요청 파라미터 오류: {resp.text}"  # (이전 'speaker detect is off' 같은 케이스)
     if resp.status_code != 200:
-        return {"ok": False, "detail": f"HTTP {resp.status_code}: {resp.text}"}
+        return f"HTTP {resp.status_code}: {resp.text}"
+    return None
 
-    # 결과 저장
+
+def _parse_clova_response(resp) -> tuple[str, list]:
+    """(전체 텍스트, segments 배열). segments 는 [{start, end, text, ...}] (ms 단위)"""
     try:
         data = resp.json()
         text = data.get("text") or data.get("result") or json.dumps(data, ensure_ascii=False)
+        segments = data.get("segments") or []
     except Exception:
-        text = resp.text
-    text = (text or "").strip()
+        text, segments = resp.text, []
+    return (text or "").strip(), segments
+
 
+def _save_transcript(transcript_dir: str, text: str, segments: list) -> dict:
     transcript_path = os.path.join(transcript_dir, "transcript.txt")
     try:
-        with open(transcript_path, "w", encoding="utf-8") as fw:
-            fw.write(text)
-        print("✅ transcript 저장:", transcript_path)
+        # 청크 분할/타임스탬프 매핑용 세그먼트 원본을 먼저 두고 transcript 를 마지막에 바꿔 끼운다
+        _write_json(os.path.join(transcript_dir, "stt_segments.json"), segments)
+        _write_text(transcript_path, text)
+        log.debug("✅ transcript 저장: %s", transcript_path)
     except Exception as e:
-        print("⚠️ transcript 저장 실패:", e)
-        return {"ok": True, "text": text, "detail": f"저장 실패: {e}"}
+        log.warning("⚠️ transcript 저장 실패: %s", e)
+        return {"ok": True, "text": text, "segments": segments, "detail": f"저장 실패: {e}"}
 
-    return {"ok": True, "text": text, "transcript_path": transcript_path}
+    return {"ok": True, "text": text, "segments": segments, "transcript_path": transcript_path}
 
 
+def Start_STT(out_path: str, class_id: str, mode: str | None = None) -> dict:
+    """
+    mode: "sync"(기본, 파일 통째로 1회 요청) | "segmented"(무음 경계로 나눠 병렬 요청)
+          None 이면 STT_MODE 환경변수를 따른다.
+    """
+    mode = (mode or os.getenv("STT_MODE", "sync")).lower()
+    if mode == "segmented":
+        return Start_STT_segmented(out_path, class_id)
+
+    log.info(f"▶️ [STT] 시작: {out_path} (class_id={class_id})")
 
-def _load_openai_clients():
-    # ../backend/.env 로드
-    env_path = os.path.join(os.path.dirname(__file__), "../backend/.env")
-    if os.path.exists(env_path):
-        load_dotenv(env_path)
-    print("env_path in _load_openai_clients:", env_path)
-
-    use_gms_openai = os.getenv("USE_GMS_OPENAI", "false").lower() == "true"
-    openai_key = os.getenv("OPENAI_API_KEY", "").strip()
-
-    if use_gms_openai:
-        gms_key = os.getenv("GMS_KEY", "").strip()
-        gms_openai_base = os.getenv("GMS_OPENAI_BASE", "").strip().rstrip("/")
-        if not gms_key or not gms_openai_base:
-            raise RuntimeError("USE_GMS_OPENAI=true 인데 GMS_KEY 또는 GMS_OPENAI_BASE 가 비어 있습니다.")
-        # GMS 프록시 경유 (중요: /v1 붙이기)
-        client = OpenAI(api_key=gms_key, base_url=gms_openai_base + "/v1")
-    else:
-        if not openai_key:
-            raise RuntimeError("OPENAI_API_KEY 가 필요합니다.")
-        client = OpenAI(api_key=openai_key)
+    cfg = _clova_config()
+    if not cfg["ok"]:
+        return cfg
+    endpoint, secret = cfg["endpoint"], cfg["secret"]
+    if not os.path.isfile(out_path):
+        return {"ok": False, "detail": f"파일 없음: {out_path}"}
+
+    size = os.path.getsize(out_path)
+    debug = log.isEnabledFor(logging.DEBUG)
+    if debug:
+        # 파일 헤더/크기 로그
+        log.debug(f"📦 업로드 파일 크기: {size} bytes, 헤더: {_peek_header(out_path, 12)!r}")
+
+        # 재현용 curl
+        safe_path = out_path.replace("\\", "/")
+        log.debug("🐚 curl 예시:")
+        log.debug(
+            'curl -X POST "{url}" '
+            '-H "X-CLOVASPEECH-API-KEY: {key}" '
+            '-H "Accept: application/json;UTF-8" '
+            '-F "media=@{path}" '
+            '-F "params={params};type=application/json"'
+            .format(url=endpoint, key=(secret[:6] + "…"),
+                    path=safe_path, params=json.dumps(CLOVA_REQUEST_BODY, ensure_ascii=False))
+        )
+
+    started = time.time()
+    try:
+        resp = _post_clova(cfg, (os.path.basename(out_path), [(out_path, 0, size)], "audio/wav"), timeout=600)
+    except requests.Timeout as e:
+        log.warning("⏱️ 타임아웃: %s", e)
+        return {"ok": False, "detail": f"요청 타임아웃: {e}"}
+    except Exception as e:
+        log.warning("⚠️ 요청 예외: %s", e)
+        return {"ok": False, "detail": f"요청 실패: {e}"}
+
+    took = time.time() - started
+    ctype = resp.headers.get("content-type", "")
+    log.info(f"✅ 응답: status={resp.status_code}, content-type={ctype}, took={took:.2f}s")
+    transcript_dir = os.path.dirname(out_path)
+    if debug:
+        log.debug("🔁 resp headers: %s", dict(resp.headers))
+        log.debug("📝 응답 미리보기: %s", (resp.text or "")[:300].replace("\n", " "))
 
-    clean_model   = os.getenv("OPENAI_CLEAN_MODEL",   "gpt-4o-mini")
-    summary_model = os.getenv("OPENAI_SUMMARY_MODEL", "gpt-4o-mini")
-    return client, clean_model, summary_model
+        # 응답 덤프
+        debug_path = os.path.join(transcript_dir, "stt_response_debug.txt")
+        try:
+            with open(debug_path, "w", encoding="utf-8") as fw:
+                fw.write(f"HTTP {resp.status_code}\nContent-Type: {ctype}\nTook: {took:.2f}s\n\n")
+                fw.write(resp.text or "")
+            log.debug("💾 응답 덤프: %s", debug_path)
+        except Exception as e:
+            log.debug("⚠️ 응답 덤프 저장 실패: %s", e)
 
+    detail = _clova_error_detail(resp)
+    if detail:
+        return {"ok": False, "detail": detail}
 
-def summarize_text_auto(transcript_path: str, out_dir: str) -> dict:
-   
+    # 결과 저장
+    text, segments = _parse_clova_response(resp)
+    return _save_transcript(transcript_dir, text, segments)
+
+
+# ─────────────────────────────────────────────────────────────
+# 분할 STT: 병합 PCM 을 무음 근처에서 잘라 세그먼트별로 동시에 요청하고,
+# 돌아온 segments 의 start/end 를 원본 기준으로 보정해 이어 붙인다.
+#   STT_SEGMENT_SEC          : 세그먼트 목표 길이 (기본 300초)
+#   STT_SEGMENT_SEARCH_SEC   : 목표 지점 ± 이 범위에서 가장 조용한 곳을 자름 (기본 15초)
+#   STT_SEGMENT_CONCURRENCY  : 동시 요청 수 (기본 4)
+#   STT_SEGMENT_RETRIES      : 세그먼트별 재시도 횟수 (기본 2)
+#   STT_SEGMENT_TIMEOUT      : 세그먼트 요청 타임아웃 (기본 180초)
+# ─────────────────────────────────────────────────────────────
+def _silence_cut_points(path: str, info: dict, seg_sec: float, search_sec: float) -> list[int]:
+    """세그먼트 경계(프레임 인덱스) 목록. [0, c1, c2, ..., nframes]"""
+    rate, ch, width = info["framerate"], info["channels"], info["sampwidth"]
+    nframes = info["data_size"] // (ch * width)
+    seg = int(seg_sec * rate)
+    if seg <= 0 or nframes <= seg:
+        return [0, nframes]
+
+    win = max(1, int(0.02 * rate))  # 20ms 에너지 프레임
+    search = int(search_sec * rate)
+    pcm = None
+    if width == 2:
+        pcm = np.memmap(path, dtype="<i2", mode="r", offset=info["data_offset"], shape=(nframes * ch,))
+
+    cuts = [0]
+    target = seg
+    while target < nframes - seg // 4:  # 마지막 조각이 너무 짧으면 앞 세그먼트에 붙임
+        cut = target
+        if pcm is not None and search > win:
+            lo = max(cuts[-1] + win, target - search)
+            hi = min(nframes, target + search)
+            frames = (hi - lo) // win
+            if frames > 0:
+                x = np.asarray(pcm[lo * ch:(lo + frames * win) * ch], dtype=np.float32)
+                if ch > 1:
+                    x = x.reshape(-1, ch).mean(axis=1)
+                energy = np.square(x.reshape(frames, win)).mean(axis=1)
+                cut = lo + int(np.argmin(energy)) * win + win // 2
+        cuts.append(cut)
+        target = cut + seg
+    cuts.append(nframes)
+    return cuts
+
+
+def _segment_media(path: str, info: dict, start: int, end: int, idx: int):
+    """세그먼트용 헤더 + 병합 파일의 PCM 바이트 구간 (복사본을 만들지 않는다)"""
+    block = info["channels"] * info["sampwidth"]
+    nbytes = (end - start) * block
+    hdr = _wav_header(info["channels"], info["sampwidth"], info["framerate"], nbytes)
+    return (f"segment_{idx:04d}.wav", [hdr, (path, info["data_offset"] + start * block, nbytes)], "audio/wav")
+
+
+def _stt_one_segment(cfg: dict, path: str, info: dict, start: int, end: int, idx: int) -> dict:
+    retries = int(os.getenv("STT_SEGMENT_RETRIES", "2"))
+    timeout = float(os.getenv("STT_SEGMENT_TIMEOUT", "180"))
+    detail = None
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(min(30.0, 2.0 ** attempt))
+        started = time.time()
+        try:
+            resp = _post_clova(cfg, _segment_media(path, info, start, end, idx), timeout=timeout)
+        except Exception as e:
+            detail = f"요청 실패: {e}"
+            log.warning(f"⚠️ [STT seg {idx}] 시도 {attempt + 1} 실패: {e}")
+            continue
+        detail = _clova_error_detail(resp)
+        if detail is None:
+            text, segments = _parse_clova_response(resp)
+            log.debug(f"✅ [STT seg {idx}] {(end - start) / info['framerate']:.1f}s, took={time.time() - started:.2f}s")
+            return {"ok": True, "idx": idx, "text": text, "segments": segments, "attempts": attempt + 1}
+        log.warning(f"⚠️ [STT seg {idx}] 시도 {attempt + 1} HTTP {resp.status_code}")
+        if resp.status_code in (400, 401, 403, 404, 415):
+            break  # 재시도해도 같은 결과
+    return {"ok": False, "idx": idx, "detail": detail, "attempts": attempt + 1}
+
+
+def Start_STT_segmented(out_path: str, class_id: str) -> dict:
+    log.info(f"▶️ [STT] 분할 모드 시작: {out_path} (class_id={class_id})")
+
+    cfg = _clova_config()
+    if not cfg["ok"]:
+        return cfg
+    if not os.path.isfile(out_path):
+        return {"ok": False, "detail": f"파일 없음: {out_path}"}
     try:
-        oai, clean_model, summary_model = _load_openai_clients()
-        env_path = os.path.normpath(os.path.join(os.path.dirname(__file__), "../backend/.env"))
-        if os.path.exists(env_path):
-            load_dotenv(env_path)
-
-        use_claude = os.getenv("USE_GMS_CLAUDE", "false").lower() == "true"
-        gms_key    = os.getenv("GMS_KEY", "").strip()
-        
-        gms_base = os.getenv("GMS_ANTHROPIC_BASE", "https://gms.ssafy.io/gmsapi/api.anthropic.com").rstrip("/")
-        
-        if not os.path.isfile(transcript_path):
-            return {"ok": False, "detail": f"transcript 없음: {transcript_path}"}
+        info = _read_wav_info(out_path)
+    except ValueError as ve:
+        return {"ok": False, "detail": str(ve)}
 
-        with open(transcript_path, "r", encoding="utf-8") as f:
-            raw = f.read()
+    cuts = _silence_cut_points(out_path, info,
+                               float(os.getenv("STT_SEGMENT_SEC", "300")),
+                               float(os.getenv("STT_SEGMENT_SEARCH_SEC", "15")))
+    bounds = list(zip(cuts[:-1], cuts[1:]))
+    concurrency = max(1, int(os.getenv("STT_SEGMENT_CONCURRENCY", "4")))
+    log.debug(f"✂️ [STT] {len(bounds)} segments, concurrency={concurrency}")
 
-        def chunk_text(text: str, max_chars: int):
-            chunks, buf = [], []
-            for line in text.splitlines(keepends=True):
-                if sum(len(x) for x in buf) + len(line) > max_chars and buf:
-                    chunks.append("".join(buf)); buf = []
-                buf.append(line)
-            if buf: chunks.append("".join(buf))
-            return chunks
-
-        def pick_local_font() -> str | None:
-            # 0) ENV가 최우선
-            font_env = os.getenv("PDF_FONT_PATH", "").strip()
-            if font_env and os.path.exists(font_env):
-                return font_env
-
-            # 1) FastAPIProject/fonts (main.py와 같은 폴더)
-            candidates = [
-                os.path.join(HERE, "fonts"),
-                os.path.normpath(os.path.join(HERE, "..", "backend", "fonts")),  # 백엔드 쪽도 fallback
-            ]
-            for d in candidates:
-                if not os.path.isdir(d):
-                    continue
-                # 우선순위로 NotoSansKR-Regular 우선
-                for name in ("NotoSansKR-Regular.ttf", "NotoSansKR-Regular.otf"):
-                    p = os.path.join(d, name)
-                    if os.path.exists(p):
-                        return p
-                # 아무 ttf/otf 하나라도
-                for fn in os.listdir(d):
-                    if fn.lower().endswith((".ttf", ".otf")):
-                        return os.path.join(d, fn)
-            return None
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(_stt_one_segment, cfg, out_path, info, s, e, i)
+                   for i, (s, e) in enumerate(bounds)]
+        results = [f.result() for f in futures]
 
-        def markdown_to_pdf(md_text: str, pdf_path: str):
-            font_path = pick_local_font()
-            pdf = FPDF(format="A4", unit="mm")
-            pdf.set_auto_page_break(auto=True, margin=15)
-            pdf.add_page()
-            if font_path and os.path.exists(font_path):
-                pdf.add_font("KR", "", font_path, uni=True)
-                pdf.add_font("KR-B", "", font_path, uni=True)
-                pdf.add_font("KR-Mono", "", font_path, uni=True)
-                base, bold, mono = "KR", "KR-B", "KR-Mono"
-                pdf.set_font(base, size=12)
-            else:
-                base, bold, mono = "Arial", "Arial", "Courier"  # 한글 깨질 수 있음
-                pdf.set_font(base, size=12)
-            in_code = False
-            for raw_line in md_text.splitlines():
-                line = raw_line.rstrip("\n")
-                if line.strip().startswith("```"):
-                    in_code = not in_code
-                    pdf.set_font(mono if in_code else base, size=10 if in_code else 12)
-                    continue
-                if in_code:
-                    pdf.multi_cell(0, 6, txt=line); continue
-                if line.startswith("### "):
-                    pdf.set_font(bold, size=12); pdf.multi_cell(0,7,line[4:].strip()); pdf.set_font(base,12); pdf.ln(1); continue
-                if line.startswith("## "):
-                    pdf.set_font(bold, size=14); pdf.multi_cell(0,8,line[3:].strip()); pdf.set_font(base,12); pdf.ln(1); continue
-                if line.startswith("# "):
-                    pdf.set_font(bold, size=16); pdf.multi_cell(0,9,line[2:].strip()); pdf.set_font(base,12); pdf.ln(1); continue
-                if line.strip().startswith("- "):
-                    pdf.multi_cell(0,6,"• "+line.strip()[2:]); continue
-                if not line.strip():
-                    pdf.ln(1); continue
-                pdf.multi_cell(0,6,line)
-            pdf.output(pdf_path)
-
-        # 1) 전처리(clean) — OpenAI
-        system_clean = (
-            "너는 한국어 전사 텍스트를 정제하는 도우미다. "
-            "원문 의미를 보존하고 환각을 피한다. "
-            "해야 할 일: 문장 경계/문장부호 복원, 띄어쓰기·맞춤법 보정, 중복/잡음 최소화. "
-            "불명확하면 [불명확]로 표기하고 임의로 보충하지 않는다."
-        )
-        o3_max = int(os.getenv("O3_CHUNK_CHARS", "9000"))
-        clean_chunks = []
-        for i, ch in enumerate(chunk_text(raw, o3_max), 1):
-            prompt = (
-                "아래 한국어 텍스트를 의미 왜곡 없이 정리하세요.\n"
-                "- 문장부호/문장 경계 복원, 띄어쓰기/맞춤법 보정\n"
-                "- 명백한 중복/잡음은 간단히 정리(사실 추가/삭제 금지)\n"
-                "- 고유명사가 한국어 음역일 때, 맥락이 명확하면 원어(예: C++)로 복원\n"
-                "- 불명확하면 [불명확] 표기\n\n"
-                f"{ch}"
+    failed = [r for r in results if not r["ok"]]
+    transcript_dir = os.path.dirname(out_path)
+    if log.isEnabledFor(logging.DEBUG):
+        # 응답 덤프 (단일 요청 모드와 같이 DEBUG 에서만)
+        debug_path = os.path.join(transcript_dir, "stt_response_debug.txt")
+        try:
+            with open(debug_path, "w", encoding="utf-8") as fw:
+                fw.write(f"SEGMENTED {len(bounds)} segments, failed={len(failed)}, took={time.time() - started:.2f}s\n\n")
+                fw.write(json.dumps(results, ensure_ascii=False))
+            log.debug("💾 응답 덤프: %s", debug_path)
+        except Exception as e:
+            log.debug("⚠️ 응답 덤프 저장 실패: %s", e)
+    if failed:
+        return {"ok": False,
+                "detail": f"STT 세그먼트 {len(failed)}/{len(bounds)}개 실패: "
+                          + "; ".join(f"#{r['idx']} {r['detail']}" for r in failed)}
+
+    # 세그먼트 오프셋 보정 후 이어 붙이기
+    texts, segments = [], []
+    for (start, _), r in zip(bounds, results):
+        offset_ms = int(round(start * 1000 / info["framerate"]))
+        if r["text"]:
+            texts.append(r["text"])
+        for seg in r["segments"]:
+            seg = dict(seg)
+            seg["start"] = seg.get("start", 0) + offset_ms
+            seg["end"] = seg.get("end", 0) + offset_ms
+            if seg.get("words"):
+                seg["words"] = [[w[0] + offset_ms, w[1] + offset_ms, *w[2:]] for w in seg["words"]]
+            segments.append(seg)
+    log.info(f"✅ [STT] 분할 모드 완료: took={time.time() - started:.2f}s")
+    return _save_transcript(transcript_dir, " ".join(texts), segments)
 
-            )
-            try:
-                resp = oai.responses.create(
-                    model=clean_model,
-                    input=[
-                        {"role":"system","content": system_clean},
-                        {"role":"user","content": prompt}
-                    ],
-                    temperature=0.2,
-                    max_output_tokens=2000,
-                )
-                clean_chunks.append(resp.output_text.strip())
-            except Exception:
-                comp = oai.chat.completions.create(
-                    model=clean_model,
-                    messages=[
-                        {"role":"system","content": system_clean},
-                        {"role":"user","content": prompt}
-                    ],
-                    temperature=0.2,
-                )
-                clean_chunks.append(comp.choices[0].message.content.strip())
-        cleaned = "\n\n".join(clean_chunks)
-        cleaned_path = os.path.join(out_dir, "cleaned.txt")
-        with open(cleaned_path, "w", encoding="utf-8") as fw:
-            fw.write(cleaned)
 
-        # 2) 맵 요약 — OpenAI
-        system_summarize = (
-            
-            
-            "너는 정확한 한국어 필기자다. 환각 없이 핵심을 구조화하고, "
-            "수식은 입력에 실제 언급된 경우에만 ```math 블록을 사용한다."
-        )
-        sum_max = int(os.getenv("OAI_SUMMARY_CHARS", "8000"))
-        map_notes = []
-        for i, ch in enumerate(chunk_text(cleaned, sum_max), 1):
-            prompt = (
-                 "아래 텍스트를 한국어 강의 노트로 요약하세요.\n"
-                "- 핵심 포인트 3~6개 불릿\n"
-                "- 수학/과학/공학 등에서 실제 언급된 공식이 있으면 ```math 블록으로 표기\n"
-                "- 입력에 없는 사실 금지, 불명확하면 [불명확]\n\n"
-                f"{ch}"
-            )
+def _load_openai_clients():
+    """공유 OpenAI 클라이언트와 모델명. 자격증명이 없으면 RuntimeError"""
+    if settings.use_gms_openai:
+        if not settings.gms_key or not settings.gms_openai_base:
+            raise RuntimeError("USE_GMS_OPENAI=true 인데 GMS_KEY 또는 GMS_OPENAI_BASE 가 비어 있습니다.")
+    elif not settings.openai_api_key:
+        raise RuntimeError("OPENAI_API_KEY 가 필요합니다.")
+    client = _clients().openai
+    return client, settings.openai_clean_model, settings.openai_summary_model
+
+
+# ─────────────────────────────────────────────────────────────
+# LLM 응답 디스크 캐시: 키 = sha256(provider, model, system, user, temperature, chat_system, max_output_tokens)
+# 업로드/PDF 실패 후 server.js 가 재시도해도 같은 입력은 토큰을 다시 쓰지 않는다.
+#   LLM_CACHE_DIR     : 캐시 디렉토리 (기본 MERGE_OUT_DIR/.llm_cache)
+#   LLM_CACHE_MAX_MB  : 용량 상한, 넘으면 가장 오래 안 쓴(mtime) 항목부터 삭제 (기본 256)
+#   LLM_CACHE_BYPASS  : true 면 읽기/쓰기 모두 건너뜀 (요청 본문 "no_cache": true 와 동일)
+# ─────────────────────────────────────────────────────────────
+class LLMCache:
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = self.misses = self.writes = self.evictions = 0
+        self._size = None  # 첫 put 때 디렉토리를 스캔해 채움
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(provider: str, model: str, system: str, user: str, temperature,
+            chat_system: str | None = None, max_output_tokens: int | None = None) -> str:
+        raw = json.dumps([provider, model, system, user, temperature, chat_system, max_output_tokens],
+                         ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def get(self, key: str) -> str | None:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)["text"]
+            os.utime(path)  # LRU: 마지막 사용 시각 = mtime
+        except (FileNotFoundError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, key: str, text: str):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps({"text": text, "created_at": time.time()}, ensure_ascii=False).encode("utf-8")
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "wb") as fw:
+            fw.write(data)
+        os.replace(tmp, path)
+        with self._lock:
+            self.writes += 1
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if name.endswith(".json"):
+                    p = os.path.join(root, name)
+                    try:
+                        st = os.stat(p)
+                    except FileNotFoundError:
+                        continue
+                    yield p, st.st_size, st.st_mtime
+
+    def _evict(self):
+        """용량의 90% 까지 mtime 오래된 순으로 삭제 (lock 보유 상태에서 호출)"""
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        size = sum(e[1] for e in entries)
+        target = int(self.max_bytes * 0.9)
+        for p, sz, _ in entries:
+            if size <= target:
+                break
             try:
-                resp = oai.responses.create(
-                    model=summary_model,
-                    input=[
-                        {"role":"system","content": system_summarize},
-                        {"role":"user","content": prompt}
-                    ],
-                    temperature=0.3,
-                    max_output_tokens=2200,
-                )
-                map_notes.append(resp.output_text.strip())
-            except Exception:
-                comp = oai.chat.completions.create(
-                    model=summary_model,
-                    messages=[
-                        {"role":"system","content": system_summarize},
-                        {"role":"user","content": prompt}
-                    ],
-                    temperature=0.3,
-                )
-                map_notes.append(comp.choices[0].message.content.strip())
-
-        notes_joined = "\n\n---\n\n".join(map_notes)
-
-        # 3) 최종 리듀스 — Claude via GMS (우선)
-        final_md = None
-        if use_claude and gms_key:
-            url = f"{gms_base}/v1/messages"
-            headers = {
-                "Content-Type": "application/json",
-                "x-api-key": gms_key,
-                "anthropic-version": "2023-06-01",
-            }
-            payload = {
-                "model": "claude-3-7-sonnet-latest",
-                "max_tokens": 4500,
-                "system": "너는 한국어 기술 문서 작성자다. 부분 요약들을 하나의 일관된 마크다운 문서로 통합하라. 중복 제거, 용어/표기 통일, 사실 보존, 환각 금지.",
-                "messages": [
-                    {"role": "user", "content":
-                        "다음 '부분 요약 노트'를 통합해 하나의 강의 문서를 만들어라.\n"
-                        "- 섹션: # 요약(5~8문장), ## 핵심 개념(불릿으로 리스트), ## 수식/정의(수학/과학 등 수식이 있는 경우만, ```math)\n"
-                        "- 중복 제거, 용어 일관성 유지, 사실 추가/삭제 금지\n\n"
-                        f"{notes_joined}"
-                    }
-                ],
+                os.remove(p)
+            except FileNotFoundError:
+                pass
+            size -= sz
+            self.evictions += 1
+        self._size = size
+
+    def stats(self) -> dict:
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            total = self.hits + self.misses
+            return {
+                "dir": self.cache_dir,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "bypass": _llm_cache_bypass(),
             }
-            r = requests.post(url, headers=headers, data=json.dumps(payload), timeout=120)
-            if r.status_code == 200:
-                j = r.json()
-                content = j.get("content", [])
-                if content and isinstance(content, list) and isinstance(content[0], dict) and "text" in content[0]:
-                    final_md = content[0]["text"].strip()
-            else:
-                print("[GMS Claude] HTTP", r.status_code, r.text[:200])
 
-        # 폴백 — OpenAI reduce
-        if not final_md:
-            prompt = (
-                "다음 요약 노트 묶음을 하나의 문서로 통합하세요. "
-                "중복 제거, 용어 일관성 유지, 사실추가 금지. "
-                "출력은 Markdown으로 하고 아래 섹션을 포함:\n"
-                "1) 요약(5~8문장)\n"
-                "2) 핵심 개념 리스트\n"
-                "3) 수학, 과학, 공학과 같이 공식이 필요, 언급 되거나 공식이 있으면 설명이 잘 된다면 수식을 표기해줘\n"
-                f"{notes_joined}"
-            )
-            try:
-                resp = oai.responses.create(
-                    model=summary_model,
-                    input=[
-                        {"role":"system","content":
-                         """
-                        내가 한국어로 작성된 방대한 텍스트를 너에게 줄게. 
-                        텍스트 내용은 선생님이 학생들에게 가르친 내용, 즉 수업 내용이야. 
-                        따라서 텍스트는 수학, 언어, 과학, 역사, 경제, 공학 등 초,중,고, 대학교를 포함해 주식, 부동산 등 다양한 내용일 수 있어. 
-                        텍스트는 정말 많은 단어를 포함하고 있기 때문에 나는 텍스트를 잘 요약해서 학생들에게 주고 싶어. 
-                        따라서 텍스트에 있는 수업 내용만을 포함하고, hallucinations를 피하고, 한국어 깔끔한 한국어 Markdown을 작성해줘. 
-                        """},
-                        {"role":"user","content":prompt}
-                    ],
-                    temperature=0.3,
-                    max_output_tokens=3000,
-                )
-                final_md = resp.output_text.strip()
-            except Exception:
-                comp = oai.chat.completions.create(
-                    model=summary_model,
-                    messages=[
-                        {"role":"system","content":"You are a senior Korean technical writer. Merge partial notes into one coherent Markdown document."},
-                        {"role":"user","content":prompt}
-                    ],
-                    temperature=0.3,
-                )
-                final_md = comp.choices[0].message.content.strip()
 
-        # 4) 저장 & PDF
-        summary_md_path  = os.path.join(out_dir, "summary.md")
-        summary_pdf_path = os.path.join(out_dir, "summary.pdf")
-        with open(summary_md_path, "w", encoding="utf-8") as fw:
-            fw.write(final_md)
+def _llm_cache_bypass() -> bool:
+    return os.getenv("LLM_CACHE_BYPASS", "false").lower() == "true"
 
-        try:
-            markdown_to_pdf(final_md, summary_pdf_path)
-        except Exception as pdf_err:
-            # 폰트 등으로 실패해도 PDF 파일은 만든다(내용이 일부 깨질 수 있음)
-            print(f"[PDF] markdown_to_pdf 실패, fallback 실행: {pdf_err}")
-            pdf = FPDF(format="A4", unit="mm")
-            pdf.set_auto_page_break(auto=True, margin=15)
-            pdf.add_page()
-            pdf.set_font("Arial", size=12)
-            for line in final_md.splitlines():
-                pdf.multi_cell(0, 6, line)
-            pdf.output(summary_pdf_path)
-
-        print("✅ summary 저장:", summary_md_path, " / ", summary_pdf_path)
 
-        return {
-            "ok": True,
-            "summary_path": summary_md_path,
-            "summary_pdf_path": summary_pdf_path,
-            "clean_path": cleaned_path,
-        }
+_llm_cache = LLMCache(
+    os.environ.get("LLM_CACHE_DIR", os.path.join(MERGE_OUT_DIR, ".llm_cache")),
+    int(float(os.environ.get("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024),
+)
+LLM_CACHE_REQUESTS = Counter(
+    "llm_cache_requests_total", "LLM 응답 캐시 조회 결과", ("result",),
+    collect=lambda: (lambda st: {("hit",): st["hits"], ("miss",): st["misses"]})(_llm_cache.stats()),
+)
+LLM_CACHE_BYTES = Gauge("llm_cache_size_bytes", "LLM 응답 캐시 디스크 사용량",
+                        collect=lambda: {(): _llm_cache.stats()["size_bytes"]})
 
-    except Exception as e:
-        traceback.print_exc()
-        return {"ok": False, "detail": f"summarize_text_auto 실패: {e}"}
 
+def _llm_text(oai, model: str, system: str, user: str, temperature: float,
+              max_output_tokens: int | None = None, chat_system: str | None = None,
+              use_cache: bool = True, on_token=None) -> str:
+    """
+    Responses API 우선, 미지원으로 확인된 (base_url, model) 은 바로 Chat Completions 로 보낸다.
+    429 는 폴백하지 않고 그대로 올린다.
+    같은 (provider, model, system, user, temperature, chat_system, max_output_tokens) 결과는 디스크 캐시에서 돌려준다.
+    on_token: 주면 스트리밍으로 받아 조각마다 on_token(text) 를 부른다 (캐시 적중 시 전체를 한 번)
+    """
+    key = _llm_cache.key(f"openai:{oai.base_url}", model, system, user, temperature,
+                         chat_system, max_output_tokens)
+    if use_cache:
+        hit = _llm_cache.get(key)
+        if hit is not None:
+            if on_token:
+                on_token(hit)
+            return hit
+    text = _llm_text_uncached(oai, model, system, user, temperature, max_output_tokens, chat_system, on_token)
+    if use_cache and text:
+        _llm_cache.put(key, text)
+    return text
+
+
+# ─────────────────────────────────────────────────────────────
+# Responses API 지원 여부 탐지: (base_url, model) 마다 한 번 시도해 본 결과를 기억하고
+# 이후 호출은 바로 동작하는 API 로 보낸다. 404/405/501 처럼 "엔드포인트 없음" 만 미지원으로 보고,
+# 그 밖의 오류(5xx, 인증, 모델/배포가 없다는 404 등)는 이번 호출만 Chat Completions 로 넘기고 기록하지 않는다.
+#   LLM_PROBE_TTL_SEC : 탐지 결과 유지 시간 (기본 3600, 지나면 다시 Responses API 를 시도)
+# ─────────────────────────────────────────────────────────────
+_api_probe: dict[tuple[str, str], tuple[str, float]] = {}
+_api_probe_lock = threading.Lock()
+
+
+def _probed_api(oai, model: str) -> str | None:
+    """"responses" | "chat" | None(아직 모름/만료)"""
+    ttl = float(os.getenv("LLM_PROBE_TTL_SEC", "3600"))
+    with _api_probe_lock:
+        hit = _api_probe.get((str(oai.base_url), model))
+    if hit and time.time() - hit[1] < ttl:
+        return hit[0]
+    return None
+
+
+def _remember_api(oai, model: str, api: str):
+    with _api_probe_lock:
+        prev = _api_probe.get((str(oai.base_url), model))
+        _api_probe[(str(oai.base_url), model)] = (api, time.time())
+    if not prev or prev[0] != api:
+        log.info(f"🔎 [LLM] {oai.base_url} {model} → {api}")
+
+
+def _is_unsupported_api(e: Exception) -> bool:
+    """엔드포인트(경로) 자체가 없을 때만 True. 모델/배포가 없는 404 는 chat 으로 가도 같으므로 기록하지 않는다"""
+    status = getattr(e, "status_code", None)
+    if status in (405, 501):
+        return True
+    if status != 404 and type(e).__name__ != "NotFoundError":
+        return False
+    code = str(getattr(e, "code", None) or "").lower()
+    message = str(e).lower()
+    return not ("model" in code or "deployment" in code or "model" in message or "deployment" in message)
 
-def send_summary_to_api(class_id: str, meeting_id: str | None, md_path: str | None, pdf_path: str | None) -> dict:
-    
-    try:
-        env_path = os.path.join(os.path.dirname(__file__), "../backend/.env")
-        if os.path.exists(env_path):
-            load_dotenv(env_path)
 
-        url = os.getenv("SUMMARY_UPLOAD_URL", "").strip()
-        api_key = os.getenv("SUMMARY_UPLOAD_API_KEY", "").strip()
-        if not url:
-            return {"ok": False, "detail": "SUMMARY_UPLOAD_URL 미설정"}
+def api_probe_stats() -> dict:
+    now = time.time()
+    with _api_probe_lock:
+        return {f"{base} {model}": {"api": api, "age_sec": round(now - at, 1)}
+                for (base, model), (api, at) in _api_probe.items()}
 
-        headers = {"Accept": "application/json"}
-        if api_key:
-            headers["Authorization"] = f"Bearer {api_key}"
 
-        files = {}
-        if md_path and os.path.isfile(md_path):
-            files["summary_md"] = ("summary.md", open(md_path, "rb"), "text/markdown; charset=utf-8")
-        if pdf_path and os.path.isfile(pdf_path):
-            files["summary_pdf"] = ("summary.pdf", open(pdf_path, "rb"), "application/pdf")
+def _usage_tokens(usage, *names) -> int | None:
+    for name in names:
+        v = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+        if isinstance(v, int):
+            return v
+    return None
 
-        if not files:
-            return {"ok": False, "detail": "전송할 파일이 없습니다.(md/pdf 없음)"}
 
-        data = {"class_id": str(class_id), "meeting_id": meeting_id}
-        resp = requests.post(url, headers=headers, data=data, files=files, timeout=60)
+def _count_llm(provider: str, started: float, prompt: str, text: str | None, usage=None):
+    """호출 지연과 입력/출력 토큰을 센다. 스트리밍처럼 usage 가 없으면 _estimate_tokens 로 추정"""
+    LLM_SECONDS.observe(time.time() - started, provider=provider)
+    tokens_in = _usage_tokens(usage, "input_tokens", "prompt_tokens") if usage else None
+    tokens_out = _usage_tokens(usage, "output_tokens", "completion_tokens") if usage else None
+    LLM_TOKENS.inc(tokens_in if tokens_in is not None else _estimate_tokens(prompt),
+                   provider=provider, direction="in")
+    LLM_TOKENS.inc(tokens_out if tokens_out is not None else _estimate_tokens(text or ""),
+                   provider=provider, direction="out")
 
-        # 파일 핸들 닫기
-        for f in files.values():
-            try: f[1].close()
-            except: pass
 
-        if 200 <= resp.status_code < 300:
-            return {"ok": True, "status": resp.status_code, "text": (resp.text or "")[:200]}
-        return {"ok": False, "status": resp.status_code, "text": (resp.text or "")[:200]}
+def _llm_text_uncached(oai, model, system, user, temperature, max_output_tokens, chat_system,
+                       on_token=None) -> str:
+    stream = {"stream": True} if on_token else {}
+    started = time.time()
+    if _probed_api(oai, model) != "chat":
+        try:
+            kwargs = {"max_output_tokens": max_output_tokens} if max_output_tokens else {}
+            resp = oai.responses.create(
+                model=model,
+                input=[
+                    {"role":"system","content": system},
+                    {"role":"user","content": user}
+                ],
+                temperature=temperature,
+                **kwargs,
+                **stream,
+            )
+            _remember_api(oai, model, "responses")
+            if on_token:
+                text, usage = _collect_stream(resp, on_token), None
+            else:
+                text, usage = resp.output_text.strip(), getattr(resp, "usage", None)
+            _count_llm("openai", started, system + user, text, usage)
+            return text
+        except Exception as e:
+            if _is_rate_limited(e):
+                raise
+            if _is_unsupported_api(e):
+                _remember_api(oai, model, "chat")
+            else:
+                log.warning(f"[LLM] responses 실패, 이번 호출만 chat 으로 재시도: {type(e).__name__}: {e}")
+    comp = oai.chat.completions.create(
+        model=model,
+        messages=[
+            {"role":"system","content": chat_system or system},
+            {"role":"user","content": user}
+        ],
+        temperature=temperature,
+        **stream,
+    )
+    if on_token:
+        text, usage = _collect_stream(comp, on_token), None
+    else:
+        text, usage = comp.choices[0].message.content.strip(), getattr(comp, "usage", None)
+    _count_llm("openai", started, (chat_system or system) + user, text, usage)
+    return text
 
-    except Exception as e:
-        return {"ok": False, "detail": f"업로드 실패: {e}"}
 
-def cleanup_class_dir(class_dir: str) -> dict:
-    try:
-        if not os.path.isdir(class_dir):
-            return {"ok": False, "detail": f"디렉토리 없음: {class_dir}"}
+def _collect_stream(events, on_token) -> str:
+    """Responses(response.output_text.delta) / Chat Completions(chunk.choices[0].delta) 스트림을 모은다"""
+    parts = []
+    for ev in events:
+        if getattr(ev, "type", None) == "response.output_text.delta":
+            delta = ev.delta
+        elif getattr(ev, "choices", None):
+            delta = ev.choices[0].delta.content
+        else:
+            continue
+        if delta:
+            parts.append(delta)
+            on_token(delta)
+    return "".join(parts).strip()
 
-        base = os.path.realpath(MERGE_OUT_DIR)
-        target = os.path.realpath(class_dir)
 
-        if os.path.dirname(target) != base:
-            return {"ok": False, "detail": f"허용 경로 아님: {target} (base={base})"}
+def _is_rate_limited(e: Exception) -> bool:
+    return getattr(e, "status_code", None) == 429 or type(e).__name__ == "RateLimitError"
+
+
+def _retry_after(e: Exception) -> float | None:
+    try:
+        return float(e.response.headers.get("retry-after"))
+    except Exception:
+        return None
+
+
+class AdaptiveLimiter:
+    """
+    LLM 동시 호출 한도 (AIMD). 429 를 받으면 한도를 절반으로 줄이고 Retry-After 만큼 전체를 멈추며,
+    성공이 한도만큼 쌓일 때마다 한도를 1씩 되돌린다.
+    """
+
+    def __init__(self, max_limit: int):
+        self.max_limit = max(1, max_limit)
+        self.limit = self.max_limit
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self._ok_streak = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                wait = self.paused_until - time.time()
+                if wait <= 0 and self.in_flight < self.limit:
+                    self.in_flight += 1
+                    return
+                self._cond.wait(timeout=wait if wait > 0 else None)
+
+    def release(self, ok: bool = True):
+        with self._cond:
+            self.in_flight -= 1
+            if ok:
+                self._ok_streak += 1
+                if self._ok_streak >= self.limit and self.limit < self.max_limit:
+                    self.limit += 1
+                    self._ok_streak = 0
+            self._cond.notify_all()
+
+    def on_rate_limited(self, retry_after: float | None, attempt: int):
+        with self._cond:
+            self.limit = max(1, self.limit // 2)
+            self._ok_streak = 0
+            delay = retry_after if retry_after is not None else min(60.0, 2.0 ** attempt)
+            self.paused_until = max(self.paused_until, time.time() + delay)
+            log.warning(f"[LLM] 429 → 동시 호출 한도 {self.limit}, {delay:.1f}s 대기")
+            self._cond.notify_all()
+
+
+# 같은 키로 도는 모든 잡이 한도와 429 백오프를 공유한다 (잡마다 만들면 N개 잡 × LLM_CONCURRENCY 로 몰림)
+_llm_limiter = AdaptiveLimiter(int(os.environ.get("LLM_CONCURRENCY", "4")))
+
+
+def _llm_call(limiter: AdaptiveLimiter, fn):
+    """limiter 안에서 fn() 실행. 429 는 LLM_429_RETRIES 번까지 속도를 낮춰 재시도한다."""
+    retries = int(os.getenv("LLM_429_RETRIES", "6"))
+    for attempt in range(retries + 1):
+        limiter.acquire()
+        try:
+            result = fn()
+        except Exception as e:
+            limiter.release(ok=False)
+            if not _is_rate_limited(e) or attempt == retries:
+                raise
+            limiter.on_rate_limited(_retry_after(e), attempt)
+            continue
+        limiter.release(ok=True)
+        return result
+
+
+# ─────────────────────────────────────────────────────────────
+# 요약용 청크 분할: STT segments(발화 단위)가 있으면 그것을, 없으면 한국어 문장 경계로 자른 조각을
+# 추정 토큰 예산 안에서 앞에서부터 채운다. 입력 길이에 선형(O(n)).
+# 토큰 추정: 한글 1글자 ≈ 1토큰, 그 외(영문/숫자/공백) 4글자 ≈ 1토큰
+#   CHUNK_TOKENS         : clean 단계 청크당 추정 토큰 (기본 1500, clean 출력 한도 2000 안쪽)
+#   MAP_CHUNK_TOKENS     : map 단계에서 정제된 청크를 다시 나눌 때의 예산 (기본 3000)
+#   CHUNK_OVERLAP_TOKENS : 앞 청크 끝 문장을 다음 청크 앞에 겹쳐 넣는 양 (기본 0)
+# ─────────────────────────────────────────────────────────────
+_HANGUL_RE = re.compile(r"[\uac00-\ud7a3\u3131-\u318e]")
+_SENTENCE_END_RE = re.compile(
+    r"[.!?。！？…]+[\"')\]]*\s+"
+    r"|(?:습니다|니다|어요|아요|에요|해요|네요|군요|거든요|죠)\s+"
+    r"|\n+"
+)
+
+
+def _estimate_tokens(text: str) -> int:
+    hangul = len(_HANGUL_RE.findall(text))
+    return hangul + math.ceil((len(text) - hangul) / 4)
+
+
+def _sentence_units(text: str) -> list[str]:
+    """문장 끝(문장부호/종결어미 + 공백, 줄바꿈) 뒤에서 자른다. 공백은 앞 조각에 붙여 원문을 보존."""
+    units, pos = [], 0
+    for m in _SENTENCE_END_RE.finditer(text):
+        units.append(text[pos:m.end()])
+        pos = m.end()
+    if pos < len(text):
+        units.append(text[pos:])
+    return [u for u in units if u.strip()]
+
+
+def _split_oversized(unit: str, budget: int) -> list[str]:
+    """예산보다 긴 한 조각(문장부호 없는 긴 발화 등)은 글자 단위로 예산만큼씩 끊는다"""
+    parts, start, hangul, other = [], 0, 0, 0
+    for i, c in enumerate(unit):
+        h, o = (1, 0) if _HANGUL_RE.match(c) else (0, 1)
+        if i > start and hangul + h + math.ceil((other + o) / 4) > budget:
+            parts.append(unit[start:i])
+            start, hangul, other = i, 0, 0
+        hangul += h
+        other += o
+    if start < len(unit):
+        parts.append(unit[start:])
+    return parts
+
+
+def _pack_units(units: list[str], budget: int, overlap: int = 0, sep: str = "") -> list[str]:
+    """조각들을 순서대로 예산까지 채워 청크로 묶는다. overlap>0 이면 직전 청크 끝 조각을 이어 붙인다."""
+    sized = []
+    for u in units:
+        t = _estimate_tokens(u)
+        if t > budget:
+            sized.extend((p, _estimate_tokens(p)) for p in _split_oversized(u, budget))
+        else:
+            sized.append((u, t))
+
+    chunks, buf, used = [], [], 0
+    for u, t in sized:
+        if buf and used + t > budget:
+            chunks.append(sep.join(x for x, _ in buf))
+            carry, carried = [], 0
+            for x, xt in reversed(buf):
+                if carried + xt > overlap or carried + xt + t > budget:
+                    break
+                carry.append((x, xt))
+                carried += xt
+            buf, used = carry[::-1], carried
+        buf.append((u, t))
+        used += t
+    if buf:
+        chunks.append(sep.join(x for x, _ in buf))
+    return chunks
+
+
+def _chunk_budgets() -> tuple[int, int, int]:
+    return (
+        max(1, int(os.getenv("CHUNK_TOKENS", "1500"))),
+        max(1, int(os.getenv("MAP_CHUNK_TOKENS", "3000"))),
+        max(0, int(os.getenv("CHUNK_OVERLAP_TOKENS", "0"))),
+    )
+
+
+def chunk_transcript(text: str, segments: list | None = None, budget: int | None = None,
+                     overlap: int | None = None) -> list[str]:
+    """
+    STT 결과를 요약용 청크로 나눈다.
+    segments: stt_segments.json 의 [{start, end, text}]. 있으면 발화 단위로, 없으면 문장 단위로 묶는다.
+    """
+    default_budget, _, default_overlap = _chunk_budgets()
+    budget = budget or default_budget
+    overlap = default_overlap if overlap is None else overlap
+    seg_texts = [(seg.get("text") or "").strip() for seg in (segments or []) if isinstance(seg, dict)]
+    seg_texts = [t for t in seg_texts if t]
+    if seg_texts:
+        units = []
+        for t in seg_texts:
+            # 긴 발화 하나는 문장 단위로 한 번 더 쪼갠다
+            units.extend(_sentence_units(t) if _estimate_tokens(t) > budget else [t])
+        return _pack_units([u.strip() for u in units], budget, overlap, sep=" ")
+    return _pack_units(_sentence_units(text), budget, overlap)
+
+
+# ─────────────────────────────────────────────────────────────
+# 요약 경로: 전사문 길이에 따라 LLM 왕복 수를 줄인다.
+#   single : 추정 토큰이 SUMMARY_SINGLE_PASS_TOKENS 이하 → 정제+요약을 한 번에 (1회)
+#   direct : clean 청크가 하나고 정제본이 map 입력 하나에 들어감 → 정제 후 바로 최종 문서 (2회, map/reduce 생략)
+#   full   : 그 외 → clean → map → (계층) reduce
+#   SUMMARY_SINGLE_PASS_TOKENS : single 경로 상한 (기본 800, 0 이면 끔)
+#   SUMMARY_DIRECT             : direct 경로 사용 여부 (기본 true)
+# ─────────────────────────────────────────────────────────────
+SUMMARY_MODES = Counter("summary_mode_total", "요약 경로 선택 수 (single/direct/full)", ("mode",))
+
+
+def _summary_mode(transcript_tokens: int, n_chunks: int) -> str:
+    single_limit = int(os.getenv("SUMMARY_SINGLE_PASS_TOKENS", "800"))
+    if single_limit > 0 and transcript_tokens <= single_limit:
+        return "single"
+    if n_chunks == 1 and os.getenv("SUMMARY_DIRECT", "true").lower() == "true":
+        return "direct"
+    return "full"
+
+
+# ─────────────────────────────────────────────────────────────
+# 계층(트리) 리듀스: 노트 전체가 예산을 넘으면 REDUCE_FAN_IN 개씩 묶어 병렬로 중간 병합하고,
+# 예산 안에 들어올 때까지(최대 REDUCE_MAX_DEPTH 단계) 반복한 뒤 최종 리듀스 1회.
+# 짧은 강의는 지금처럼 바로 최종 리듀스 1회(빠른 경로).
+#   REDUCE_TOKEN_BUDGET : 최종 리듀스 입력 추정 토큰 한도 (기본 12000)
+#   REDUCE_FAN_IN       : 중간 병합 1회에 묶는 노트 수 (기본 4)
+#   REDUCE_MAX_DEPTH    : 중간 병합 단계 최대 횟수 (기본 3)
+# ─────────────────────────────────────────────────────────────
+NOTES_SEP = "\n\n---\n\n"
+
+
+def _reduce_config() -> tuple[int, int, int]:
+    return (
+        max(1, int(os.getenv("REDUCE_TOKEN_BUDGET", "12000"))),
+        max(2, int(os.getenv("REDUCE_FAN_IN", "4"))),
+        max(0, int(os.getenv("REDUCE_MAX_DEPTH", "3"))),
+    )
+
+
+def _tree_reduce(notes: list[str], merge_group, limiter: AdaptiveLimiter, progress=None) -> tuple[list[str], int]:
+    """
+    merge_group(list[str]) -> str 로 노트를 단계별로 줄인다. (줄어든 노트, 수행한 단계 수) 반환.
+    같은 단계의 그룹들은 limiter 한도 안에서 동시에 병합한다.
+    """
+    budget, fan_in, max_depth = _reduce_config()
+    depth = 0
+    while len(notes) > 1 and depth < max_depth and _estimate_tokens(NOTES_SEP.join(notes)) > budget:
+        groups = [notes[i:i + fan_in] for i in range(0, len(notes), fan_in)]
+        started = time.time()
+        done = [0]
+        done_lock = threading.Lock()
+
+        def merge_one(group: list[str]) -> str:
+            if len(group) == 1:
+                merged = group[0]
+            else:
+                merged = _llm_call(limiter, lambda: merge_group(group))
+            with done_lock:
+                done[0] += 1
+                if progress:
+                    progress("reduce", done[0], len(groups))
+            return merged
+
+        with ThreadPoolExecutor(max_workers=max(1, min(len(groups), limiter.max_limit))) as pool:
+            notes = list(pool.map(merge_one, groups))  # 순서 유지
+        depth += 1
+        log.info(f"🌲 [reduce] level {depth}: {sum(len(g) for g in groups)} → {len(notes)} notes "
+              f"(~{_estimate_tokens(NOTES_SEP.join(notes))} tokens, took={time.time() - started:.2f}s)")
+    return notes, depth
+
+
+# ─────────────────────────────────────────────────────────────
+# 단계 체크포인트: 작업 공간(MERGE_OUT_DIR/{class_id}/{meeting|job})의 manifest.json 에 단계별 출력 경로, 입력 지문, 소요시간을 남긴다.
+# 재시도 시 입력 지문이 같고 출력 파일이 남아 있는 단계는 건너뛴다.
+# 요청 본문 "force_from_stage": "clean" 처럼 주면 그 단계부터 다시 계산한다.
+# ─────────────────────────────────────────────────────────────
+PIPELINE_STAGES = ("merge", "vad", "stt", "clean", "map", "reduce", "pdf", "upload")
+MANIFEST_NAME = "manifest.json"
+
+
+def _fingerprint(*parts) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        elif not isinstance(part, bytes):
+            part = json.dumps(part, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")
+        h.update(part)
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _files_fingerprint(paths: list[str]) -> list:
+    out = []
+    for p in paths:
+        st = os.stat(p)
+        out.append([os.path.basename(p), st.st_size, st.st_mtime_ns])
+    return out
+
+
+class StageManifest:
+    def __init__(self, out_dir: str, force_from_stage: str | None = None):
+        self.path = os.path.join(out_dir, MANIFEST_NAME)
+        if force_from_stage and force_from_stage not in PIPELINE_STAGES:
+            raise HTTPException(status_code=400,
+                                detail=f"force_from_stage 는 {PIPELINE_STAGES} 중 하나여야 합니다: {force_from_stage}")
+        self.force_from = PIPELINE_STAGES.index(force_from_stage) if force_from_stage else None
+        self.skipped: list[str] = []
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.data = {"stages": {}}
+
+    def fresh(self, stage: str, fingerprint: str) -> dict | None:
+        """지문이 같고 출력이 모두 남아 있으면 기록을 돌려준다 (= 건너뛰어도 됨)"""
+        if self.force_from is not None and PIPELINE_STAGES.index(stage) >= self.force_from:
+            return None
+        rec = self.data["stages"].get(stage)
+        if not rec or rec.get("fingerprint") != fingerprint:
+            return None
+        if any(not os.path.exists(p) for p in rec.get("outputs", [])):
+            return None
+        self.skipped.append(stage)
+        STAGE_SKIPPED.inc(stage=stage)
+        log.info(f"[manifest] {stage} 건너뜀 (입력 동일, 이전 소요 {rec.get('took')}s)")
+        return rec
+
+    def record(self, stage: str, fingerprint: str, outputs: list[str], started: float,
+               took: float | None = None, **extra):
+        """took: 이미 STAGE_SECONDS 에 넣은 소요시간 (출력을 나중에 디스크에 쓰는 reduce/pdf)"""
+        if took is None:
+            took = time.time() - started
+            STAGE_SECONDS.observe(took, stage=stage)
+        self.data["stages"][stage] = {
+            "fingerprint": fingerprint,
+            "outputs": [p for p in outputs if p],
+            "finished_at": time.time(),
+            "took": round(took, 3),
+            **extra,
+        }
+        self.save()
+
+    def save(self):
+        if not os.path.isdir(os.path.dirname(self.path)):
+            return  # cleanup 으로 디렉토리가 지워진 뒤
+        with _atomic_output(self.path) as tmp, open(tmp, "w", encoding="utf-8") as fw:
+            json.dump(self.data, fw, ensure_ascii=False, indent=1)
+
+
+def _load_json(path: str):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@contextmanager
+def _atomic_output(path: str):
+    """같은 디렉토리의 임시 파일에 쓰게 하고, 예외 없이 끝나면 rename 으로 path 를 바꿔 끼운다"""
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _write_json(path: str, obj):
+    with _atomic_output(path) as tmp, open(tmp, "w", encoding="utf-8") as fw:
+        json.dump(obj, fw, ensure_ascii=False)
+
+
+def _write_text(path: str, text: str):
+    with _atomic_output(path) as tmp, open(tmp, "w", encoding="utf-8") as fw:
+        fw.write(text)
+
+
+def _write_bytes(path: str, data: bytes):
+    with _atomic_output(path) as tmp, open(tmp, "wb") as fw:
+        fw.write(data)
+
+
+# ─────────────────────────────────────────────────────────────
+# 최종 리듀스(Claude via GMS → OpenAI 폴백)의 서킷 브레이커와 헤징.
+# Claude 가 연달아 실패하면 쿨다운 동안 바로 OpenAI 로 보내고, 헤징을 켜면 Claude 가 p95 지연을
+# 넘길 때 OpenAI 리듀스를 같이 시작해 먼저 끝난 결과를 쓴다. 상태는 GET /STT/reduce 로 본다.
+#   CLAUDE_REDUCE_TIMEOUT_SEC   : Claude 요청 타임아웃 (기본 120)
+#   CLAUDE_BREAKER_FAILURES     : 연속 실패 몇 번에 차단할지 (기본 3)
+#   CLAUDE_BREAKER_COOLDOWN_SEC : 차단 유지 시간. 지나면 한 번 시험 호출 (기본 300)
+#   REDUCE_HEDGE                : true 면 헤징 사용 (기본 false)
+#   REDUCE_HEDGE_DELAY_SEC      : OpenAI 를 같이 시작할 지연. 비우면 최근 Claude 응답 시간의 p95 (기본 비움)
+# ─────────────────────────────────────────────────────────────
+CLAUDE_REDUCE_MODEL = "claude-3-7-sonnet-latest"
+CLAUDE_REDUCE_SYSTEM = "너는 한국어 기술 문서 작성자다. 부분 요약들을 하나의 일관된 마크다운 문서로 통합하라. 중복 제거, 용어/표기 통일, 사실 보존, 환각 금지."
+HEDGE_MIN_SAMPLES = 5
+HEDGE_FALLBACK_DELAY_SEC = 30.0
+
+
+class CircuitBreaker:
+    """연속 실패 threshold 번이면 open, cooldown 이 지나면 half-open 으로 한 번만 통과시킨다"""
+
+    def __init__(self, name: str, threshold: int, cooldown: float):
+        self.name, self.threshold, self.cooldown = name, max(1, threshold), cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.opens = 0
+        self.short_circuited = 0
+        self._lock = threading.Lock()
+
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.time() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            self.short_circuited += 1
+            return False
+
+    def record(self, ok: bool):
+        with self._lock:
+            self.trial_in_flight = False
+            if ok:
+                self.failures, self.opened_at = 0, None
+                return
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.threshold:
+                if self.opened_at is None:
+                    log.warning(f"⛔ [{self.name}] 연속 실패 {self.failures}회 → {self.cooldown:.0f}s 동안 차단")
+                self.opened_at = time.time()
+                self.opens += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"state": self.state(), "consecutive_failures": self.failures,
+                    "opens": self.opens, "short_circuited": self.short_circuited}
+
+
+class LatencyWindow:
+    """최근 n 개 응답 시간으로 p95 를 계산"""
+
+    def __init__(self, n: int = 50):
+        self._samples = collections.deque(maxlen=n)
+        self._lock = threading.Lock()
+
+    def add(self, sec: float):
+        with self._lock:
+            self._samples.append(sec)
+
+    def p95(self) -> float | None:
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, math.ceil(len(samples) * 0.95) - 1)]
+
+
+_claude_breaker = CircuitBreaker(
+    "GMS Claude",
+    int(os.environ.get("CLAUDE_BREAKER_FAILURES", "3")),
+    float(os.environ.get("CLAUDE_BREAKER_COOLDOWN_SEC", "300")),
+)
+_claude_latency = LatencyWindow()
+# claude_failed: 헤징 모드에서 Claude 가 실패/차단돼 OpenAI 결과를 쓴 수 (경주에서 진 것과 따로 센다)
+_hedge_counts = {"reduces": 0, "hedged": 0, "claude_wins": 0, "openai_wins": 0, "claude_failed": 0,
+                 "breaker_skips": 0}
+_hedge_lock = threading.Lock()
+
+
+def _count_reduce(**incr):
+    with _hedge_lock:
+        for k, v in incr.items():
+            _hedge_counts[k] += v
+
+
+def _hedge_delay() -> float:
+    fixed = os.getenv("REDUCE_HEDGE_DELAY_SEC", "").strip()
+    if fixed:
+        return float(fixed)
+    p95 = _claude_latency.p95()
+    return p95 if p95 is not None else HEDGE_FALLBACK_DELAY_SEC
+
+
+def reduce_stats() -> dict:
+    with _hedge_lock:
+        counts = dict(_hedge_counts)
+    decided = counts["claude_wins"] + counts["openai_wins"]  # 헤징 모드에서 두 쪽이 실제로 겨룬 리듀스 수
+    return {
+        "claude_breaker": _claude_breaker.stats(),
+        "claude_p95_sec": _claude_latency.p95(),
+        "hedge_enabled": os.getenv("REDUCE_HEDGE", "false").lower() == "true",
+        "hedge_delay_sec": round(_hedge_delay(), 3),
+        **counts,
+        "claude_win_rate": round(counts["claude_wins"] / decided, 3) if decided else None,
+    }
+
+
+def _reduce_event_counts() -> dict:
+    with _hedge_lock:
+        return {(k,): v for k, v in _hedge_counts.items()}
+
+
+REDUCE_EVENTS = Counter("reduce_events_total", "최종 리듀스 집계 (reduces/hedged/claude_wins/openai_wins/claude_failed/breaker_skips)",
+                        ("event",), collect=_reduce_event_counts)
+REDUCE_BREAKER_STATE = Gauge(
+    "reduce_breaker_state", "GMS Claude 차단기 상태 (현재 상태만 1)", ("state",),
+    collect=lambda: {(st,): int(_claude_breaker.state() == st) for st in ("closed", "open", "half_open")},
+)
+REDUCE_BREAKER_OPENS = Counter("reduce_breaker_opens_total", "GMS Claude 차단기가 열린 횟수",
+                               collect=lambda: {(): _claude_breaker.stats()["opens"]})
+REDUCE_CLAUDE_P95 = Gauge("reduce_claude_p95_seconds", "최근 Claude 리듀스 응답 시간 p95 (헤징 지연 기준)",
+                          collect=lambda: {(): p} if (p := _claude_latency.p95()) is not None else {})
+
+
+def _claude_reduce(gms_base: str, gms_key: str, notes_joined: str, use_cache: bool = True,
+                   on_token=None) -> str | None:
+    """
+    GMS 경유 Claude 로 부분 노트를 통합. 실패하거나 차단 중이면 None (호출 측에서 OpenAI 로 폴백)
+    on_token: 주면 stream=true 로 받아 조각마다 on_token(text) 를 부른다
+    """
+    user = (
+        "다음 '부분 요약 노트'를 통합해 하나의 강의 문서를 만들어라.\n"
+        "- 섹션: # 요약(5~8문장), ## 핵심 개념(불릿으로 리스트), ## 수식/정의(수학/과학 등 수식이 있는 경우만, ```math)\n"
+        "- 중복 제거, 용어 일관성 유지, 사실 추가/삭제 금지\n\n"
+        f"{notes_joined}"
+    )
+    max_tokens = 4500
+    key = _llm_cache.key(f"gms-claude:{gms_base}", CLAUDE_REDUCE_MODEL, CLAUDE_REDUCE_SYSTEM, user, None,
+                         max_output_tokens=max_tokens)
+    if use_cache:
+        hit = _llm_cache.get(key)
+        if hit is not None:
+            if on_token:
+                on_token(hit)
+            return hit
+    if not _claude_breaker.allow():
+        log.warning("[GMS Claude] 차단 중 → OpenAI 리듀스로 바로 진행")
+        _count_reduce(breaker_skips=1)
+        return None
+
+    url = f"{gms_base}/v1/messages"
+    headers = {
+        "Content-Type": "application/json",
+        "x-api-key": gms_key,
+        "anthropic-version": "2023-06-01",
+    }
+    payload = {
+        "model": CLAUDE_REDUCE_MODEL,
+        "max_tokens": max_tokens,
+        "system": CLAUDE_REDUCE_SYSTEM,
+        "messages": [
+            {"role": "user", "content": user}
+        ],
+    }
+    if on_token:
+        payload["stream"] = True
+    started = time.time()
+    text = usage = None
+    try:
+        r = _clients().gms.post(url, headers=headers, data=json.dumps(payload), stream=bool(on_token),
+                                timeout=float(os.getenv("CLAUDE_REDUCE_TIMEOUT_SEC", "120")))
+        if r.status_code != 200:
+            log.warning("[GMS Claude] HTTP %s %s", r.status_code, r.text[:200])
+        elif on_token:
+            text = _claude_stream_text(r, on_token)
+        else:
+            body = r.json()
+            usage = body.get("usage")
+            content = body.get("content", [])
+            if content and isinstance(content, list) and isinstance(content[0], dict) and "text" in content[0]:
+                text = content[0]["text"].strip() or None
+    except (requests.RequestException, ValueError) as e:
+        log.warning(f"[GMS Claude] 요청 실패: {type(e).__name__}: {e}")
+    finally:
+        # 그 밖의 예외(on_token 실패, 응답 형식 오류 등)도 기록해야 half-open 시험 호출이 풀린다
+        _claude_breaker.record(text is not None)
+    if text is None:
+        STAGE_FAILURES.inc(stage="reduce_claude")
+        return None
+    _claude_latency.add(time.time() - started)
+    _count_llm("claude", started, CLAUDE_REDUCE_SYSTEM + user, text, usage)
+    if use_cache:
+        _llm_cache.put(key, text)
+    return text
+
+
+def _claude_stream_text(resp, on_token) -> str | None:
+    """Anthropic SSE(content_block_delta) 를 모은다. error 이벤트면 None"""
+    parts = []
+    try:
+        for line in resp.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            ev = json.loads(line[5:].strip())
+            if ev.get("type") == "error":
+                log.warning("[GMS Claude] stream error: %s", ev.get("error"))
+                return None
+            delta = ev.get("delta") or {}
+            if ev.get("type") == "content_block_delta" and delta.get("type") == "text_delta":
+                parts.append(delta.get("text", ""))
+                on_token(delta.get("text", ""))
+    finally:
+        resp.close()
+    return "".join(parts).strip() or None
+
+
+def _reduce_with_fallback(claude_fn, openai_fn, hedge: bool | None = None) -> tuple[str, str]:
+    """
+    claude_fn() -> str | None, openai_fn() -> str. (결과, "claude" | "openai") 반환.
+    헤징이 꺼져 있으면 Claude → 실패 시 OpenAI 순서로, 켜져 있으면 지연 이후 둘을 경주시킨다.
+    hedge: None 이면 REDUCE_HEDGE 를 따른다 (토큰 스트리밍 중에는 두 출력이 섞이므로 False)
+    """
+    _count_reduce(reduces=1)
+    if claude_fn is None:
+        return openai_fn(), "openai"
+    if hedge is None:
+        hedge = os.getenv("REDUCE_HEDGE", "false").lower() == "true"
+    if not hedge:
+        text = claude_fn()
+        return (text, "claude") if text else (openai_fn(), "openai")
+
+    pool = ThreadPoolExecutor(max_workers=2)
+    try:
+        claude_f = pool.submit(claude_fn)
+        delay = _hedge_delay()
+        try:
+            text = claude_f.result(timeout=delay)
+        except FuturesTimeout:
+            pass
+        else:
+            # 지연 안에 끝난 경우도 승패에 넣는다. 차단/즉시 실패는 경주가 아니므로 claude_failed
+            if text:
+                _count_reduce(claude_wins=1)
+                return text, "claude"
+            _count_reduce(claude_failed=1)
+            return openai_fn(), "openai"
+        log.info(f"🏁 [reduce] Claude 가 {delay:.1f}s 를 넘김 → OpenAI 리듀스 동시 시작")
+        _count_reduce(hedged=1)
+        openai_f = pool.submit(openai_fn)
+        error = None
+        claude_failed = False
+        for fut in as_completed([claude_f, openai_f]):
+            try:
+                text = fut.result()
+            except Exception as e:
+                # 한쪽이 먼저 실패해도 다른 쪽 결과를 기다린다
+                log.warning(f"[reduce] {'Claude' if fut is claude_f else 'OpenAI'} 리듀스 실패: {type(e).__name__}: {e}")
+                error = e
+                claude_failed = claude_failed or fut is claude_f
+                continue
+            if fut is claude_f:
+                if not text:
+                    claude_failed = True
+                    continue  # Claude 실패 → OpenAI 결과를 기다린다
+                _count_reduce(claude_wins=1)
+                return text, "claude"
+            _count_reduce(**{"claude_failed" if claude_failed else "openai_wins": 1})
+            return text, "openai"
+        raise error
+    finally:
+        # 진 쪽은 끝까지 돌게 두고(캐시/브레이커 기록) 기다리지 않는다
+        pool.shutdown(wait=False)
+
+
+# ─────────────────────────────────────────────────────────────
+# 요약 PDF 렌더링: 한글 폰트 탐색과 메트릭 파싱(fpdf add_font)은 프로세스당 한 번만 하고
+# 이후 FPDF 마다 파싱된 폰트 항목을 복사해 등록한다. 렌더링은 별도 프로세스 풀에서 돌려
+# 큰 PDF 도 잡 워커/이벤트 루프의 GIL 을 붙잡지 않는다.
+#   PDF_FONT_PATH      : 한글 TTF 경로 (없으면 fonts/, ../backend/fonts 에서 찾음)
+#   PDF_RENDER_WORKERS : 렌더링 프로세스 수 (기본 1, 0 이면 호출 스레드에서 렌더)
+# PDF 는 파일이 아니라 바이트로 돌려주고, 요약 업로드가 그 바이트를 바로 본문으로 흘려보낸다.
+# ─────────────────────────────────────────────────────────────
+PDF_FONT_FAMILY = "kr"
+
+_pdf_font: dict = {}
+_pdf_font_lock = threading.Lock()
+_pdf_pool: ProcessPoolExecutor | None = None
+_pdf_pool_lock = threading.Lock()
+
+
+def pick_local_font() -> str | None:
+    # 0) ENV가 최우선
+    font_env = os.getenv("PDF_FONT_PATH", "").strip()
+    if font_env and os.path.exists(font_env):
+        return font_env
+
+    # 1) FastAPIProject/fonts (main.py와 같은 폴더)
+    candidates = [
+        os.path.join(HERE, "fonts"),
+        os.path.normpath(os.path.join(HERE, "..", "backend", "fonts")),  # 백엔드 쪽도 fallback
+    ]
+    for d in candidates:
+        if not os.path.isdir(d):
+            continue
+        # 우선순위로 NotoSansKR-Regular 우선
+        for name in ("NotoSansKR-Regular.ttf", "NotoSansKR-Regular.otf"):
+            p = os.path.join(d, name)
+            if os.path.exists(p):
+                return p
+        # 아무 ttf/otf 하나라도
+        for fn in sorted(os.listdir(d)):
+            if fn.lower().endswith((".ttf", ".otf")):
+                return os.path.join(d, fn)
+    return None
+
+
+def _pdf_font_entry() -> dict | None:
+    """파싱된 한글 폰트 항목 (프로세스당 1회). 폰트가 없으면 None"""
+    with _pdf_font_lock:
+        if "entry" not in _pdf_font:
+            path = pick_local_font()
+            entry = None
+            if path:
+                started = time.time()
+                scratch = FPDF()
+                scratch.add_font(PDF_FONT_FAMILY, "", path, uni=True)  # 옆에 .pkl 이 있으면 그걸 읽음
+                font = scratch.fonts[PDF_FONT_FAMILY]
+                # 커밋된 .pkl 에는 만든 PC 의 TTF 경로가 들어 있어 서브셋 생성 시 실제 경로로 바꿔 둔다
+                font["ttffile"] = path
+                entry = {"font": font, "files": dict(scratch.font_files)}
+                log.debug(f"🔤 [PDF] 폰트 로드: {path} ({time.time() - started:.2f}s)")
+            _pdf_font["entry"] = entry
+        return _pdf_font["entry"]
+
+
+def _register_cached_font(pdf: FPDF) -> bool:
+    entry = _pdf_font_entry()
+    if entry is None:
+        return False
+    font = dict(entry["font"])
+    font["i"] = len(pdf.fonts) + 1
+    font["subset"] = list(font["subset"])  # 렌더마다 쓰인 글자가 여기에 쌓인다
+    pdf.fonts[PDF_FONT_FAMILY] = font
+    pdf.font_files.update(entry["files"])
+    return True
+
+
+def markdown_to_pdf(md_text: str) -> bytes:
+    pdf = FPDF(format="A4", unit="mm")
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+    if _register_cached_font(pdf):
+        base = bold = mono = PDF_FONT_FAMILY  # 굵기/고정폭은 글자 크기로만 구분
+        text = lambda t: t
+    else:
+        base, bold, mono = "Arial", "Arial", "Courier"  # 한글 깨질 수 있음
+        text = lambda t: t.encode("latin-1", "replace").decode("latin-1")
+    pdf.set_font(base, size=12)
+    in_code = False
+    for raw_line in md_text.splitlines():
+        line = text(raw_line.rstrip("\n"))
+        if line.strip().startswith("```"):
+            in_code = not in_code
+            pdf.set_font(mono if in_code else base, size=10 if in_code else 12)
+            continue
+        if in_code:
+            pdf.multi_cell(0, 6, txt=line); continue
+        if line.startswith("### "):
+            pdf.set_font(bold, size=12); pdf.multi_cell(0,7,line[4:].strip()); pdf.set_font(base, size=12); pdf.ln(1); continue
+        if line.startswith("## "):
+            pdf.set_font(bold, size=14); pdf.multi_cell(0,8,line[3:].strip()); pdf.set_font(base, size=12); pdf.ln(1); continue
+        if line.startswith("# "):
+            pdf.set_font(bold, size=16); pdf.multi_cell(0,9,line[2:].strip()); pdf.set_font(base, size=12); pdf.ln(1); continue
+        if line.strip().startswith("- "):
+            pdf.multi_cell(0,6,text("• ")+line.strip()[2:]); continue
+        if not line.strip():
+            pdf.ln(1); continue
+        pdf.multi_cell(0,6,line)
+    return pdf.output(dest="S").encode("latin-1")  # fpdf 1.x 는 latin-1 str 로 돌려준다
+
+
+def _render_pdf_local(md_text: str) -> tuple[bytes, float]:
+    started = time.time()
+    try:
+        data = markdown_to_pdf(md_text)
+    except Exception as pdf_err:
+        # 폰트 등으로 실패해도 PDF 는 만든다(내용이 일부 깨질 수 있음)
+        log.warning(f"[PDF] markdown_to_pdf 실패, fallback 실행: {pdf_err}")
+        pdf = FPDF(format="A4", unit="mm")
+        pdf.set_auto_page_break(auto=True, margin=15)
+        pdf.add_page()
+        pdf.set_font("Arial", size=12)
+        for line in md_text.splitlines():
+            pdf.multi_cell(0, 6, line.encode("latin-1", "replace").decode("latin-1"))
+        data = pdf.output(dest="S").encode("latin-1")
+    return data, time.time() - started
+
+
+def _get_pdf_pool() -> ProcessPoolExecutor | None:
+    global _pdf_pool
+    workers = int(os.getenv("PDF_RENDER_WORKERS", "1"))
+    if workers <= 0:
+        return None
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pdf_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+        return _pdf_pool
+
+
+def render_summary_pdf(md_text: str) -> bytes:
+    """요약 PDF 바이트를 렌더링 프로세스에서 만든다. 풀을 못 쓰면 현재 스레드에서 렌더."""
+    global _pdf_pool
+    pool = _get_pdf_pool()
+    if pool is not None:
+        try:
+            data, took = pool.submit(_render_pdf_local, md_text).result()
+            log.debug(f"📄 [PDF] 렌더 완료(프로세스): {took:.2f}s, {len(data)} bytes")
+            return data
+        except BrokenProcessPool:
+            with _pdf_pool_lock:
+                if _pdf_pool is pool:
+                    _pdf_pool = None
+            log.warning("[PDF] 렌더 프로세스 풀 손상 → 현재 스레드에서 렌더")
+    return _render_pdf_local(md_text)[0]
+
+
+_pdf_waiters = ThreadPoolExecutor(max_workers=4, thread_name_prefix="pdf-render")  # 렌더 결과를 기다리는 스레드
+
+
+def summarize_text_auto(transcript_path: str, out_dir: str, progress=None, use_cache: bool = True,
+                        manifest: StageManifest | None = None, on_token=None) -> dict:
+    """
+    progress: 잡 모드에서 단계 진행률을 받는 콜백 (stage, done=None, total=None)
+    use_cache: False 면 LLM 응답 캐시를 건너뛴다 (LLM_CACHE_BYPASS=true 와 동일)
+    manifest: 단계 체크포인트. 입력이 같은 clean/map/reduce/pdf 는 건너뛴다.
+    on_token: 최종 리듀스 출력을 조각마다 받는 콜백 (text, reset=False).
+              Claude 가 중간에 실패해 OpenAI 로 다시 생성할 때는 reset=True 로 한 번 불린다.
+
+    summary.md / summary.pdf 는 바로 쓰지 않는다. 결과의 summary_md(str) 와
+    summary_pdf(Future[bytes], 렌더 진행 중)를 업로드에 그대로 넘기고,
+    디스크에 남겨야 할 때(업로드 실패 → 재시도 대비)만 persist() 를 부른다.
+    """
+    if progress is None:
+        progress = _noop_progress
+    use_cache = use_cache and not _llm_cache_bypass()
+    if manifest is None:
+        manifest = StageManifest(out_dir)
+
+    try:
+        oai, clean_model, summary_model = _load_openai_clients()
+        use_claude = settings.use_gms_claude
+        gms_key    = settings.gms_key
+        gms_base   = settings.gms_anthropic_base
+
+        if not os.path.isfile(transcript_path):
+            return {"ok": False, "detail": f"transcript 없음: {transcript_path}"}
+
+        with open(transcript_path, "r", encoding="utf-8") as f:
+            raw = f.read()
+        segments = None
+        segments_path = os.path.join(os.path.dirname(transcript_path), "stt_segments.json")
+        if os.path.isfile(segments_path):
+            try:
+                segments = _load_json(segments_path)
+            except ValueError:
+                segments = None
+
+        # 1) 전처리(clean) + 2) 맵 요약 — OpenAI
+        #    청크마다 clean 이 끝나는 즉시 그 청크의 map 을 이어서 실행하고,
+        #    청크들은 LLM_CONCURRENCY 한도(프로세스 전체 공유) 안에서 동시에 돈다. (429 를 받으면 한도를 줄임)
+        system_clean = (
+            "너는 한국어 전사 텍스트를 정제하는 도우미다. "
+            "원문 의미를 보존하고 환각을 피한다. "
+            "해야 할 일: 문장 경계/문장부호 복원, 띄어쓰기·맞춤법 보정, 중복/잡음 최소화. "
+            "불명확하면 [불명확]로 표기하고 임의로 보충하지 않는다."
+        )
+        system_summarize = (
+            
+            
+            "너는 정확한 한국어 필기자다. 환각 없이 핵심을 구조화하고, "
+            "수식은 입력에 실제 언급된 경우에만 ```math 블록을 사용한다."
+        )
+        clean_budget, map_budget, overlap = _chunk_budgets()
+        raw_chunks = chunk_transcript(raw, segments, clean_budget, overlap)
+        n = len(raw_chunks)
+        transcript_tokens = _estimate_tokens(raw)
+        mode = _summary_mode(transcript_tokens, n)
+        limiter = _llm_limiter
+        counts = {"clean": 0, "map": 0}
+        # clean/map 은 청크별로 겹쳐 돌기 때문에 단계 소요시간은 청크별 소요시간의 합으로 잰다
+        took = {"clean": 0.0, "map": 0.0}
+        counts_lock = threading.Lock()
+        if mode != "single":
+            progress("clean", 0, n)
+
+        def _tick(stage: str, started: float):
+            with counts_lock:
+                counts[stage] += 1
+                took[stage] += time.time() - started
+                done = counts[stage]
+            progress(stage, done, n)
+
+        def _record(stage: str, fp: str, outputs: list[str]):
+            STAGE_SECONDS.observe(took[stage], stage=stage)
+            manifest.record(stage, fp, outputs, 0, took=took[stage])
+
+        def clean_one(ch: str) -> str:
+            prompt = (
+                "아래 한국어 텍스트를 의미 왜곡 없이 정리하세요.\n"
+                "- 문장부호/문장 경계 복원, 띄어쓰기/맞춤법 보정\n"
+                "- 명백한 중복/잡음은 간단히 정리(사실 추가/삭제 금지)\n"
+                "- 고유명사가 한국어 음역일 때, 맥락이 명확하면 원어(예: C++)로 복원\n"
+                "- 불명확하면 [불명확] 표기\n\n"
+                f"{ch}"
+
+            )
+            return _llm_call(limiter, lambda: _llm_text(
+                oai, clean_model, system_clean, prompt, temperature=0.2, max_output_tokens=2000,
+                use_cache=use_cache))
+
+        def map_one(ch: str) -> str:
+            prompt = (
+                 "아래 텍스트를 한국어 강의 노트로 요약하세요.\n"
+                "- 핵심 포인트 3~6개 불릿\n"
+                "- 수학/과학/공학 등에서 실제 언급된 공식이 있으면 ```math 블록으로 표기\n"
+                "- 입력에 없는 사실 금지, 불명확하면 [불명확]\n\n"
+                f"{ch}"
+            )
+            return _llm_call(limiter, lambda: _llm_text(
+                oai, summary_model, system_summarize, prompt, temperature=0.3, max_output_tokens=2200,
+                use_cache=use_cache))
+
+        def clean_then_map(ch: str) -> tuple[str, list[str]]:
+            started = time.time()
+            cleaned_ch = clean_one(ch)
+            _tick("clean", started)
+            notes = map_chunk(cleaned_ch)
+            return cleaned_ch, notes
+
+        def map_chunk(cleaned_ch: str) -> list[str]:
+            started = time.time()
+            notes = [map_one(part) for part in _pack_units(_sentence_units(cleaned_ch), map_budget)]
+            _tick("map", started)
+            return notes
+
+        cleaned_path = os.path.join(out_dir, "cleaned.txt")
+        clean_chunks_path = os.path.join(out_dir, "clean_chunks.json")
+        map_notes_path = os.path.join(out_dir, "map_notes.json")
+        clean_fp = _fingerprint("clean", raw_chunks, clean_model)
+        clean_chunks, map_notes = None, None
+        if mode == "single":
+            cleaned_path = None  # 정제본을 따로 만들지 않는다
+        elif manifest.fresh("clean", clean_fp):
+            clean_chunks = _load_json(clean_chunks_path)
+            n = len(clean_chunks)
+        elif mode == "direct":
+            started = time.time()
+            clean_chunks = [clean_one(raw_chunks[0])]
+            _tick("clean", started)
+            _write_text(cleaned_path, clean_chunks[0])
+            _write_json(clean_chunks_path, clean_chunks)
+            _record("clean", clean_fp, [cleaned_path, clean_chunks_path])
+        else:
+            with ThreadPoolExecutor(max_workers=max(1, min(n, limiter.max_limit))) as pool:
+                results = list(pool.map(clean_then_map, raw_chunks))  # 입력 순서 유지
+
+            clean_chunks = [c for c, _ in results]
+            map_notes = [note for _, notes in results for note in notes]
+            _write_text(cleaned_path, "\n\n".join(clean_chunks))
+            _write_json(clean_chunks_path, clean_chunks)
+            _write_json(map_notes_path, map_notes)
+            _record("clean", clean_fp, [cleaned_path, clean_chunks_path])
+            _record("map", _fingerprint("map", clean_chunks, summary_model, map_budget), [map_notes_path])
+        if mode == "direct" and len(_pack_units(_sentence_units(clean_chunks[0]), map_budget)) > 1:
+            mode = "full"  # 정제본이 map 입력 하나를 넘으면 원래 경로
+        if mode == "full" and map_notes is None:
+            map_fp = _fingerprint("map", clean_chunks, summary_model, map_budget)
+            if manifest.fresh("map", map_fp):
+                map_notes = _load_json(map_notes_path)
+            else:
+                progress("map", 0, n)
+                with ThreadPoolExecutor(max_workers=max(1, min(n, limiter.max_limit))) as pool:
+                    map_notes = [note for notes in pool.map(map_chunk, clean_chunks) for note in notes]
+                _write_json(map_notes_path, map_notes)
+                _record("map", map_fp, [map_notes_path])
+        SUMMARY_MODES.inc(mode=mode)
+        log.info(f"🧭 [summary] mode={mode} (~{transcript_tokens} tokens, {n} chunks)")
+
+        def merge_group(group: list[str]) -> str:
+            prompt = (
+                "다음은 한 강의를 순서대로 나눠 요약한 노트 일부입니다. 하나의 노트로 병합하세요.\n"
+                "- 순서와 흐름 유지, 중복 제거, 용어 일관성 유지\n"
+                "- 공식(```math 블록)과 고유명사는 그대로 보존\n"
+                "- 입력에 없는 사실 금지\n\n"
+                f"{NOTES_SEP.join(group)}"
+            )
+            return _llm_text(
+                oai, summary_model, system_summarize, prompt, temperature=0.2, max_output_tokens=2500,
+                use_cache=use_cache)
+
+        def one_pass_prompt() -> str:
+            """single/direct 경로: 원문(또는 정제본)에서 바로 최종 문서를 만든다"""
+            head = (
+                "아래는 한국어 강의 전사 텍스트입니다. 의미 왜곡 없이 정리한 뒤 하나의 강의 노트로 요약하세요.\n"
+                "- 문장부호/띄어쓰기/맞춤법 오류와 음역된 고유명사(예: C++)는 맥락이 명확할 때만 바로잡아 반영\n"
+                if mode == "single" else
+                "아래 정제된 한국어 강의 텍스트를 하나의 강의 노트로 요약하세요.\n"
+            )
+            return (
+                head +
+                "- 입력에 없는 사실 금지, 불명확하면 [불명확]\n"
+                "출력은 Markdown으로 하고 아래 섹션을 포함:\n"
+                "1) 요약(3~8문장)\n"
+                "2) 핵심 개념 리스트\n"
+                "3) 실제 언급된 공식이 있으면 ```math 블록으로 표기\n\n"
+                f"{raw if mode == 'single' else clean_chunks[0]}"
+            )
+
+        # 3) 최종 리듀스 — Claude via GMS (우선). single/direct 는 OpenAI 1회로 끝낸다
+        progress("reduce")
+        summary_md_path  = os.path.join(out_dir, "summary.md")
+        summary_pdf_path = os.path.join(out_dir, "summary.pdf")
+        if mode == "single":
+            reduce_fp = _fingerprint("reduce", mode, raw_chunks, summary_model)
+        elif mode == "direct":
+            reduce_fp = _fingerprint("reduce", mode, clean_chunks, summary_model)
+        else:
+            reduce_fp = _fingerprint("reduce", map_notes, use_claude and bool(gms_key), summary_model, _reduce_config())
+        started = time.time()
+        reduce_levels = 0
+        reduce_took = None
+        rec = manifest.fresh("reduce", reduce_fp)
+        if rec:
+            with open(summary_md_path, "r", encoding="utf-8") as f:
+                final_md = f.read()
+            reduce_provider = rec.get("provider")
+            if on_token:
+                on_token(final_md)
+        elif mode != "full":
+            final_md = _llm_call(limiter, lambda: _llm_text(
+                oai, summary_model, system_summarize, one_pass_prompt(),
+                temperature=0.3, max_output_tokens=3000, use_cache=use_cache, on_token=on_token))
+            reduce_provider = "openai"
+            reduce_took = time.time() - started
+            STAGE_SECONDS.observe(reduce_took, stage="reduce")
+        else:
+            # 긴 강의는 중간 병합으로 먼저 줄인다 (짧으면 그대로 통과)
+            reduced_notes, reduce_levels = _tree_reduce(map_notes, merge_group, limiter, progress)
+            notes_joined = NOTES_SEP.join(reduced_notes)
+
+            streamed = [0]
+
+            def emit(text: str):
+                streamed[0] += 1
+                on_token(text)
+
+            # 폴백 — OpenAI reduce
+            def openai_reduce() -> str:
+                if on_token and streamed[0]:
+                    on_token("", reset=True)  # Claude 가 보내다 만 출력은 버리게 한다
+                prompt = (
+                    "다음 요약 노트 묶음을 하나의 문서로 통합하세요. "
+                    "중복 제거, 용어 일관성 유지, 사실추가 금지. "
+                    "출력은 Markdown으로 하고 아래 섹션을 포함:\n"
+                    "1) 요약(5~8문장)\n"
+                    "2) 핵심 개념 리스트\n"
+                    "3) 수학, 과학, 공학과 같이 공식이 필요, 언급 되거나 공식이 있으면 설명이 잘 된다면 수식을 표기해줘\n"
+                    f"{notes_joined}"
+                )
+                # clean/map 이 끝난 뒤라 429 하나로 요약 전체를 버리지 않게 한도 안에서 재시도
+                return _llm_call(limiter, lambda: _llm_text(
+                    oai, summary_model,
+                    """
+                        내가 한국어로 작성된 방대한 텍스트를 너에게 줄게. 
+                        텍스트 내용은 선생님이 학생들에게 가르친 내용, 즉 수업 내용이야. 
+                        따라서 텍스트는 수학, 언어, 과학, 역사, 경제, 공학 등 초,중,고, 대학교를 포함해 주식, 부동산 등 다양한 내용일 수 있어. 
+                        텍스트는 정말 많은 단어를 포함하고 있기 때문에 나는 텍스트를 잘 요약해서 학생들에게 주고 싶어. 
+                        따라서 텍스트에 있는 수업 내용만을 포함하고, hallucinations를 피하고, 한국어 깔끔한 한국어 Markdown을 작성해줘. 
+                        """,
+                    prompt, temperature=0.3, max_output_tokens=3000,
+                    chat_system="You are a senior Korean technical writer. Merge partial notes into one coherent Markdown document.",
+                    use_cache=use_cache,
+                    on_token=emit if on_token else None,
+                ))
+
+            claude_fn = None
+            if use_claude and gms_key:
+                claude_fn = lambda: _claude_reduce(gms_base, gms_key, notes_joined, use_cache=use_cache,
+                                                   on_token=emit if on_token else None)
+            final_md, reduce_provider = _reduce_with_fallback(claude_fn, openai_reduce,
+                                                              hedge=False if on_token else None)
+            reduce_took = time.time() - started
+            STAGE_SECONDS.observe(reduce_took, stage="reduce")
+
+        # 4) PDF — 백그라운드에서 렌더를 시작하고 Future 로 넘긴다
+        progress("pdf")
+        pdf_fp = _fingerprint("pdf", final_md)
+        pdf_took = [None]
+        pdf_rendered = not manifest.fresh("pdf", pdf_fp)
+        if not pdf_rendered:
+            summary_pdf = Future()
+            with open(summary_pdf_path, "rb") as f:
+                summary_pdf.set_result(f.read())
+        else:
+            def render() -> bytes:
+                started = time.time()
+                try:
+                    data = render_summary_pdf(final_md)
+                except Exception:
+                    STAGE_FAILURES.inc(stage="pdf")
+                    raise
+                pdf_took[0] = time.time() - started
+                STAGE_SECONDS.observe(pdf_took[0], stage="pdf")
+                return data
+            summary_pdf = _pdf_waiters.submit(render)
+
+        def persist():
+            """summary.md/pdf 를 작업 공간에 쓰고 체크포인트를 남긴다 (새로 만든 것만)"""
+            if reduce_took is not None:
+                _write_text(summary_md_path, final_md)
+                manifest.record("reduce", reduce_fp, [summary_md_path], 0, took=reduce_took,
+                                provider=reduce_provider)
+            if pdf_rendered:
+                _write_bytes(summary_pdf_path, summary_pdf.result())
+                manifest.record("pdf", pdf_fp, [summary_pdf_path], 0, took=pdf_took[0])
+            log.debug("✅ summary 저장: %s / %s", summary_md_path, summary_pdf_path)
+
+        return {
+            "ok": True,
+            "summary_path": summary_md_path,
+            "summary_pdf_path": summary_pdf_path,
+            "clean_path": cleaned_path,
+            "reduce_levels": reduce_levels,
+            "reduce_provider": reduce_provider,
+            "summary_mode": mode,
+            "transcript_tokens": transcript_tokens,
+            "summary_md": final_md,
+            "summary_pdf": summary_pdf,
+            "persist": persist,
+        }
+
+    except Exception as e:
+        traceback.print_exc()
+        return {"ok": False, "detail": f"summarize_text_auto 실패: {e}"}
+
+
+# ─────────────────────────────────────────────────────────────
+# 요약 업로드/정리: 요약 md/pdf 는 메모리 버퍼 그대로 업로드 본문으로 흘려보낸다.
+# 작업 공간 삭제(업로드 성공)나 summary.md/pdf 저장(업로드 실패 → 재시도 대비)은
+# 응답 뒤 백그라운드에서 작업 공간 락을 잡고 한다.
+#   SUMMARY_UPLOAD_EARLY : true 면 PDF 렌더가 끝나기 전에 md 부터 chunked 로 업로드 시작
+#                          (수신 서버가 Transfer-Encoding: chunked 를 받아야 함, 기본 false)
+# ─────────────────────────────────────────────────────────────
+def cleanup_workspace(workspace: str) -> dict:
+    """끝난 작업의 작업 공간만 지운다. 같은 class 의 다른 meeting 이 없으면 class 디렉토리도 정리"""
+    try:
+        if not os.path.isdir(workspace):
+            return {"ok": False, "detail": f"디렉토리 없음: {workspace}"}
+
+        base = os.path.realpath(MERGE_OUT_DIR)
+        target = os.path.realpath(workspace)
+
+        # MERGE_OUT_DIR/{class_id}/{meeting|job} 만 허용
+        if os.path.dirname(os.path.dirname(target)) != base:
+            return {"ok": False, "detail": f"허용 경로 아님: {target} (base={base})"}
 
         shutil.rmtree(target)
+        try:
+            os.rmdir(os.path.dirname(target))
+        except OSError:
+            pass  # 다른 작업 공간이 남아 있음
         return {"ok": True, "deleted_dir": target}
     except Exception as e:
         return {"ok": False, "detail": f"디렉토리 삭제 실패: {e}"}
 
-def send_summary_to_api(class_id: str, meeting_id: str | None, md_path: str | None, pdf_path: str | None) -> dict:
+def _summary_upload_url(class_id: str) -> str:
+    # 🔹 {class_id}/{classId} 템플릿 치환
+    return (settings.summary_upload_url
+            .replace("{class_id}", str(class_id))
+            .replace("{classId}", str(class_id)))
 
-    try:
-        env_path = os.path.join(os.path.dirname(__file__), "../backend/.env")
-        if os.path.exists(env_path):
-            load_dotenv(env_path)
 
-        url_tpl = os.getenv("SUMMARY_UPLOAD_URL", "").strip()
-        api_key = os.getenv("SUMMARY_UPLOAD_API_KEY", "").strip()
-        if not url_tpl:
-            return {"ok": False, "detail": "SUMMARY_UPLOAD_URL 미설정"}
+def _summary_parts(class_id: str, meeting_id: str | None, md: bytes | None) -> list:
+    parts = [("class_id", None, None, [str(class_id).encode("utf-8")])]
+    if meeting_id is not None:
+        parts.append(("meeting_id", None, None, [str(meeting_id).encode("utf-8")]))
+    if md:
+        parts.append(("summary_md", "summary.md", "text/markdown; charset=utf-8", [md]))
+    return parts
 
-        # 🔹 {class_id}/{classId} 템플릿 치환
-        url = (url_tpl
-               .replace("{class_id}", str(class_id))
-               .replace("{classId}", str(class_id)))
 
-        headers = {"Accept": "application/json"}
-        if api_key:
-            headers["Authorization"] = f"Bearer {api_key}"  # 필요 없으면 .env에서 KEY 비워두면 됨
+def _early_summary_body(boundary: str, parts: list, pdf: Future):
+    """class_id/meeting_id/summary_md 를 먼저 보내고, PDF 는 렌더가 끝나는 대로 이어 붙인다 (chunked)"""
+    for name, filename, ctype, pieces in parts:
+        yield _multipart_head(boundary, name, filename, ctype) + b"".join(pieces) + b"\r\n"
+    data = pdf.result()
+    UPLOAD_BYTES.inc(len(data), target="summary")
+    yield _multipart_head(boundary, "summary_pdf", "summary.pdf", "application/pdf") + data + b"\r\n"
+    yield f"--{boundary}--\r\n".encode("utf-8")
 
-        files = {}
-        if md_path and os.path.isfile(md_path):
-            files["summary_md"] = ("summary.md", open(md_path, "rb"), "text/markdown; charset=utf-8")
-        if pdf_path and os.path.isfile(pdf_path):
-            files["summary_pdf"] = ("summary.pdf", open(pdf_path, "rb"), "application/pdf")
 
-        if not files:
+def send_summary_to_api(class_id: str, meeting_id: str | None, md: bytes | None,
+                        pdf: "bytes | Future | None" = None) -> dict:
+    """
+    요약 md/pdf 를 메모리 버퍼에서 바로 multipart 로 올린다 (디스크를 거치지 않음).
+    pdf 가 렌더 중인 Future 이고 SUMMARY_UPLOAD_EARLY=true 면 md 부터 chunked 로 보내기 시작하고,
+    아니면 렌더가 끝나길 기다렸다가 Content-Length 를 붙여 한 번에 보낸다.
+    """
+    try:
+        if not settings.summary_upload_url:
+            return {"ok": False, "detail": "SUMMARY_UPLOAD_URL 미설정"}
+        if not md and pdf is None:
             return {"ok": False, "detail": "전송할 파일이 없습니다.(md/pdf 없음)"}
 
-        data = {"class_id": str(class_id), "meeting_id": meeting_id}
-        resp = requests.post(url, headers=headers, data=data, files=files, timeout=60)
-
-        # 파일 핸들 닫기
-        for f in files.values():
-            try: f[1].close()
-            except: pass
+        url = _summary_upload_url(class_id)
+        headers = {"Accept": "application/json"}
+        if settings.summary_upload_api_key:
+            headers["Authorization"] = f"Bearer {settings.summary_upload_api_key}"  # 필요 없으면 .env에서 KEY 비워두면 됨
+
+        parts = _summary_parts(class_id, meeting_id, md)
+        UPLOAD_BYTES.inc(len(md or b""), target="summary")
+        if isinstance(pdf, Future) and settings.summary_upload_early and not pdf.done():
+            boundary = uuid.uuid4().hex
+            headers["Content-Type"] = f"multipart/form-data; boundary={boundary}"
+            resp = _clients().upload.post(url, headers=headers, data=_early_summary_body(boundary, parts, pdf),
+                                          timeout=60)
+        else:
+            if isinstance(pdf, Future):
+                pdf = pdf.result()
+            if pdf:
+                UPLOAD_BYTES.inc(len(pdf), target="summary")
+                parts.append(("summary_pdf", "summary.pdf", "application/pdf", [pdf]))
+            body = MultipartStream(parts)
+            headers["Content-Type"] = body.content_type
+            headers["Content-Length"] = str(len(body))
+            resp = _clients().upload.post(url, headers=headers, data=body, timeout=60)
 
         if 200 <= resp.status_code < 300:
             return {"ok": True, "status": resp.status_code, "text": (resp.text or "")[:200]}
@@ -727,31 +2690,366 @@ def send_summary_to_api(class_id: str, meeting_id: str | None, md_path: str | No
         return {"ok": False, "detail": f"업로드 실패: {e}"}
 
 
-@app.post("/STT/{class_id}")
-def merge_audio(class_id: str, request: dict):
-    print("파이썬 merge 합병 처리 -> class_id : ", class_id)
-    
-    # server.js에서 전달받은 데이터 추출
+# ─────────────────────────────────────────────────────────────
+# 작업 공간: 출력은 MERGE_OUT_DIR/{class_id}/{meeting-<meeting_id> | input-<입력 지문> | job-<job_id>} 아래에 둔다.
+# 같은 class 의 서로 다른 meeting 은 디렉토리가 달라 완전히 병렬로 돌고,
+# 같은 meeting 의 재시도/중복 요청은 작업 공간 잠금으로 차례를 기다린다 (체크포인트는 그대로 재사용).
+# meeting_id 가 없는 요청은 class 의 입력 청크(이름/크기/mtime) 지문으로 이름을 정해, 같은 요청의 재시도가
+# 같은 작업 공간의 체크포인트를 쓰게 한다. 입력 청크가 없을 때만 잡마다 새 작업 공간(job-*)이다.
+# ─────────────────────────────────────────────────────────────
+class _PathLock:
+    """
+    경로별 잠금. threading.Lock 은 weakref 가 안 되므로 감싸서 WeakValueDictionary 에 넣는다.
+    잡고 있거나 기다리는 쪽이 없어지면 항목도 사라져, 지나간 작업 공간의 잠금이 쌓이지 않는다.
+    """
+    __slots__ = ("_lock", "__weakref__")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        return self._lock.acquire(blocking, timeout)
+
+    def release(self):
+        self._lock.release()
+
+    def locked(self) -> bool:
+        return self._lock.locked()
+
+    def __enter__(self):
+        self._lock.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self._lock.release()
+
+
+def _path_lock(locks: "weakref.WeakValueDictionary[str, _PathLock]", guard: threading.Lock, path: str) -> _PathLock:
+    key = os.path.realpath(path)
+    with guard:
+        lock = locks.get(key)
+        if lock is None:
+            lock = locks[key] = _PathLock()
+        return lock
+
+
+_workspace_locks: "weakref.WeakValueDictionary[str, _PathLock]" = weakref.WeakValueDictionary()
+_workspace_locks_guard = threading.Lock()
+
+
+def _safe_name(value) -> str:
+    return re.sub(r"[^0-9A-Za-z가-힣_.-]", "_", str(value)).strip(".") or "_"
+
+
+def _workspace_dir(class_id: str, meeting_id=None, job_id: str | None = None) -> str:
+    if meeting_id not in (None, ""):
+        key = f"meeting-{_safe_name(meeting_id)}"
+    elif job_id:
+        key = f"job-{_safe_name(job_id)}"
+    else:
+        key = "default"
+    return os.path.join(MERGE_OUT_DIR, str(class_id), key)
+
+
+def _pipeline_workspace(class_id: str, request: dict, job_id: str | None = None) -> str:
     meeting_id = request.get("meeting_id")
-    total_chunks = request.get("total_chunks")
-    generate_summary = request.get("generate_summary")
-    
-    print("📝 FastAPI에서 받은 데이터:")
-    print("- class_id:", class_id)
-    print("- meeting_id:", meeting_id)
-    print("- total_chunks:", total_chunks)
-    print("- generate_summary:", generate_summary)
-    """
-    입력:  BASE_AUDIO_DIR/{class_id}/audio_*.wav (없으면 *.wav)
-    출력:  MERGE_OUT_DIR/Merge__{class_id}.wav
-    """
-    in_dir = os.path.join(BASE_AUDIO_DIR, str(class_id))
-    print("in_dir : ", in_dir)
-    if not os.path.isdir(in_dir):
-        raise HTTPException(status_code=400, detail=f"Directory not found: {in_dir}")
+    if meeting_id in (None, ""):
+        files = sorted(glob.glob(os.path.join(BASE_AUDIO_DIR, str(class_id), "*.wav")))
+        try:
+            key = _fingerprint(str(class_id), _files_fingerprint(files))[:16] if files else None
+        except FileNotFoundError:
+            key = None  # 목록을 읽는 사이 청크가 바뀜
+        if key:
+            return os.path.join(MERGE_OUT_DIR, str(class_id), f"input-{key}")
+    return _workspace_dir(class_id, meeting_id, job_id or uuid.uuid4().hex)
+
+
+def _workspace_lock(workspace: str) -> _PathLock:
+    return _path_lock(_workspace_locks, _workspace_locks_guard, workspace)
+
+
+# ─────────────────────────────────────────────────────────────
+# 실시간 청크 적재(ingest): 녹음 중 도착하는 chunk_N.wav 를 바로 검증하고
+# 작업 공간의 Merge__{class_id}.ingest.wav 뒤에 PCM 만 이어 붙인다. (meeting_id 가 없으면 default 작업 공간)
+# 본문으로 받은 청크는 BASE_AUDIO_DIR/{class_id}/meeting-{id}/ 에 meeting 별로 남긴다 (폴백 병합 입력).
+# 순서가 뒤바뀐 청크는 pending 으로 두었다가 앞 번호가 채워지면 차례로 붙인다.
+# stop-recording 시에는 RIFF 헤더의 크기 필드만 고치면 된다.
+#   INGEST_FIRST_CHUNK : 첫 청크 번호 (프론트엔드 기준 1)
+# ─────────────────────────────────────────────────────────────
+INGEST_STATE_NAME = "ingest.json"
+
+_ingest_locks: "weakref.WeakValueDictionary[str, _PathLock]" = weakref.WeakValueDictionary()
+_ingest_locks_guard = threading.Lock()
+
+
+def _ingest_lock(ingest_dir: str) -> _PathLock:
+    return _path_lock(_ingest_locks, _ingest_locks_guard, ingest_dir)
+
+
+def _ingest_paths(class_id: str, meeting_id=None) -> tuple[str, str, str]:
+    ingest_dir = _workspace_dir(class_id, meeting_id)
+    return (
+        ingest_dir,
+        os.path.join(ingest_dir, INGEST_STATE_NAME),
+        os.path.join(ingest_dir, f"Merge__{class_id}.ingest.wav"),
+    )
+
+
+def _input_dir(class_id: str, meeting_id=None) -> str:
+    """원본 청크 디렉토리. meeting 별 디렉토리가 있으면 그것, 없으면 BASE_AUDIO_DIR/{class_id} (server.js 저장 위치)"""
+    class_dir = os.path.join(BASE_AUDIO_DIR, str(class_id))
+    if meeting_id in (None, ""):
+        return class_dir
+    meeting_dir = os.path.join(class_dir, f"meeting-{_safe_name(meeting_id)}")
+    return meeting_dir if os.path.isdir(meeting_dir) else class_dir
+
+
+def _load_ingest_state(state_path: str) -> dict | None:
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _save_ingest_state(state_path: str, state: dict):
+    tmp = state_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fw:
+        json.dump(state, fw, ensure_ascii=False)
+    os.replace(tmp, state_path)
+
+
+def _chunk_path(in_dir: str, index: int) -> str | None:
+    for name in (f"chunk_{index}.wav", f"audio_{index}.wav"):
+        p = os.path.join(in_dir, name)
+        if os.path.isfile(p):
+            return p
+    return None
+
+
+def _append_pcm(dst, src_path: str, info: dict):
+    dst.flush()
+    src_fd = os.open(src_path, os.O_RDONLY)
+    try:
+        _copy_range(src_fd, info["data_offset"], info["data_size"], dst.fileno())
+    finally:
+        os.close(src_fd)
+
 
+def ingest_chunk(class_id: str, index: int, data: bytes | None = None, meeting_id: str | None = None) -> dict:
+    """
+    청크 하나를 적재한다. data 가 있으면 검증 후 BASE_AUDIO_DIR/{class_id}/meeting-{id}/chunk_{index}.wav
+    (meeting_id 가 없으면 BASE_AUDIO_DIR/{class_id}/) 로 저장하고, 없으면 server.js 가 이미 저장해둔 파일을 읽는다.
+    저장된 청크는 기존 병합 경로의 폴백 입력이 되므로, 이미 붙였거나 대기 중인 번호가 다시 오면
+    파일을 덮어쓰지 않는다 (적재된 PCM 과 폴백 병합 결과가 같게).
+    """
+    in_dir = _input_dir(class_id, meeting_id)
+    tmp = None
+    if data:
+        if meeting_id not in (None, ""):
+            in_dir = os.path.join(BASE_AUDIO_DIR, str(class_id), f"meeting-{_safe_name(meeting_id)}")
+        os.makedirs(in_dir, exist_ok=True)
+        chunk_path = os.path.join(in_dir, f"chunk_{index}.wav")
+        tmp = f"{chunk_path}.{uuid.uuid4().hex}.tmp"  # 번호 검사를 통과해야 chunk_path 로 옮긴다
+        with open(tmp, "wb") as fw:
+            fw.write(data)
+    else:
+        chunk_path = _chunk_path(in_dir, index)
+        if not chunk_path:
+            raise HTTPException(status_code=404, detail=f"청크 파일 없음: {in_dir}/chunk_{index}.wav")
+
+    try:
+        return _ingest_one(class_id, index, meeting_id, in_dir, chunk_path, tmp)
+    finally:
+        if tmp and os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _ingest_one(class_id: str, index: int, meeting_id, in_dir: str, chunk_path: str, tmp: str | None) -> dict:
+    # 도착 즉시 검증
+    try:
+        info = _read_wav_info(tmp or chunk_path)
+    except ValueError as ve:
+        raise HTTPException(status_code=415, detail=str(ve))
+
+    ingest_dir, state_path, ingest_path = _ingest_paths(class_id, meeting_id)
+    os.makedirs(ingest_dir, exist_ok=True)
+
+    with _ingest_lock(ingest_dir):
+        state = _load_ingest_state(state_path)
+        if state is not None and meeting_id and state.get("meeting_id") not in (None, meeting_id):
+            log.warning(f"[ingest] 다른 meeting({state.get('meeting_id')}) 의 적재 기록을 버리고 새로 시작")
+            state = None
+        if state is None or not os.path.isfile(ingest_path):
+            state = {
+                "meeting_id": meeting_id,
+                "params": None,
+                "next_index": int(os.getenv("INGEST_FIRST_CHUNK", "1")),
+                "data_size": 0,
+                "appended": [],
+                "pending": [],
+            }
+            with open(ingest_path, "wb") as fw:
+                fw.write(b"\0" * 44)  # 헤더 자리 (finalize 에서 채움)
+
+        params = state["params"]
+        if params is None:
+            params = _target_params(info)
+            state["params"] = params
+        elif not _same_params(info, params) and _target_rate() <= 0:
+            raise HTTPException(
+                status_code=415,
+                detail=(f"오디오 파라미터 불일치: {os.path.basename(chunk_path)} "
+                        f"(ch={info['channels']}, width={info['sampwidth']}, rate={info['framerate']}) "
+                        f"vs 기준(ch={params['channels']}, width={params['sampwidth']}, rate={params['framerate']})")
+            )
+
+        if index < state["next_index"] or index in state["pending"]:
+            return {"ok": True, "duplicate": True, "index": index, **_ingest_summary(state)}
+
+        if tmp:
+            os.replace(tmp, chunk_path)
+        state["pending"].append(index)
+        state["pending"].sort()
+
+        # next_index 부터 연속된 청크를 붙인다
+        with open(ingest_path, "r+b", buffering=0) as dst:
+            dst.seek(44 + state["data_size"])
+            while state["pending"] and state["pending"][0] == state["next_index"]:
+                idx = state["pending"].pop(0)
+                p = chunk_path if idx == index else _chunk_path(in_dir, idx)
+                pinfo = info if idx == index else _read_wav_info(p)
+                if _same_params(pinfo, params):
+                    _append_pcm(dst, p, pinfo)
+                    state["data_size"] += pinfo["data_size"]
+                else:
+                    pcm = _convert_chunk(p, pinfo, params)
+                    _write_all(dst.fileno(), pcm)
+                    state["data_size"] += len(pcm)
+                state["appended"].append(idx)
+                state["next_index"] = idx + 1
+            dst.truncate(44 + state["data_size"])
+
+        _save_ingest_state(state_path, state)
+        return {"ok": True, "duplicate": False, "index": index, **_ingest_summary(state)}
+
+
+def _ingest_summary(state: dict) -> dict:
+    params = state.get("params") or {}
+    rate = params.get("framerate") or 0
+    block = (params.get("channels") or 0) * (params.get("sampwidth") or 0)
+    return {
+        "appended": len(state["appended"]),
+        "next_index": state["next_index"],
+        "pending": list(state["pending"]),
+        "data_bytes": state["data_size"],
+        "duration_sec": round(state["data_size"] / (rate * block), 3) if rate and block else 0.0,
+    }
+
+
+def _discard_ingest(state_path: str, ingest_path: str):
+    for p in (state_path, ingest_path):
+        try:
+            os.remove(p)
+        except FileNotFoundError:
+            pass
+
+
+def finalize_ingest(class_id: str, files: list[str], out_path: str, meeting_id=None) -> bool:
+    """
+    적재된 WAV 가 in_dir 의 모든 청크를 포함하면 헤더 크기 필드만 고쳐 out_path 로 옮긴다 (상수 시간).
+    빠진 청크가 있거나 적재 기록이 없으면 False → 호출 측에서 기존 전체 병합으로 폴백.
+    """
+    ingest_dir, state_path, ingest_path = _ingest_paths(class_id, meeting_id)
+    with _ingest_lock(ingest_dir):
+        state = _load_ingest_state(state_path)
+        if state is None or not state.get("params") or not os.path.isfile(ingest_path):
+            return False
+        appended = set(state["appended"])
+        missing = [f for f in files if _numeric_key(f) not in appended]
+        if missing or state["pending"]:
+            log.warning(f"[ingest] 누락 청크 {len(missing)}개 / pending={state['pending']} → 전체 병합으로 폴백")
+            _discard_ingest(state_path, ingest_path)
+            return False
+
+        p = state["params"]
+        with open(ingest_path, "r+b") as fw:
+            fw.seek(0)
+            fw.write(_wav_header(p["channels"], p["sampwidth"], p["framerate"], state["data_size"]))
+        os.replace(ingest_path, out_path)
+        os.remove(state_path)
+        if os.path.dirname(out_path) != ingest_dir:
+            try:
+                os.rmdir(ingest_dir)  # meeting_id 없이 적재한 default 작업 공간
+            except OSError:
+                pass
+        log.info(f"[ingest] 헤더만 갱신해 병합 완료: {out_path} ({len(appended)} chunks, {state['data_size']} bytes)")
+        return True
 
 
+def _noop_progress(stage: str, done: int | None = None, total: int | None = None):
+    pass
+
+
+def _run_deferred(workspace: str, tasks: list):
+    """응답 뒤에 도는 작업 공간 후처리 (요약 저장 / 작업 공간 삭제)"""
+    with _workspace_lock(workspace):
+        for task in tasks:
+            try:
+                task()
+            except Exception:
+                traceback.print_exc()
+
+
+def run_stt_pipeline(class_id: str, request: dict, progress=None, on_token=None,
+                     job_id: str | None = None, background=None) -> dict:
+    """
+    merge → STT → clean → map → reduce → PDF → upload 전체 파이프라인.
+    동기 엔드포인트와 잡 워커가 공유한다. 실패 시 HTTPException 을 올린다.
+    on_token: 최종 리듀스 출력 스트리밍 콜백 (summarize_text_auto 참고)
+    job_id: meeting_id 도 입력 청크도 없을 때 작업 공간 이름 (없으면 새로 만든다)
+    background: background(fn, *args) 로 후처리를 넘길 곳 (BackgroundTasks.add_task 등).
+                없으면 결과를 돌려주기 전에 이 스레드에서 바로 한다.
+    같은 작업 공간(meeting)은 한 번에 하나만 돈다.
+    진행 중 잡 게이지와 단계별 실패 카운터(마지막으로 진입한 단계 기준)를 여기서 센다.
+    """
+    workspace = _pipeline_workspace(class_id, request, job_id)
+    outer = progress or _noop_progress
+    stage = ["request"]
+
+    def tracked(name: str, done: int | None = None, total: int | None = None):
+        stage[0] = name
+        outer(name, done, total)
+
+    deferred = []
+    with _workspace_lock(workspace):
+        JOBS_IN_FLIGHT.inc()
+        try:
+            result = _run_stt_pipeline(class_id, request, workspace, tracked, on_token, deferred)
+        except Exception:
+            STAGE_FAILURES.inc(stage=stage[0])
+            raise
+        finally:
+            JOBS_IN_FLIGHT.dec()
+    if deferred:
+        (background or (lambda fn, *args: fn(*args)))(_run_deferred, workspace, deferred)
+    if result.get("status") != "summary_done":
+        STAGE_FAILURES.inc(stage="stt" if result.get("status", "").startswith("stt") else stage[0])
+    elif not (result.get("upload_result") or {}).get("ok"):
+        STAGE_FAILURES.inc(stage="upload")
+    return result
+
+
+def _pipeline_inputs(class_id: str, meeting_id=None) -> tuple[str, list[str]]:
+    """
+    입력:  BASE_AUDIO_DIR/{class_id}/[meeting-{id}/]audio_*.wav (없으면 *.wav)
+    출력:  {workspace}/Merge__{class_id}.wav
+    """
+    in_dir = _input_dir(class_id, meeting_id)
+    log.debug("in_dir : %s", in_dir)
+    if not os.path.isdir(in_dir):
+        raise HTTPException(status_code=400, detail=f"Directory not found: {in_dir}")
+
     # 대상 파일 수집
     patterns = [os.path.join(in_dir, "audio_*.wav"), os.path.join(in_dir, "*.wav")]
     candidates = []
@@ -761,102 +3059,905 @@ def merge_audio(class_id: str, request: dict):
 
     if not files:
         raise HTTPException(status_code=404, detail=f"No WAV files found in {in_dir}")
+    return in_dir, files
 
-    
-    class_out_dir = os.path.join(MERGE_OUT_DIR, str(class_id))
-    os.makedirs(class_out_dir, exist_ok=True)
-    out_path = os.path.join(class_out_dir, f"Merge__{class_id}.wav")
-    print("out_path : ", out_path)
 
-    try:
-        print("wav_ready 시작")
-        wav_ready = [ensure_wav(p) for p in files]
-        print("wav_ready 완료 ")
-        for p in wav_ready:
-            size = os.path.getsize(p)
-            with open(p, "rb") as f:
-                hdr = f.read(12)
-            print(f"  - {p} (size={size}, header={hdr})")  # 여기서는 꼭 b'RIFF'가 찍혀야 함
+def stage_merge(class_id: str, request: dict, workspace: str, manifest: StageManifest,
+                files: list[str], progress) -> str:
+    """청크 병합 — 녹음 중 적재가 끝나 있으면 헤더만 갱신. 반환: merge 지문"""
+    out_path = os.path.join(workspace, f"Merge__{class_id}.wav")
+    log.debug("out_path : %s", out_path)
+    progress("merge", 0, len(files))
+    merge_fp = _fingerprint("merge", _files_fingerprint(files), _target_rate())
+    started = time.time()
+    if not manifest.fresh("merge", merge_fp):
+        if not finalize_ingest(class_id, files, out_path, request.get("meeting_id")):
+            # RIFF 가 아닌 청크는 merge_wav_files 안에서 ensure_wav 로 변환
+            with _atomic_output(out_path) as tmp:
+                merge_wav_files(files, tmp)
+        manifest.record("merge", merge_fp, [out_path], started)
+    progress("merge", len(files), len(files))
+    log.debug("merged => %s", out_path)
+    return merge_fp
+
+
+def stage_stt(class_id: str, request: dict, workspace: str, manifest: StageManifest,
+              merge_fp: str, progress) -> tuple[dict, dict | None]:
+    """긴 무음 압축(VAD) + STT. 반환: (stt_result, vad_result)"""
+    out_path = os.path.join(workspace, f"Merge__{class_id}.wav")
+
+    # 긴 무음 압축 → STT 업로드/LLM 토큰 절감
+    vad_result = None
+    stt_input = out_path
+    stt_input_fp = merge_fp
+    if str(request.get("vad", os.getenv("VAD_ENABLE", "true"))).lower() == "true":
+        progress("vad")
+        vad_fp = _fingerprint("vad", merge_fp, {k: os.getenv(k) for k in (
+            "VAD_MIN_SILENCE_MS", "VAD_KEEP_SILENCE_MS", "VAD_ENERGY_DB", "VAD_MARGIN_DB", "VAD_ZCR")})
+        started = time.time()
+        rec = manifest.fresh("vad", vad_fp)
+        if rec:
+            vad_result = rec["result"]
+        else:
+            try:
+                vad_result = vad_trim(out_path, os.path.join(workspace, f"Merge__{class_id}.vad.wav"))
+                manifest.record("vad", vad_fp, [vad_result["path"]], started, result=vad_result)
+            except Exception as e:
+                traceback.print_exc()
+                STAGE_FAILURES.inc(stage="vad")
+                vad_result = {"ok": False, "detail": f"VAD 실패, 원본 사용: {e}"}
+        if vad_result.get("ok"):
+            stt_input = vad_result["path"]
+            stt_input_fp = vad_fp
+
+    progress("stt")
+    stt_mode = request.get("stt_mode") or os.getenv("STT_MODE", "sync")
+    stt_fp = _fingerprint("stt", stt_input_fp, stt_mode)
+    started = time.time()
+    transcript_file = os.path.join(workspace, "transcript.txt")
+    segments_file = os.path.join(workspace, "stt_segments.json")
+    if manifest.fresh("stt", stt_fp):
+        with open(transcript_file, "r", encoding="utf-8") as f:
+            text = f.read()
+        stt_result = {"ok": True, "text": text, "segments": _load_json(segments_file),
+                      "transcript_path": transcript_file, "detail": "이전 STT 결과 재사용"}
+    else:
+        stt_result = Start_STT(stt_input, class_id, mode=stt_mode)
+        if stt_result.get("ok") and stt_input != out_path and stt_result.get("segments"):
+            # 잘린 파일 기준 타임스탬프 → 원본 녹음 기준
+            stt_result["segments"] = _remap_segments(stt_result["segments"], vad_result["offset_map"])
+            _write_json(segments_file, stt_result["segments"])
+        if stt_result.get("ok") and stt_result.get("transcript_path"):
+            manifest.record("stt", stt_fp, [stt_result["transcript_path"], segments_file], started)
+    return stt_result, vad_result
+
+
+def stage_upload(class_id: str, meeting_id, manifest: StageManifest, md: bytes, pdf, progress) -> dict:
+    """요약 업로드. 같은 요약을 이미 올렸으면(체크포인트) 다시 보내지 않는다"""
+    progress("upload")
+    upload_fp = _fingerprint("upload", hashlib.sha256(md).hexdigest(),
+                             class_id, meeting_id, settings.summary_upload_url)
+    started = time.time()
+    rec = manifest.fresh("upload", upload_fp)
+    if rec:
+        return {**rec["result"], "skipped": True}
+    upload_result = send_summary_to_api(
+        class_id=class_id,
+        meeting_id=meeting_id,  # meeting_id 추가
+        md=md,
+        pdf=pdf,  # 렌더 중이면 Future
+    )
+    if upload_result and upload_result.get("ok"):
+        manifest.record("upload", upload_fp, [], started, result=upload_result)
+    return upload_result
+
+
+def _pipeline_result(class_id: str, request: dict, workspace: str, in_dir: str, files: list[str],
+                     skipped: list[str], stt_result: dict, vad_result: dict | None,
+                     summary_result: dict | None = None, upload_result: dict | None = None,
+                     cleanup_result: dict | None = None) -> dict:
+    """파이프라인 응답 (STT 실패 / transcript 없음 / 요약 결과)"""
+    merged = os.path.join(workspace, f"Merge__{class_id}.wav")
+    vad_report = {k: v for k, v in (vad_result or {}).items() if k not in ("offset_map", "path")} or None
+    # STT 실패 시 즉시 반환
+    if not stt_result.get("ok"):
+        return {
+            "status": "stt_failed",
+            "message": "STT 실패",
+            "class_id": class_id,
+            "input_dir": in_dir,
+            "files_merged": [os.path.basename(f) for f in files],
+            "output_path": merged,
+            "stt_ok": False,
+            "vad": vad_report,
+            "stt_detail": stt_result.get("detail"),
+            "summary_ok": False,
+            "summary_path": None,
+            "summary_pdf_path": None,
+            "clean_path": None,
+            "summary_detail": "STT 실패로 요약 미수행",
+            "stages_skipped": skipped,
+            "workspace": workspace,
+        }
+    transcript_path = stt_result.get("transcript_path")
+    if not transcript_path:
+        return {
+            "status": "stt_ok_no_transcript",
+            "message": "STT는 성공했지만 transcript 경로가 없습니다.",
+            "class_id": class_id,
+            "output_path": merged,
+            "stt_ok": True,
+            "transcript_path": None,
+            "summary_ok": False
+        }
+    uploaded = bool((upload_result or {}).get("ok"))
+    return {
+        "status": "summary_done" if (summary_result or {}).get("ok") else "summary_failed",
+        "message": "STT 성공 및 요약 처리 완료" if (summary_result or {}).get("ok") else "STT 성공, 요약 실패",
+        "class_id": class_id,
+        "meeting_id": request.get("meeting_id"),  # meeting_id 추가
+        "input_dir": in_dir,
+        "files_merged": [os.path.basename(f) for f in files],
+        "output_path": merged,
+        "stt_ok": True,
+        "vad": vad_report,
+        "transcript_path": transcript_path,
+        "stt_detail": stt_result.get("detail"),
+        "summary_ok": (summary_result or {}).get("ok", False),
+        # 업로드에 성공하면 summary.md/pdf 는 디스크에 쓰지 않고 작업 공간째 지운다 → 경로 없음
+        "summary_path": None if uploaded else (summary_result or {}).get("summary_path"),
+        "summary_pdf_path": None if uploaded else (summary_result or {}).get("summary_pdf_path"),
+        "clean_path": (summary_result or {}).get("clean_path"),
+        "summary_mode": (summary_result or {}).get("summary_mode"),
+        "summary_detail": (summary_result or {}).get("detail"),
+        "upload_result": upload_result,
+        "cleanup_result": cleanup_result,
+        "stages_skipped": skipped,
+        "workspace": workspace,
+    }
 
-        #1) 음성 파일 Merge
-        merged = merge_wav_files(wav_ready, out_path)
-        print("merged => ", merged)
-        #2) STT
-        stt_result = Start_STT(out_path,class_id)
-        # STT 실패 시 즉시 반환
-        if not stt_result.get("ok"):
-            return {
-                "status": "stt_failed",
-                "message": "STT 실패",
-                "class_id": class_id,
-                "input_dir": in_dir,
-                "files_merged": [os.path.basename(f) for f in files],
-                "output_path": merged,
-                "stt_ok": False,
-                "stt_detail": stt_result.get("detail"),
-                "summary_ok": False,
-                "summary_path": None,
-                "summary_pdf_path": None,
-                "clean_path": None,
-                "summary_detail": "STT 실패로 요약 미수행",
-            }
 
-         # 3) STT 성공 → 요약 실행
-        transcript_path = stt_result.get("transcript_path")
-        if not transcript_path:
-            return {
-                "status": "stt_ok_no_transcript",
-                "message": "STT는 성공했지만 transcript 경로가 없습니다.",
-                "class_id": class_id,
-                "output_path": merged,
-                "stt_ok": True,
-                "transcript_path": None,
-                "summary_ok": False
-            }
+def _run_stt_pipeline(class_id: str, request: dict, workspace: str, progress, on_token=None,
+                      deferred: list | None = None) -> dict:
+    # server.js에서 전달받은 데이터 추출
+    meeting_id = request.get("meeting_id")
+    total_chunks = request.get("total_chunks")
+    generate_summary = request.get("generate_summary")
+
+    log.debug("📝 FastAPI에서 받은 데이터: class_id=%s, meeting_id=%s, total_chunks=%s, generate_summary=%s",
+              class_id, meeting_id, total_chunks, generate_summary)
+    in_dir, files = _pipeline_inputs(class_id, request.get("meeting_id"))
+    os.makedirs(workspace, exist_ok=True)
+    manifest = StageManifest(workspace, request.get("force_from_stage"))
+    if deferred is None:
+        deferred = []
+
+    try:
+        #1) 음성 파일 Merge
+        merge_fp = stage_merge(class_id, request, workspace, manifest, files, progress)
+        #2) VAD + STT
+        stt_result, vad_result = stage_stt(class_id, request, workspace, manifest, merge_fp, progress)
+        if not stt_result.get("ok") or not stt_result.get("transcript_path"):
+            return _pipeline_result(class_id, request, workspace, in_dir, files, manifest.skipped,
+                                    stt_result, vad_result)
+
+        # 3) STT 성공 → 요약 실행
+        summary_result = summarize_text_auto(stt_result["transcript_path"], workspace, progress=progress,
+                                             use_cache=not request.get("no_cache"), manifest=manifest,
+                                             on_token=on_token)
 
-        summary_result = summarize_text_auto(transcript_path, os.path.dirname(out_path))
-        
         upload_result = None
         cleanup_result = None
         if (summary_result or {}).get("ok"):
-            upload_result = send_summary_to_api(
-                class_id=class_id,
-                meeting_id=meeting_id,  # meeting_id 추가
-                md_path=(summary_result or {}).get("summary_path"),
-                pdf_path=(summary_result or {}).get("summary_pdf_path"),
-            )
-            # 업로드가 성공했을 때만 디렉토리 통째 삭제
+            upload_result = stage_upload(class_id, meeting_id, manifest, summary_result["summary_md"].encode("utf-8"),
+                                         summary_result["summary_pdf"], progress)
+            # 업로드가 성공했을 때만 디렉토리 통째 삭제 (응답 뒤 백그라운드)
             if upload_result and upload_result.get("ok"):
-                class_out_dir = os.path.join(MERGE_OUT_DIR, str(class_id))
-                cleanup_result = cleanup_class_dir(class_out_dir)
+                progress("cleanup")
+                deferred.append(lambda: log.info("🧹 작업 공간 정리: %s", cleanup_workspace(workspace)))
+                cleanup_result = {"ok": True, "deferred": True, "dir": workspace}
             else:
+                # 재시도 때 reduce/pdf 를 건너뛸 수 있게 요약은 디스크에 남긴다
+                deferred.append(summary_result["persist"])
                 cleanup_result = {"ok": False, "detail": "업로드 실패로 삭제 건너뜀"}
 
+        return _pipeline_result(class_id, request, workspace, in_dir, files, manifest.skipped,
+                                stt_result, vad_result, summary_result, upload_result, cleanup_result)
 
-        
-        return {
-            "status": "summary_done" if (summary_result or {}).get("ok") else "summary_failed",
-            "message": "STT 성공 및 요약 처리 완료" if (summary_result or {}).get("ok") else "STT 성공, 요약 실패",
-            "class_id": class_id,
-            "meeting_id": meeting_id,  # meeting_id 추가
-            "input_dir": in_dir,
-            "files_merged": [os.path.basename(f) for f in files],
-            "output_path": merged,
-            "stt_ok": True,
-            "transcript_path": transcript_path,
-            "stt_detail": stt_result.get("detail"),
-            "summary_ok": (summary_result or {}).get("ok", False),
-            "summary_path": (summary_result or {}).get("summary_path"),
-            "summary_pdf_path": (summary_result or {}).get("summary_pdf_path"),
-            "clean_path": (summary_result or {}).get("clean_path"),
-            "summary_detail": (summary_result or {}).get("detail"),
-            "upload_result": upload_result,
-            "cleanup_result": cleanup_result,
-        }
-        
-
+    except HTTPException:
+        raise
     except ValueError as ve:
         # 포맷/파라미터 문제 등
         raise HTTPException(status_code=415, detail=str(ve))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Merge failed: {e}")
+
+
+# ─────────────────────────────────────────────────────────────
+# 디스크 보존 정책(GC): 원본 청크, ffmpeg 변환본(*.conv.wav), 병합 WAV, 작업 공간을 종류별 TTL 로 지우고
+# 전체 사용량이 상한을 넘으면 mtime 이 오래된 것부터(LRU) 상한의 90% 까지 지운다.
+# 진행 중인 작업은 건드리지 않는다: 대기/실행 중 잡이 있는 class, 잠금이 잡힌 작업 공간(파이프라인/후처리),
+# finalize 되지 않은 적재가 있는 class(녹음 중), 최근 RETENTION_GRACE_SEC 안에 쓰인 파일은 건너뛴다.
+#   RETENTION_INTERVAL_SEC  : 백그라운드 실행 주기 (기본 600초, 0 이면 끔 — POST /STT/retention/run 으로만)
+#   RETENTION_MAX_GB        : 원본+작업 공간 전체 상한 (기본 0 = 상한 없음, TTL 만 적용)
+#   RETENTION_TTL_RAW_H     : 원본 청크 BASE_AUDIO_DIR/{class_id}/* (기본 168시간)
+#   RETENTION_TTL_CONV_H    : ffmpeg 변환본 *.conv.wav (기본 24시간)
+#   RETENTION_TTL_MERGED_H  : 작업 공간의 Merge__*.wav (병합/VAD/적재 WAV, 기본 48시간)
+#   RETENTION_TTL_WORKSPACE_H : 작업 공간 전체 — 전사/요약/manifest (기본 168시간)
+#   RETENTION_GRACE_SEC     : 이 시간 안에 수정된 파일은 지우지 않음 (기본 900초)
+# TTL 을 0 으로 두면 그 종류는 기간으로는 지우지 않는다 (상한 초과 시에만).
+# ─────────────────────────────────────────────────────────────
+RETENTION_TYPES = ("raw", "conv", "merged", "workspace")
+_WORKSPACE_NAME_RE = re.compile(r"^(meeting-.+|input-.+|job-.+|default)$")
+
+
+def _env_hours(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default))) * 3600
+    except ValueError:
+        return default * 3600
+
+
+def _active_classes() -> set[str]:
+    """
+    대기/실행 중 잡이 있거나 작업 공간·적재 잠금(celery 모드면 워커들의 Redis 락)이 잡혀 있는 class_id,
+    그리고 아직 finalize 되지 않은 적재(ingest.json 은 있고 manifest.json 은 없음)가 있는 class_id.
+    적재 잠금은 청크 하나를 붙이는 동안만 잡히므로, 녹음 중인 수업은 청크 사이에도 나이와 상관없이 보호한다.
+    """
+    active = set()
+    with _jobs_lock:
+        active.update(str(j["class_id"]) for j in _jobs.values() if j["status"] in ("queued", "running"))
+    for state_path in glob.glob(os.path.join(glob.escape(MERGE_OUT_DIR), "*", "*", INGEST_STATE_NAME)):
+        ws = os.path.dirname(state_path)
+        if not os.path.exists(os.path.join(ws, MANIFEST_NAME)):
+            active.add(os.path.basename(os.path.dirname(ws)))
+    for locks, guard in ((_workspace_locks, _workspace_locks_guard), (_ingest_locks, _ingest_locks_guard)):
+        with guard:
+            held = [p for p, lk in list(locks.items()) if lk.locked()]
+        active.update(os.path.basename(os.path.dirname(p)) for p in held)
+    celery_tasks = _celery_backend()
+    if celery_tasks is not None:
+        active.update(celery_tasks.active_classes())  # 다른 노드의 워커가 잡고 있는 작업 공간
+    return active
+
+
+class RetentionGC:
+    def __init__(self, max_bytes: int, ttl: dict, grace: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.grace = grace
+        self.runs = 0
+        self.reclaimed = {t: 0 for t in RETENTION_TYPES}
+        self.evicted = {t: 0 for t in RETENTION_TYPES}
+        self.usage_by_type: dict | None = None  # 마지막 스캔 결과
+        self.last_run: dict | None = None
+        self._lock = threading.Lock()      # 통계
+        self._run_lock = threading.Lock()  # 한 번에 한 번만 실행
+
+    @staticmethod
+    def _file(kind: str, path: str, class_id: str, workspace: str | None = None) -> dict | None:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return {"type": kind, "path": path, "class_id": class_id, "workspace": workspace,
+                "size": st.st_size, "mtime": st.st_mtime}
+
+    def _scan(self) -> list[dict]:
+        """
+        원본: BASE_AUDIO_DIR/{class_id}/[meeting-*/] 의 파일 (raw / conv)
+        작업 공간: MERGE_OUT_DIR/{class_id}/{meeting-*|input-*|job-*|default}/ — Merge__*.wav 는 merged 로 따로,
+        나머지는 작업 공간 하나의 단위(workspace, mtime = 안의 가장 최근 파일)로 센다.
+        """
+        units = []
+        for class_id in _listdir(BASE_AUDIO_DIR):
+            class_dir = os.path.join(BASE_AUDIO_DIR, class_id)
+            if class_id.startswith((".", "__")) or not os.path.isdir(class_dir):
+                continue
+            paths = [os.path.join(class_dir, name) for name in _listdir(class_dir)]
+            for sub in [p for p in paths if os.path.basename(p).startswith("meeting-") and os.path.isdir(p)]:
+                paths.extend(os.path.join(sub, name) for name in _listdir(sub))  # 적재로 받은 meeting 별 청크
+            for path in paths:
+                name = os.path.basename(path)
+                if os.path.isfile(path) and not name.endswith(".tmp"):
+                    unit = self._file("conv" if name.endswith(".conv.wav") else "raw", path, class_id)
+                    if unit:
+                        units.append(unit)
+        for class_id in _listdir(MERGE_OUT_DIR):
+            class_dir = os.path.join(MERGE_OUT_DIR, class_id)
+            if class_id.startswith((".", "__")) or not os.path.isdir(class_dir):
+                continue
+            for name in _listdir(class_dir):
+                ws = os.path.join(class_dir, name)
+                if not _WORKSPACE_NAME_RE.match(name) or not _is_workspace(ws):
+                    continue
+                rest = {"type": "workspace", "path": ws, "class_id": class_id, "workspace": ws,
+                        "size": 0, "mtime": 0.0}
+                for root, _, names in os.walk(ws):
+                    for fname in names:
+                        path = os.path.join(root, fname)
+                        unit = self._file("merged", path, class_id, ws)
+                        if unit is None:
+                            continue
+                        rest["mtime"] = max(rest["mtime"], unit["mtime"])
+                        if root == ws and fname.startswith("Merge__") and fname.endswith(".wav"):
+                            units.append(unit)
+                        else:
+                            rest["size"] += unit["size"]
+                if not rest["mtime"]:
+                    rest["mtime"] = os.stat(ws).st_mtime
+                units.append(rest)
+        return units
+
+    def _remove(self, unit: dict, active: set, now: float) -> bool:
+        """지웠으면(이미 없어도) True, 진행 중이라 건너뛰면 False"""
+        if unit["class_id"] in active or now - unit["mtime"] < self.grace:
+            return False
+        ws = unit["workspace"]
+        lock = _workspace_lock(ws) if ws else None
+        if lock is not None and not lock.acquire(blocking=False):
+            return False
+        try:
+            if unit["type"] == "workspace":
+                shutil.rmtree(unit["path"], ignore_errors=True)
+            else:
+                os.remove(unit["path"])
+        except FileNotFoundError:
+            pass
+        finally:
+            if lock is not None:
+                lock.release()
+        try:
+            os.rmdir(os.path.dirname(ws or unit["path"]))  # 비어 있으면 class 디렉토리도 정리
+        except OSError:
+            pass
+        return True
+
+    @staticmethod
+    def _usage(units: list[dict]) -> dict:
+        usage = {t: 0 for t in RETENTION_TYPES}
+        for u in units:
+            usage[u["type"]] += u["size"]
+        return usage
+
+    def usage(self) -> dict:
+        """지금 디스크를 다시 스캔한 종류별 사용량"""
+        usage = self._usage(self._scan())
+        with self._lock:
+            self.usage_by_type = usage
+        return usage
+
+    def run(self) -> dict:
+        if not self._run_lock.acquire(blocking=False):
+            return {"ok": False, "detail": "이미 실행 중"}
+        try:
+            started = now = time.time()
+            units = self._scan()
+            active = _active_classes()
+            usage = self._usage(units)
+            total = sum(usage.values())
+
+            removed: dict[str, int] = {t: 0 for t in RETENTION_TYPES}
+            counts: dict[str, int] = {t: 0 for t in RETENTION_TYPES}
+            gone: set[str] = set()
+
+            def account(u: dict):
+                nonlocal total
+                gone.add(u["path"])
+                removed[u["type"]] += u["size"]
+                counts[u["type"]] += 1
+                total -= u["size"]
+
+            def evict(u: dict, reason: str):
+                if u["path"] in gone or u["workspace"] in gone:
+                    return
+                if not self._remove(u, active, now):
+                    return
+                account(u)
+                if u["type"] == "workspace":  # 안에 남아 있던 병합 WAV 도 같이 지워짐
+                    for m in units:
+                        if m["type"] == "merged" and m["workspace"] == u["path"] and m["path"] not in gone:
+                            account(m)
+                log.debug("[retention] %s 삭제(%s): %s (%d bytes)", u["type"], reason, u["path"], u["size"])
+
+            # 1) 종류별 TTL
+            for u in units:
+                ttl = self.ttl.get(u["type"])
+                if ttl and now - u["mtime"] > ttl:
+                    evict(u, "ttl")
+            # 2) 용량 상한: 오래 안 쓴(mtime) 것부터 90% 까지
+            if self.max_bytes and total > self.max_bytes:
+                target = int(self.max_bytes * 0.9)
+                for u in sorted(units, key=lambda x: x["mtime"]):
+                    if total <= target:
+                        break
+                    evict(u, "quota")
+
+            for t in RETENTION_TYPES:
+                usage[t] -= removed[t]
+                if removed[t]:
+                    RETENTION_RECLAIMED.inc(removed[t], type=t)
+            result = {
+                "ok": True,
+                "reclaimed_bytes": sum(removed.values()),
+                "reclaimed_by_type": removed,
+                "evicted_by_type": counts,
+                "usage_bytes": sum(usage.values()),
+                "skipped_active_classes": sorted(active),
+                "took": round(time.time() - started, 3),
+                "finished_at": time.time(),
+            }
+            with self._lock:
+                self.runs += 1
+                for t in RETENTION_TYPES:
+                    self.reclaimed[t] += removed[t]
+                    self.evicted[t] += counts[t]
+                self.usage_by_type = usage
+                self.last_run = result
+            if result["reclaimed_bytes"]:
+                log.info(f"🧹 [retention] {result['reclaimed_bytes'] / 1e6:.1f} MB 회수 {counts}, "
+                      f"사용량 {result['usage_bytes'] / 1e6:.1f} MB")
+            return result
+        finally:
+            self._run_lock.release()
+
+    def stats(self, rescan: bool = False) -> dict:
+        if rescan:
+            self.usage()
+        with self._lock:
+            usage = dict(self.usage_by_type) if self.usage_by_type is not None else None
+            return {
+                "base_audio_dir": BASE_AUDIO_DIR,
+                "merge_out_dir": MERGE_OUT_DIR,
+                "usage_bytes": sum(usage.values()) if usage is not None else None,
+                "usage_by_type": usage,
+                "max_bytes": self.max_bytes,
+                "ttl_sec": dict(self.ttl),
+                "grace_sec": self.grace,
+                "runs": self.runs,
+                "reclaimed_bytes": sum(self.reclaimed.values()),
+                "reclaimed_by_type": dict(self.reclaimed),
+                "evicted_by_type": dict(self.evicted),
+                "last_run": self.last_run,
+            }
+
+
+def _is_workspace(path: str) -> bool:
+    """MERGE_OUT_DIR 이 소스 디렉토리와 겹쳐도(기본값) 파이프라인이 만든 디렉토리만 대상으로 삼는다"""
+    names = _listdir(path)
+    return MANIFEST_NAME in names or INGEST_STATE_NAME in names or any(n.startswith("Merge__") for n in names)
+
+
+def _listdir(path: str) -> list[str]:
+    try:
+        return sorted(os.listdir(path))
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+
+_retention = RetentionGC(
+    int(float(os.getenv("RETENTION_MAX_GB", "0")) * 1024 ** 3),
+    {
+        "raw": _env_hours("RETENTION_TTL_RAW_H", 168),
+        "conv": _env_hours("RETENTION_TTL_CONV_H", 24),
+        "merged": _env_hours("RETENTION_TTL_MERGED_H", 48),
+        "workspace": _env_hours("RETENTION_TTL_WORKSPACE_H", 168),
+    },
+    float(os.getenv("RETENTION_GRACE_SEC", "900")),
+)
+_retention_stop = threading.Event()
+RETENTION_RECLAIMED = Counter("retention_reclaimed_bytes_total", "보존 정책으로 회수한 바이트", ("type",))
+RETENTION_USAGE = Gauge("storage_usage_bytes", "원본 청크/변환본/병합 WAV/작업 공간 디스크 사용량 (마지막 GC 스캔 기준)",
+                        ("type",), collect=lambda: {(t,): v for t, v in (_retention.stats()["usage_by_type"] or {}).items()})
+
+
+def _retention_loop(interval: float):
+    while not _retention_stop.wait(interval):
+        try:
+            _retention.run()
+        except Exception:
+            traceback.print_exc()
+
+
+@app.on_event("startup")
+def _start_retention():
+    interval = float(os.getenv("RETENTION_INTERVAL_SEC", "600"))
+    if interval > 0:
+        _retention_stop.clear()
+        threading.Thread(target=_retention_loop, args=(interval,), name="retention-gc", daemon=True).start()
+
+
+@app.on_event("shutdown")
+def _stop_retention():
+    _retention_stop.set()
+
+
+# ─────────────────────────────────────────────────────────────
+# 잡 모드: POST 는 job_id 만 즉시 반환하고, 고정 크기 워커 풀이 파이프라인을 돌린다.
+#   STT_WORKERS      : 워커 수 (기본 2)
+#   STT_JOB_TTL_SEC  : 끝난 잡을 메모리에 보관하는 시간 (기본 3600초)
+# 대기 중인 잡은 도착 순서가 아니라 예상 비용(녹음 길이, 초)이 작은 것부터 꺼낸다 (shortest-job-first).
+# 오래 기다린 잡은 aging 으로 점점 앞당겨져 긴 강의도 굶지 않고, 요청의 "priority"(정수, 클수록 먼저)로 끼워 넣을 수 있다.
+#   점수 = 예상 녹음 초 - priority × STT_SCHED_PRIORITY_SEC - 대기 초 × STT_SCHED_AGING   (작을수록 먼저)
+#   STT_SCHEDULER          : sjf (기본) | fifo
+#   STT_SCHED_AGING        : 대기 1초마다 깎는 비용(녹음 초, 기본 4 → 3시간 강의도 약 45분 기다리면 새 10분 잡보다 앞섬)
+#   STT_SCHED_PRIORITY_SEC : priority 1 당 깎는 비용 (기본 1800)
+#   STT_SCHED_CHUNK_SEC    : 청크 파일이 아직 없을 때 total_chunks 로 추정하는 청크 길이 (기본 10)
+# STT_BACKEND=celery 면 이 프로세스는 생산자만 하고 merge/stt/summarize/upload 는 tasks.py 의 Celery 워커가 돈다.
+#   STT_BACKEND          : local (기본) | celery
+#   STT_CELERY_WAIT_SEC  : celery 모드의 동기 요청이 결과를 기다리는 최대 시간 (기본 3600초)
+# ─────────────────────────────────────────────────────────────
+JOB_STAGES = ("queued", "merge", "vad", "stt", "clean", "map", "reduce", "pdf", "upload", "cleanup", "done")
+
+
+class JobScheduler:
+    """
+    queue.Queue 대신 쓰는 우선순위 대기열 (get/put/qsize).
+    aging 은 모든 대기 잡에 같은 속도로 붙으므로 (비용 - 보너스 + aging × 도착 시각) 순서는 시간이 지나도
+    바뀌지 않는다 → 힙 하나로 충분하다.
+    """
+
+    def __init__(self):
+        self._heap: list[tuple[float, int, str]] = []
+        self._seq = 0
+        self._cond = threading.Condition()
+
+    @staticmethod
+    def score(cost: float, priority: int, enqueued_at: float) -> float:
+        if os.getenv("STT_SCHEDULER", "sjf").lower() == "fifo":
+            return enqueued_at
+        aging = float(os.getenv("STT_SCHED_AGING", "4"))
+        bonus = priority * float(os.getenv("STT_SCHED_PRIORITY_SEC", "1800"))
+        return cost - bonus + aging * enqueued_at
+
+    def put(self, job_id: str, cost: float = 0.0, priority: int = 0, enqueued_at: float | None = None):
+        with self._cond:
+            self._seq += 1
+            heapq.heappush(self._heap, (self.score(cost, priority, time.time() if enqueued_at is None else enqueued_at), self._seq, job_id))
+            self._cond.notify()
+
+    def get(self) -> str:
+        with self._cond:
+            while not self._heap:
+                self._cond.wait()
+            return heapq.heappop(self._heap)[2]
+
+    def qsize(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+
+def estimate_job_cost(class_id: str, request: dict) -> float:
+    """
+    잡 비용 = 예상 녹음 길이(초).
+    녹음 중 적재된 WAV 가 있으면 그 크기, 없으면 BASE_AUDIO_DIR/{class_id} 청크들의 WAV 헤더
+    (RIFF 가 아니면 16 kB/s 로 가정), 청크가 아직 없으면 total_chunks × STT_SCHED_CHUNK_SEC.
+    """
+    _, state_path, ingest_path = _ingest_paths(class_id, request.get("meeting_id"))
+    state = _load_ingest_state(state_path)
+    if state and state.get("params") and os.path.isfile(ingest_path):
+        p = state["params"]
+        return state["data_size"] / max(1, p["channels"] * p["sampwidth"] * p["framerate"])
+
+    in_dir = _input_dir(class_id, request.get("meeting_id"))
+    files = set(glob.glob(os.path.join(in_dir, "*.wav")))
+    seconds = 0.0
+    for path in files:
+        try:
+            info = _read_wav_info(path)
+            seconds += info["data_size"] / max(1, info["channels"] * info["sampwidth"] * info["framerate"])
+        except (OSError, ValueError):
+            try:
+                seconds += os.path.getsize(path) / 16000
+            except OSError:
+                pass
+    if seconds:
+        return seconds
+    try:
+        return int(request.get("total_chunks") or 0) * float(os.getenv("STT_SCHED_CHUNK_SEC", "10"))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _celery_backend():
+    """STT_BACKEND=celery 면 tasks 모듈 (celery/redis 는 이 모드에서만 필요)"""
+    if os.getenv("STT_BACKEND", "local").lower() != "celery":
+        return None
+    import tasks
+    return tasks
+
+
+_jobs: dict[str, dict] = {}
+_jobs_lock = threading.Lock()
+_job_queue = JobScheduler()
+_job_workers: list[threading.Thread] = []
+
+
+def _job_worker_count() -> int:
+    try:
+        return max(1, int(os.getenv("STT_WORKERS", "2")))
+    except ValueError:
+        return 2
+
+
+def _ensure_job_workers():
+    with _jobs_lock:
+        alive = [t for t in _job_workers if t.is_alive()]
+        _job_workers[:] = alive
+        for n in range(len(alive), _job_worker_count()):
+            t = threading.Thread(target=_job_worker_loop, name=f"stt-worker-{n}", daemon=True)
+            t.start()
+            _job_workers.append(t)
+
+
+def _prune_jobs():
+    ttl = float(os.getenv("STT_JOB_TTL_SEC", "3600"))
+    now = time.time()
+    with _jobs_lock:
+        for jid in [j for j, job in _jobs.items()
+                    if job.get("finished_at") and now - job["finished_at"] > ttl]:
+            del _jobs[jid]
+
+
+def _job_progress(job_id: str):
+    """잡 단위 progress 콜백. 단계가 바뀌면 이전 단계의 소요시간을 마감한다."""
+    def progress(stage: str, done: int | None = None, total: int | None = None):
+        now = time.time()
+        with _jobs_lock:
+            job = _jobs.get(job_id)
+            if job is None:
+                return
+            if job["stage"] != stage:
+                prev = job["stages"].get(job["stage"])
+                if prev and prev.get("ended_at") is None:
+                    prev["ended_at"] = now
+                    prev["took"] = round(now - prev["started_at"], 3)
+                job["stage"] = stage
+                job["stages"][stage] = {"started_at": now, "ended_at": None, "took": None}
+            if done is not None or total is not None:
+                job["progress"] = {"done": done, "total": total}
+            else:
+                job["progress"] = None
+    return progress
+
+
+def _job_worker_loop():
+    while True:
+        job_id = _job_queue.get()
+        with _jobs_lock:
+            job = _jobs.get(job_id)
+            if job is None:
+                continue
+            job["status"] = "running"
+            job["started_at"] = time.time()
+            payload = job.pop("_request")
+            listener = job.pop("_listener", None)
+        progress = _job_progress(job_id)
+        on_token = None
+        if listener is not None:
+            progress, on_token = _listening(progress, listener)
+        after = []  # 후처리는 done 을 알린 뒤 이 워커에서
+        try:
+            result = run_stt_pipeline(job["class_id"], payload, progress=progress, on_token=on_token,
+                                      job_id=job_id, background=lambda fn, *args: after.append((fn, args)))
+            status, error = "done", None
+        except HTTPException as he:
+            traceback.print_exc()
+            result, status = None, "failed"
+            error = {"status_code": he.status_code, "detail": he.detail}
+        except Exception as e:
+            traceback.print_exc()
+            result, status = None, "failed"
+            error = {"status_code": 500, "detail": f"{e}"}
+        progress("done")
+        with _jobs_lock:
+            job["status"] = status
+            job["result"] = result
+            job["error"] = error
+            job["finished_at"] = time.time()
+            view = json.loads(json.dumps(_job_view(job), default=str))
+        if listener is not None:
+            listener("done" if status == "done" else "error", view)
+        for fn, args in after:
+            fn(*args)
+
+
+def _listening(progress, listener):
+    """잡 progress 콜백에 이벤트 리스너를 덧붙이고, 리듀스 토큰 콜백을 만든다"""
+    def stage_progress(stage: str, done: int | None = None, total: int | None = None):
+        progress(stage, done, total)
+        listener("stage", {"stage": stage, "done": done, "total": total})
+
+    def on_token(text: str, reset: bool = False):
+        if reset:
+            listener("reset", {})
+        else:
+            listener("token", {"text": text})
+
+    return stage_progress, on_token
+
+
+def submit_stt_job(class_id: str, request: dict, listener=None) -> dict:
+    """listener(event, data): 주면 단계/토큰/완료 이벤트를 워커 스레드에서 바로 넘겨준다 (SSE 용)"""
+    _prune_jobs()
+    _ensure_job_workers()
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    try:
+        priority = int(request.get("priority") or 0)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"priority 는 정수여야 합니다: {request.get('priority')}")
+    cost = estimate_job_cost(class_id, request)
+    job = {
+        "job_id": job_id,
+        "class_id": class_id,
+        "meeting_id": request.get("meeting_id"),
+        "priority": priority,
+        "estimated_audio_sec": round(cost, 1),
+        "status": "queued",
+        "stage": "queued",
+        "progress": None,
+        "stages": {"queued": {"started_at": now, "ended_at": None, "took": None}},
+        "created_at": now,
+        "started_at": None,
+        "finished_at": None,
+        "result": None,
+        "error": None,
+        "_request": dict(request),
+        "_listener": listener,
+    }
+    with _jobs_lock:
+        _jobs[job_id] = job
+    _job_queue.put(job_id, cost, priority, now)
+    return job
+
+
+JOBS_QUEUED = Gauge("jobs_queued", "잡 큐에서 대기 중인 잡 수", collect=lambda: {(): job_stats()["queue_depth"]})
+
+
+def _job_view(job: dict) -> dict:
+    return {k: v for k, v in job.items() if not k.startswith("_")}
+
+
+def job_stats() -> dict:
+    with _jobs_lock:
+        jobs = list(_jobs.values())
+        workers = sum(1 for t in _job_workers if t.is_alive())
+    by_status: dict[str, int] = {}
+    by_stage: dict[str, int] = {}
+    stage_took: dict[str, list] = {}
+    for job in jobs:
+        by_status[job["status"]] = by_status.get(job["status"], 0) + 1
+        if job["status"] in ("queued", "running"):
+            by_stage[job["stage"]] = by_stage.get(job["stage"], 0) + 1
+        for name, st in job["stages"].items():
+            if st.get("took") is not None:
+                stage_took.setdefault(name, []).append(st["took"])
+    return {
+        "workers": workers,
+        "workers_configured": _job_worker_count(),
+        "queue_depth": by_status.get("queued", 0),
+        "scheduler": os.getenv("STT_SCHEDULER", "sjf").lower(),
+        "running": by_status.get("running", 0),
+        "jobs_by_status": by_status,
+        "active_by_stage": by_stage,
+        "stage_avg_sec": {k: round(sum(v) / len(v), 3) for k, v in stage_took.items()},
+    }
+
+
+@app.post("/STT/{class_id}")
+def merge_audio(class_id: str, request: dict, background_tasks: BackgroundTasks):
+    log.debug("파이썬 merge 합병 처리 -> class_id : %s", class_id)
+
+    celery_tasks = _celery_backend()
+    if celery_tasks is not None:
+        job = celery_tasks.submit_pipeline(class_id, request)
+        if request.get("mode") == "job":
+            return JSONResponse(status_code=202, content={**job, "status_url": f"/STT/jobs/{job['job_id']}"})
+        return celery_tasks.wait_pipeline(job["job_id"], timeout=float(os.getenv("STT_CELERY_WAIT_SEC", "3600")))
+
+    # 잡 모드: {"mode": "job"} 이면 즉시 job_id 반환
+    if request.get("mode") == "job":
+        job = submit_stt_job(class_id, request)
+        return JSONResponse(status_code=202, content={
+            "status": "queued",
+            "job_id": job["job_id"],
+            "class_id": class_id,
+            "meeting_id": job["meeting_id"],
+            "priority": job["priority"],
+            "estimated_audio_sec": job["estimated_audio_sec"],
+            "queue_depth": _job_queue.qsize(),
+            "status_url": f"/STT/jobs/{job['job_id']}",
+        })
+
+    return run_stt_pipeline(class_id, request, background=background_tasks.add_task)
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+@app.post("/STT/{class_id}/stream")
+def stream_stt(class_id: str, request: dict):
+    """
+    merge_audio 와 같은 파이프라인을 잡 큐로 돌리면서 진행 상황을 Server-Sent Events 로 흘려보낸다.
+      event: queued  {job_id, status_url, queue_depth}
+      event: stage   {stage, done, total}         (merge 3/6, stt, clean 2/5, map 2/5, reduce, pdf, upload ...)
+      event: token   {text}                       최종 리듀스 출력 조각
+      event: reset   {}                           Claude 실패로 OpenAI 가 다시 생성 → 지금까지 받은 token 폐기
+      event: done    {잡 상태 + result}            요약 업로드까지 끝난 뒤 (작업 공간 정리/저장은 그 다음)
+      event: error   {잡 상태 + error}
+    연결이 끊겨도 잡은 끝까지 실행된다 (GET /STT/jobs/{job_id} 로 확인).
+    """
+    events: "queue.Queue[tuple[str, object]]" = queue.Queue()
+    job = submit_stt_job(class_id, request, listener=lambda event, data: events.put((event, data)))
+    heartbeat = float(os.getenv("SSE_HEARTBEAT_SEC", "15"))
+
+    def event_stream():
+        yield _sse("queued", {"job_id": job["job_id"], "status_url": f"/STT/jobs/{job['job_id']}",
+                              "queue_depth": _job_queue.qsize()})
+        while True:
+            try:
+                event, data = events.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ": keep-alive\n\n"  # 프록시 idle 타임아웃 방지
+                continue
+            yield _sse(event, data)
+            if event in ("done", "error"):
+                return
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.post("/STT/{class_id}/chunks/{index}")
+async def ingest_audio_chunk(class_id: str, index: int, request: Request, meeting_id: str | None = None):
+    """
+    본문: chunk WAV 바이트 (비어 있으면 BASE_AUDIO_DIR/{class_id}/chunk_{index}.wav 를 읽음)
+    이미 적재했거나 대기 중인 번호면 duplicate=true 로 무시한다 (저장된 청크도 그대로)
+    """
+    data = await request.body()
+    return await run_in_threadpool(ingest_chunk, class_id, index, data or None, meeting_id)
+
+
+@app.get("/STT/cache")
+def get_llm_cache_stats():
+    return {**_llm_cache.stats(), "api_probe": api_probe_stats()}
+
+
+@app.get("/STT/reduce")
+def get_reduce_stats():
+    return reduce_stats()
+
+
+@app.get("/STT/retention")
+def get_retention_stats():
+    return _retention.stats(rescan=True)
+
+
+@app.post("/STT/retention/run")
+def run_retention():
+    return _retention.run()
+
+
+@app.get("/metrics")
+def get_metrics():
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/STT/jobs")
+def get_stt_job_stats():
+    return job_stats()
+
+
+@app.get("/STT/jobs/{job_id}")
+def get_stt_job(job_id: str):
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is not None:
+            # 워커가 갱신 중인 dict 를 그대로 넘기지 않도록 스냅샷
+            return json.loads(json.dumps(_job_view(job), default=str))
+    celery_tasks = _celery_backend()
+    if celery_tasks is not None:
+        return celery_tasks.job_view(job_id)
+    raise HTTPException(status_code=404, detail=f"job 없음: {job_id}")
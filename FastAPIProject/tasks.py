@@ -0,0 +1,270 @@
+# tasks.py
+"""
+Celery 워커 티어: merge → stt → summarize → upload 를 단계별 태스크로 나눠 여러 머신에서 돌린다.
+FastAPI(main.py)는 STT_BACKEND=celery 일 때 체인을 넣고 job_id 만 돌려주는 얇은 생산자가 된다.
+
+    celery -A tasks worker -Q edumeet.audio,edumeet.llm -c 2 --loglevel=INFO
+
+워커들은 BASE_AUDIO_DIR(AUDIO_BASE_DIR) 와 MERGE_OUT_DIR 을 같은 공유 볼륨으로 마운트해야 한다.
+단계 사이의 상태는 작업 공간(manifest.json + 출력 파일)과 태스크 사이로 넘기는 ctx(dict, JSON)뿐이다.
+재시도/재전달(acks_late)된 태스크는 manifest 체크포인트로 이미 끝난 단계를 건너뛰므로 여러 번 돌아도 결과가 같다.
+같은 작업 공간(meeting)은 Redis 락으로 한 번에 한 태스크만 돈다 (락을 못 잡으면 잠시 뒤 재시도).
+
+  CELERY_BROKER_URL     : 브로커 (기본 redis://localhost:6379/0)
+  CELERY_RESULT_BACKEND : 결과 저장소 (기본 redis://localhost:6379/1)
+  CELERY_AUDIO_QUEUE    : merge/stt 큐 (기본 edumeet.audio — 오디오 볼륨이 붙은 노드)
+  CELERY_LLM_QUEUE      : summarize/upload 큐 (기본 edumeet.llm)
+  CELERY_MAX_RETRIES    : 단계별 일시 오류(네트워크/파일) 재시도 횟수 (기본 3, 지수 백오프). 락 대기는 세지 않는다
+  CELERY_LOCK_TTL_SEC   : 작업 공간 락 만료 (기본 10800초, 워커가 죽어도 풀리도록)
+  CELERY_RESULT_TTL_SEC : 결과 보관 시간 (기본 86400초)
+"""
+import os, time, traceback, uuid
+
+import redis
+import requests
+from celery import Celery, chain
+from fastapi import HTTPException
+
+import main
+
+BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
+RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/1")
+AUDIO_QUEUE = os.getenv("CELERY_AUDIO_QUEUE", "edumeet.audio")
+LLM_QUEUE = os.getenv("CELERY_LLM_QUEUE", "edumeet.llm")
+MAX_RETRIES = int(os.getenv("CELERY_MAX_RETRIES", "3"))
+LOCK_TTL_SEC = int(os.getenv("CELERY_LOCK_TTL_SEC", "10800"))
+LOCK_PREFIX = "edumeet:lock:"
+LOCK_RETRY_SEC = 15
+ERROR_RETRY_SEC = 5
+TRANSIENT_ERRORS = (OSError, requests.RequestException)
+
+celery_app = Celery("edumeet", broker=BROKER_URL, backend=RESULT_BACKEND)
+celery_app.conf.update(
+    task_serializer="json",
+    result_serializer="json",
+    accept_content=["json"],
+    task_acks_late=True,              # 워커가 죽으면 다른 워커가 다시 받는다 (단계는 체크포인트로 멱등)
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,     # 긴 태스크를 한 워커가 쌓아 두지 않게
+    task_track_started=True,
+    result_extended=True,
+    result_expires=int(os.getenv("CELERY_RESULT_TTL_SEC", "86400")),
+    task_routes={
+        "edumeet.merge": {"queue": AUDIO_QUEUE},
+        "edumeet.stt": {"queue": AUDIO_QUEUE},
+        "edumeet.summarize": {"queue": LLM_QUEUE},
+        "edumeet.upload": {"queue": LLM_QUEUE},
+    },
+)
+
+_redis_client: redis.Redis | None = None
+
+
+def _redis() -> redis.Redis:
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(BROKER_URL)
+    return _redis_client
+
+
+def _lock_name(ctx: dict) -> str:
+    return f"{LOCK_PREFIX}{ctx['class_id']}/{os.path.basename(ctx['workspace'])}"
+
+
+def active_classes() -> set[str]:
+    """지금 어느 워커에선가 단계가 돌고 있는 class_id (보존 정책 GC 가 건너뛸 대상)"""
+    out = set()
+    for key in _redis().scan_iter(match=f"{LOCK_PREFIX}*"):
+        name = key.decode("utf-8") if isinstance(key, bytes) else key
+        out.add(name[len(LOCK_PREFIX):].rsplit("/", 1)[0])
+    return out
+
+
+def _progress(ctx: dict):
+    """단계 진행을 job_id(체인의 마지막 태스크) 결과에 PROGRESS 로 남긴다"""
+    def progress(stage: str, done: int | None = None, total: int | None = None):
+        ctx["stage"] = stage
+        celery_app.backend.store_result(ctx["job_id"], {
+            "class_id": ctx["class_id"],
+            "meeting_id": ctx["request"].get("meeting_id"),
+            "stage": stage,
+            "progress": {"done": done, "total": total} if done is not None or total is not None else None,
+        }, "PROGRESS")
+    return progress
+
+
+def _attempts(ctx: dict, stage: str) -> dict:
+    """
+    단계별 시도 기록. Celery 의 request.retries 는 락 대기와 오류 재시도를 구분하지 않으므로
+    ctx 에 따로 세고, 재시도할 때 ctx 를 인자로 다시 실어 보낸다.
+      lock_waits : 락을 못 잡아 미룬 횟수 (한도 없음)
+      errors     : 일시 오류로 재시도한 횟수 (CELERY_MAX_RETRIES 까지, 백오프 기준)
+      forced     : force_from_stage 를 이미 적용했는지 (재시도 때 방금 끝낸 단계를 다시 계산하지 않게)
+    """
+    return ctx.setdefault("attempts", {}).setdefault(stage, {"lock_waits": 0, "errors": 0, "forced": False})
+
+
+def _retry(task, ctx: dict, countdown: float, exc: Exception | None = None):
+    """갱신된 ctx 로 같은 태스크를 다시 넣는다 (체인의 다음 태스크는 그대로). 한도는 호출 측에서 센다"""
+    return task.retry(args=(ctx,), kwargs={}, countdown=countdown, exc=exc)
+
+
+def _run_stage(task, ctx: dict, stage: str, fn) -> dict:
+    """
+    작업 공간 락을 잡고 fn(manifest, progress) 을 실행한다.
+    앞 단계에서 끝난 ctx(status 있음)는 그대로 넘기고, 실패는 ctx["status"]="failed" 로 남겨 체인 끝까지 흘린다.
+    """
+    if ctx.get("status"):
+        return ctx
+    attempts = _attempts(ctx, stage)
+    lock = _redis().lock(_lock_name(ctx), timeout=LOCK_TTL_SEC)
+    if not lock.acquire(blocking=False):
+        # 같은 meeting 의 다른 요청이 돌고 있음 → 자리 비울 때까지 기다림 (오류 재시도 한도와 별개)
+        attempts["lock_waits"] += 1
+        raise _retry(task, ctx, LOCK_RETRY_SEC)
+    try:
+        os.makedirs(ctx["workspace"], exist_ok=True)
+        force = None if attempts["forced"] else ctx["request"].get("force_from_stage")
+        manifest = main.StageManifest(ctx["workspace"], force)
+        attempts["forced"] = True  # 오류 재시도 때는 방금 끝낸 하위 단계를 다시 계산하지 않는다
+        started = time.time()
+        fn(manifest, _progress(ctx))
+        ctx["stages_skipped"] = ctx.get("stages_skipped", []) + manifest.skipped
+        ctx.setdefault("took", {})[stage] = round(time.time() - started, 3)
+        return ctx
+    except HTTPException as he:
+        ctx.update(status="failed", error={"status_code": he.status_code, "detail": he.detail})
+        return ctx
+    except TRANSIENT_ERRORS as e:
+        if attempts["errors"] < MAX_RETRIES:
+            countdown = min(300, ERROR_RETRY_SEC * 2 ** attempts["errors"])
+            attempts["errors"] += 1
+            main.log.warning("[celery] %s 일시 오류, 재시도 %d/%d: %s", stage, attempts["errors"], MAX_RETRIES, e)
+            raise _retry(task, ctx, countdown, exc=e)
+        traceback.print_exc()
+        main.STAGE_FAILURES.inc(stage=stage)
+        ctx.update(status="failed", error={"status_code": 500, "detail": f"{stage} 실패: {e}"})
+        return ctx
+    except Exception as e:
+        traceback.print_exc()
+        main.STAGE_FAILURES.inc(stage=stage)
+        ctx.update(status="failed", error={"status_code": 500, "detail": f"{stage} 실패: {e}"})
+        return ctx
+    finally:
+        try:
+            lock.release()
+        except redis.exceptions.LockError:
+            pass  # TTL 로 이미 풀림
+
+
+def _finish(ctx: dict, **extra) -> dict:
+    """응답(merge_audio 와 같은 형식)을 만들고 이후 단계는 건너뛰게 한다"""
+    ctx["result"] = main._pipeline_result(
+        ctx["class_id"], ctx["request"], ctx["workspace"], ctx["in_dir"], ctx["files"],
+        ctx.get("stages_skipped", []), ctx["stt"], ctx.get("vad"), **extra)
+    ctx["status"] = "done"
+    return ctx
+
+
+@celery_app.task(bind=True, name="edumeet.merge", max_retries=None)
+def merge_task(self, ctx: dict) -> dict:
+    def run(manifest, progress):
+        ctx["in_dir"], ctx["files"] = main._pipeline_inputs(ctx["class_id"], ctx["request"].get("meeting_id"))
+        ctx["merge_fp"] = main.stage_merge(ctx["class_id"], ctx["request"], ctx["workspace"], manifest,
+                                           ctx["files"], progress)
+    return _run_stage(self, ctx, "merge", run)
+
+
+@celery_app.task(bind=True, name="edumeet.stt", max_retries=None)
+def stt_task(self, ctx: dict) -> dict:
+    def run(manifest, progress):
+        stt_result, vad_result = main.stage_stt(ctx["class_id"], ctx["request"], ctx["workspace"], manifest,
+                                                ctx["merge_fp"], progress)
+        # 전사 본문/세그먼트는 작업 공간 파일로 넘기고 ctx 에는 경로만
+        ctx["stt"] = {k: stt_result.get(k) for k in ("ok", "transcript_path", "detail")}
+        ctx["vad"] = {k: v for k, v in (vad_result or {}).items() if k != "offset_map"} or None
+        if not stt_result.get("ok") or not stt_result.get("transcript_path"):
+            _finish(ctx)
+    return _run_stage(self, ctx, "stt", run)
+
+
+@celery_app.task(bind=True, name="edumeet.summarize", max_retries=None)
+def summarize_task(self, ctx: dict) -> dict:
+    def run(manifest, progress):
+        summary_result = main.summarize_text_auto(
+            ctx["stt"]["transcript_path"], ctx["workspace"], progress=progress,
+            use_cache=not ctx["request"].get("no_cache"), manifest=manifest)
+        if summary_result.get("ok"):
+            summary_result["persist"]()  # 업로드 태스크는 다른 노드에서 돌 수 있으므로 공유 볼륨에 쓴다
+        ctx["summary"] = {k: summary_result.get(k) for k in (
+            "ok", "summary_path", "summary_pdf_path", "clean_path", "reduce_levels", "reduce_provider", "summary_mode", "detail")}
+        if not summary_result.get("ok"):
+            _finish(ctx, summary_result=ctx["summary"])
+    return _run_stage(self, ctx, "summarize", run)
+
+
+@celery_app.task(bind=True, name="edumeet.upload", max_retries=None)
+def upload_task(self, ctx: dict) -> dict:
+    def run(manifest, progress):
+        summary = ctx["summary"]
+        with open(summary["summary_path"], "rb") as f:
+            md = f.read()
+        with open(summary["summary_pdf_path"], "rb") as f:
+            pdf = f.read()
+        upload_result = main.stage_upload(ctx["class_id"], ctx["request"].get("meeting_id"), manifest,
+                                          md, pdf, progress)
+        if not (upload_result or {}).get("ok"):
+            if _attempts(ctx, "upload")["errors"] < MAX_RETRIES:
+                raise requests.RequestException(f"요약 업로드 실패: {upload_result}")
+            cleanup_result = {"ok": False, "detail": "업로드 실패로 삭제 건너뜀"}
+        else:
+            progress("cleanup")
+            cleanup_result = main.cleanup_workspace(ctx["workspace"])
+        _finish(ctx, summary_result=summary, upload_result=upload_result, cleanup_result=cleanup_result)
+    return _run_stage(self, ctx, "upload", run)
+
+
+def submit_pipeline(class_id: str, request: dict) -> dict:
+    """체인을 브로커에 넣고 잡 정보를 돌려준다. job_id = 체인 마지막(upload) 태스크 id"""
+    job_id = uuid.uuid4().hex
+    ctx = {
+        "job_id": job_id,
+        "class_id": str(class_id),
+        "request": dict(request),
+        "workspace": main._pipeline_workspace(class_id, request, job_id),
+        "submitted_at": time.time(),
+    }
+    chain(merge_task.s(ctx), stt_task.s(), summarize_task.s(), upload_task.s()).apply_async(task_id=job_id)
+    return {"job_id": job_id, "class_id": class_id, "meeting_id": request.get("meeting_id"),
+            "status": "queued", "workspace": ctx["workspace"]}
+
+
+def job_view(job_id: str) -> dict | None:
+    """GET /STT/jobs/{job_id} 용: 로컬 잡과 같은 모양(status/stage/progress/result/error)"""
+    res = celery_app.AsyncResult(job_id)
+    state, info = res.state, res.info
+    view = {"job_id": job_id, "backend": "celery", "celery_state": state,
+            "status": "queued", "stage": "queued", "progress": None, "result": None, "error": None}
+    if state == "PENDING":
+        return view
+    if state == "PROGRESS" and isinstance(info, dict):
+        view.update(status="running", stage=info.get("stage"), progress=info.get("progress"),
+                    class_id=info.get("class_id"), meeting_id=info.get("meeting_id"))
+    elif state == "SUCCESS" and isinstance(info, dict):
+        view.update(status=info.get("status") or "done", stage="done", class_id=info.get("class_id"),
+                    meeting_id=info.get("request", {}).get("meeting_id"), result=info.get("result"),
+                    error=info.get("error"), stages_took=info.get("took"))
+    elif state == "FAILURE":
+        view.update(status="failed", stage="done", error={"status_code": 500, "detail": f"{info}"})
+    else:  # STARTED / RETRY
+        view.update(status="running", stage="upload" if state == "STARTED" else view["stage"])
+    return view
+
+
+def wait_pipeline(job_id: str, timeout: float | None = None) -> dict:
+    """동기 엔드포인트용: 체인이 끝날 때까지 기다렸다가 merge_audio 응답을 돌려준다"""
+    ctx = celery_app.AsyncResult(job_id).get(timeout=timeout, propagate=True)
+    if ctx.get("status") == "failed":
+        err = ctx.get("error") or {}
+        raise HTTPException(status_code=err.get("status_code", 500), detail=err.get("detail"))
+    return ctx["result"]
@@ -0,0 +1,33 @@
+import os, sys, tempfile
+
+# main 은 import 시점에 디렉토리/캐시 경로를 읽으므로 먼저 임시 경로로 돌려 둔다
+_TMP = tempfile.mkdtemp(prefix="edumeet_test_")
+os.environ.setdefault("AUDIO_BASE_DIR", os.path.join(_TMP, "audio"))
+os.environ.setdefault("MERGE_OUT_DIR", os.path.join(_TMP, "out"))
+os.environ.setdefault("LLM_CACHE_DIR", os.path.join(_TMP, "llm_cache"))
+os.environ.setdefault("RETENTION_INTERVAL_SEC", "0")
+os.environ.setdefault("PDF_RENDER_WORKERS", "0")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import struct
+
+import pytest
+
+
+def riff(chunks) -> bytes:
+    """[(chunk_id, payload)] → RIFF/WAVE 바이트. 홀수 크기 청크 뒤에는 패드 바이트를 넣는다"""
+    body = b"WAVE"
+    for cid, payload in chunks:
+        body += cid + struct.pack("<I", len(payload)) + payload + (b"\0" if len(payload) % 2 else b"")
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+@pytest.fixture
+def make_wav():
+    """make_wav(pcm, channels=1, sampwidth=2, rate=16000, before_data=[(id, payload)]) → PCM WAV 바이트"""
+    def make(pcm: bytes, channels=1, sampwidth=2, rate=16000, before_data=()):
+        fmt = struct.pack("<HHIIHH", 1, channels, rate, rate * channels * sampwidth, channels * sampwidth,
+                          sampwidth * 8)
+        return riff([(b"fmt ", fmt), *before_data, (b"data", pcm)])
+    return make
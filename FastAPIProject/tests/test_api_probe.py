@@ -0,0 +1,26 @@
+import httpx
+import openai
+
+import main
+
+REQUEST = httpx.Request("POST", "http://llm.local/v1/responses")
+
+
+def _not_found(message, body=None):
+    return openai.NotFoundError(message, response=httpx.Response(404, request=REQUEST), body=body)
+
+
+def test_missing_route_is_unsupported():
+    assert main._is_unsupported_api(_not_found("404 page not found"))
+    assert main._is_unsupported_api(_not_found("Error code: 404 - Invalid URL (POST /v1/responses)"))
+
+
+def test_missing_model_is_not_cached_as_chat_only():
+    e = _not_found("Error code: 404 - The model `gpt-x` does not exist",
+                   {"code": "model_not_found", "message": "The model `gpt-x` does not exist"})
+    assert not main._is_unsupported_api(e)
+
+
+def test_server_errors_are_not_unsupported():
+    e = openai.InternalServerError("boom", response=httpx.Response(500, request=REQUEST), body=None)
+    assert not main._is_unsupported_api(e)
@@ -0,0 +1,66 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import main
+
+
+class FakeResponse:
+    status_code = 200
+    text = ""
+
+    def __init__(self, body=None, lines=()):
+        self._body, self._lines = body, lines
+
+    def json(self):
+        return self._body
+
+    def iter_lines(self, decode_unicode=False):
+        return iter(self._lines)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    """한 번 실패로 열리고 바로 half-open 이 되는 차단기"""
+    br = main.CircuitBreaker("test", 1, 0)
+    br.record(False)
+    assert br.state() == "half_open"
+    monkeypatch.setattr(main, "_claude_breaker", br)
+    return br
+
+
+def _serve(monkeypatch, resp):
+    monkeypatch.setattr(main, "_clients", lambda: SimpleNamespace(gms=SimpleNamespace(post=lambda *a, **kw: resp)))
+
+
+def test_closed_breaker_stays_closed_on_success(monkeypatch):
+    br = main.CircuitBreaker("test", 2, 60)
+    monkeypatch.setattr(main, "_claude_breaker", br)
+    _serve(monkeypatch, FakeResponse({"content": [{"type": "text", "text": "통합 노트"}]}))
+    assert main._claude_reduce("http://gms", "k", "노트", use_cache=False) == "통합 노트"
+    assert br.state() == "closed" and br.failures == 0
+
+
+def test_unexpected_body_releases_half_open_trial(breaker, monkeypatch):
+    _serve(monkeypatch, FakeResponse(["not", "a", "dict"]))
+    with pytest.raises(AttributeError):
+        main._claude_reduce("http://gms", "k", "노트", use_cache=False)
+    assert not breaker.trial_in_flight
+    assert breaker.allow()  # 다음 시험 호출이 막히지 않는다
+
+
+def test_on_token_error_releases_half_open_trial(breaker, monkeypatch):
+    delta = {"type": "content_block_delta", "delta": {"type": "text_delta", "text": "조각"}}
+    _serve(monkeypatch, FakeResponse(lines=["data: " + json.dumps(delta)]))
+
+    def disconnected(text):
+        raise ConnectionResetError("SSE 클라이언트 끊김")
+
+    with pytest.raises(ConnectionResetError):
+        main._claude_reduce("http://gms", "k", "노트", use_cache=False, on_token=disconnected)
+    assert not breaker.trial_in_flight
+    assert breaker.allow()
@@ -0,0 +1,48 @@
+import os
+
+import main
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "202", "transcript.txt")
+
+
+def test_estimate_tokens_hangul_and_latin():
+    assert main._estimate_tokens("가나다") == 3
+    assert main._estimate_tokens("abcd") == 1
+    assert main._estimate_tokens("가abcde") == 1 + 2
+
+
+def test_sentence_units_keep_original_text():
+    text = "오늘은 배포를 합니다 그리고 점검합니다. 끝! 다음\n줄"
+    units = main._sentence_units(text)
+    assert "".join(units) == text
+    assert units == ["오늘은 배포를 합니다 ", "그리고 점검합니다. ", "끝! ", "다음\n", "줄"]
+
+
+def test_chunks_respect_budget_and_order():
+    with open(SAMPLE, encoding="utf-8") as f:
+        text = f.read()
+    chunks = main.chunk_transcript(text, None, budget=60, overlap=0)
+    assert len(chunks) > 1
+    assert all(main._estimate_tokens(c) <= 60 for c in chunks)
+    assert "".join(chunks) == text
+
+
+def test_oversized_unit_is_split_by_characters():
+    unit = "가" * 250
+    chunks = main._pack_units([unit], budget=100)
+    assert [len(c) for c in chunks] == [100, 100, 50]
+
+
+def test_overlap_carries_tail_units():
+    units = ["가" * 10 + ". ", "나" * 10 + ". ", "다" * 10 + ". ", "라" * 10 + ". "]
+    chunks = main._pack_units(units, budget=30, overlap=12)
+    assert chunks[0] == units[0] + units[1]
+    assert chunks[1].startswith(units[1])  # 앞 청크의 마지막 문장이 겹쳐 들어간다
+    assert chunks[-1].endswith(units[3])
+
+
+def test_segments_take_precedence_over_sentences():
+    segments = [{"start": 0, "end": 1, "text": "첫 발화"}, {"start": 1, "end": 2, "text": " "},
+                {"start": 2, "end": 3, "text": "둘째 발화"}]
+    assert main.chunk_transcript("무시되는 본문", segments, budget=100) == ["첫 발화 둘째 발화"]
+    assert main.chunk_transcript("무시되는 본문", segments, budget=5) == ["첫 발화", "둘째 발화"]
@@ -0,0 +1,117 @@
+import os, wave
+
+import pytest
+from fastapi import HTTPException
+
+import main
+
+PCM = {i: bytes([i]) * 3200 for i in range(1, 5)}  # 청크마다 다른 0.1초 분량
+
+
+@pytest.fixture(autouse=True)
+def dirs(monkeypatch, tmp_path):
+    audio, out = tmp_path / "audio", tmp_path / "out"
+    audio.mkdir()
+    out.mkdir()
+    monkeypatch.setattr(main, "BASE_AUDIO_DIR", str(audio))
+    monkeypatch.setattr(main, "MERGE_OUT_DIR", str(out))
+    monkeypatch.setenv("AUDIO_TARGET_RATE", "0")
+    return audio, out
+
+
+def _ingest(make_wav, index, pcm=None, meeting_id="m1", **params):
+    return main.ingest_chunk("7", index, make_wav(pcm if pcm is not None else PCM[index], **params), meeting_id)
+
+
+def _ingested_pcm(meeting_id="m1") -> bytes:
+    _, _, ingest_path = main._ingest_paths("7", meeting_id)
+    with open(ingest_path, "rb") as f:
+        return f.read()[44:]
+
+
+def test_in_order_chunks_are_appended(make_wav):
+    for i in (1, 2, 3):
+        result = _ingest(make_wav, i)
+        assert result["appended"] == i and not result["duplicate"]
+    assert _ingested_pcm() == PCM[1] + PCM[2] + PCM[3]
+    assert result["data_bytes"] == 3 * 3200 and result["duration_sec"] == 0.3
+
+
+def test_out_of_order_chunk_waits_for_predecessor(make_wav):
+    result = _ingest(make_wav, 2)
+    assert result["appended"] == 0 and result["pending"] == [2]
+    assert _ingested_pcm() == b""
+    result = _ingest(make_wav, 1)
+    assert result["appended"] == 2 and result["pending"] == [] and result["next_index"] == 3
+    assert _ingested_pcm() == PCM[1] + PCM[2]
+
+
+def test_duplicate_index_keeps_first_chunk(make_wav, dirs):
+    audio, _ = dirs
+    _ingest(make_wav, 1)
+    _ingest(make_wav, 3)  # 대기 중
+    for index in (1, 3):
+        assert _ingest(make_wav, index, pcm=b"\xff" * 3200)["duplicate"]
+    meeting_dir = audio / "7" / "meeting-m1"
+    for index in (1, 3):
+        assert main._read_wav_info(str(meeting_dir / f"chunk_{index}.wav"))["data_size"] == 3200
+        with wave.open(str(meeting_dir / f"chunk_{index}.wav"), "rb") as w:
+            assert w.readframes(w.getnframes()) == PCM[index]
+    assert _ingested_pcm() == PCM[1]
+    assert not [n for n in os.listdir(meeting_dir) if n.endswith(".tmp")]
+
+
+def test_meetings_of_same_class_keep_their_own_chunks(make_wav, dirs):
+    audio, _ = dirs
+    _ingest(make_wav, 1, meeting_id="a")
+    _ingest(make_wav, 1, pcm=PCM[2], meeting_id="b")
+    assert _ingested_pcm("a") == PCM[1] and _ingested_pcm("b") == PCM[2]
+    assert main._pipeline_inputs("7", "a")[0] == str(audio / "7" / "meeting-a")
+    with wave.open(str(audio / "7" / "meeting-b" / "chunk_1.wav"), "rb") as w:
+        assert w.readframes(w.getnframes()) == PCM[2]
+
+
+def test_mismatched_params_are_rejected(make_wav, dirs):
+    audio, _ = dirs
+    _ingest(make_wav, 1)
+    with pytest.raises(HTTPException) as ei:
+        _ingest(make_wav, 2, rate=8000)
+    assert ei.value.status_code == 415
+    assert sorted(os.listdir(audio / "7" / "meeting-m1")) == ["chunk_1.wav"]
+    assert _ingest(make_wav, 2)["appended"] == 2  # 같은 번호를 올바른 형식으로 다시 보낼 수 있다
+
+
+def test_not_a_wav_is_rejected(dirs):
+    with pytest.raises(HTTPException) as ei:
+        main.ingest_chunk("7", 1, b"not a wav file", "m1")
+    assert ei.value.status_code == 415
+
+
+def test_finalize_rewrites_header_only(make_wav, dirs):
+    _, out = dirs
+    for i in (2, 1, 3):
+        _ingest(make_wav, i)
+    in_dir, files = main._pipeline_inputs("7", "m1")
+    workspace = main._workspace_dir("7", "m1")
+    out_path = os.path.join(workspace, "Merge__7.wav")
+    assert main.finalize_ingest("7", files, out_path, "m1")
+    info = main._read_wav_info(out_path)
+    assert (info["channels"], info["sampwidth"], info["framerate"]) == (1, 2, 16000)
+    assert info["data_offset"] == 44 and info["data_size"] == 3 * 3200
+    assert os.path.getsize(out_path) == 44 + 3 * 3200
+    with wave.open(out_path, "rb") as w:
+        assert w.readframes(w.getnframes()) == PCM[1] + PCM[2] + PCM[3]
+    assert not os.path.exists(os.path.join(workspace, main.INGEST_STATE_NAME))
+
+
+def test_finalize_falls_back_when_a_chunk_is_missing(make_wav, dirs):
+    audio, _ = dirs
+    _ingest(make_wav, 1)
+    _ingest(make_wav, 3)  # 2 가 빠짐
+    (audio / "7" / "meeting-m1" / "chunk_2.wav").write_bytes(make_wav(PCM[2]))  # 적재 밖에서 들어온 청크
+    _, files = main._pipeline_inputs("7", "m1")
+    out_path = os.path.join(main._workspace_dir("7", "m1"), "Merge__7.wav")
+    assert not main.finalize_ingest("7", files, out_path, "m1")
+    assert not os.path.exists(out_path)
+    _, state_path, ingest_path = main._ingest_paths("7", "m1")
+    assert not os.path.exists(state_path) and not os.path.exists(ingest_path)
@@ -0,0 +1,41 @@
+import httpx
+import openai
+
+import main
+
+REQUEST = httpx.Request("POST", "http://llm.local/v1/responses")
+
+
+def rate_limited(retry_after="0"):
+    return openai.RateLimitError("rate limited", response=httpx.Response(
+        429, request=REQUEST, headers={"retry-after": retry_after}), body=None)
+
+
+def test_limiter_is_shared_by_every_summary():
+    assert isinstance(main._llm_limiter, main.AdaptiveLimiter)
+    assert main._llm_limiter.max_limit == int(main.os.environ.get("LLM_CONCURRENCY", "4"))
+
+
+def test_rate_limit_halves_then_recovers():
+    limiter = main.AdaptiveLimiter(4)
+    limiter.on_rate_limited(0, 0)
+    assert limiter.limit == 2
+    for _ in range(2):
+        limiter.acquire()
+        limiter.release(ok=True)
+    assert limiter.limit == 3
+
+
+def test_llm_call_retries_429():
+    limiter = main.AdaptiveLimiter(2)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) == 1:
+            raise rate_limited()
+        return "ok"
+
+    assert main._llm_call(limiter, fn) == "ok"
+    assert len(calls) == 2
+    assert limiter.paused_until > 0 and limiter.in_flight == 0
@@ -0,0 +1,80 @@
+import json, os
+
+import pytest
+from fastapi import HTTPException
+
+import main
+
+
+def _output(tmp_path, name="out.txt"):
+    path = os.path.join(tmp_path, name)
+    with open(path, "w", encoding="utf-8") as fw:
+        fw.write("x")
+    return path
+
+
+def test_record_then_fresh_in_new_instance(tmp_path):
+    out = _output(tmp_path)
+    m = main.StageManifest(str(tmp_path))
+    m.record("stt", "fp-1", [out], started=0, took=1.5, provider="clova")
+
+    again = main.StageManifest(str(tmp_path))
+    rec = again.fresh("stt", "fp-1")
+    assert rec["outputs"] == [out]
+    assert rec["took"] == 1.5
+    assert rec["provider"] == "clova"
+    assert again.skipped == ["stt"]
+
+
+def test_changed_fingerprint_is_not_fresh(tmp_path):
+    m = main.StageManifest(str(tmp_path))
+    m.record("clean", "fp-1", [_output(tmp_path)], started=0, took=0)
+    assert main.StageManifest(str(tmp_path)).fresh("clean", "fp-2") is None
+
+
+def test_missing_output_is_not_fresh(tmp_path):
+    out = _output(tmp_path)
+    main.StageManifest(str(tmp_path)).record("pdf", "fp", [out], started=0, took=0)
+    os.remove(out)
+    m = main.StageManifest(str(tmp_path))
+    assert m.fresh("pdf", "fp") is None
+    assert m.skipped == []
+
+
+def test_force_from_stage_reruns_that_stage_and_later(tmp_path):
+    out = _output(tmp_path)
+    m = main.StageManifest(str(tmp_path))
+    for stage in ("merge", "stt", "clean", "map"):
+        m.record(stage, stage, [out], started=0, took=0)
+
+    forced = main.StageManifest(str(tmp_path), "clean")
+    assert forced.fresh("merge", "merge")
+    assert forced.fresh("stt", "stt")
+    assert forced.fresh("clean", "clean") is None
+    assert forced.fresh("map", "map") is None
+    assert forced.skipped == ["merge", "stt"]
+
+
+def test_unknown_force_stage_is_rejected(tmp_path):
+    with pytest.raises(HTTPException) as exc:
+        main.StageManifest(str(tmp_path), "nope")
+    assert exc.value.status_code == 400
+
+
+def test_corrupt_manifest_starts_empty(tmp_path):
+    with open(os.path.join(tmp_path, main.MANIFEST_NAME), "w") as fw:
+        fw.write("{not json")
+    m = main.StageManifest(str(tmp_path))
+    assert m.data == {"stages": {}}
+    m.record("merge", "fp", [], started=0, took=0)
+    with open(os.path.join(tmp_path, main.MANIFEST_NAME), encoding="utf-8") as f:
+        assert json.load(f)["stages"]["merge"]["fingerprint"] == "fp"
+
+
+def test_save_after_workspace_removed_is_noop(tmp_path):
+    ws = os.path.join(tmp_path, "ws")
+    os.makedirs(ws)
+    m = main.StageManifest(ws)
+    os.rmdir(ws)
+    m.record("upload", "fp", [], started=0, took=0)
+    assert not os.path.exists(ws)
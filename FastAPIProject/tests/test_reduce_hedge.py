@@ -0,0 +1,58 @@
+import time
+
+import pytest
+
+import main
+
+
+@pytest.fixture(autouse=True)
+def short_delay(monkeypatch):
+    monkeypatch.setenv("REDUCE_HEDGE_DELAY_SEC", "0.05")
+
+
+def _counts():
+    stats = main.reduce_stats()
+    return stats["claude_wins"], stats["openai_wins"]
+
+
+def _openai_down():
+    raise RuntimeError("openai down")
+
+
+def test_openai_failure_waits_for_claude():
+    def slow_claude():
+        time.sleep(0.3)
+        return "claude md"
+    assert main._reduce_with_fallback(slow_claude, _openai_down, hedge=True) == ("claude md", "claude")
+
+
+def test_claude_within_delay_counts_as_win():
+    claude, openai = _counts()
+    assert main._reduce_with_fallback(lambda: "fast", _openai_down, hedge=True) == ("fast", "claude")
+    assert _counts() == (claude + 1, openai)
+
+
+def test_both_failing_raises_openai_error():
+    def failing_claude():
+        time.sleep(0.2)
+        return None
+    with pytest.raises(RuntimeError, match="openai down"):
+        main._reduce_with_fallback(failing_claude, _openai_down, hedge=True)
+
+
+def test_claude_failure_is_not_an_openai_win():
+    before = main.reduce_stats()
+    assert main._reduce_with_fallback(lambda: None, lambda: "openai md", hedge=True) == ("openai md", "openai")
+
+    def late_failure():
+        time.sleep(0.1)
+        return None
+
+    def slow_openai():
+        time.sleep(0.3)
+        return "openai md"
+
+    assert main._reduce_with_fallback(late_failure, slow_openai, hedge=True) == ("openai md", "openai")
+    after = main.reduce_stats()
+    assert after["claude_failed"] == before["claude_failed"] + 2
+    assert (after["claude_wins"], after["openai_wins"]) == (before["claude_wins"], before["openai_wins"])
@@ -0,0 +1,114 @@
+import os, time
+
+import pytest
+
+import main
+
+HOUR = 3600
+
+
+@pytest.fixture
+def dirs(monkeypatch, tmp_path):
+    audio, out = tmp_path / "audio", tmp_path / "out"
+    audio.mkdir()
+    out.mkdir()
+    monkeypatch.setattr(main, "BASE_AUDIO_DIR", str(audio))
+    monkeypatch.setattr(main, "MERGE_OUT_DIR", str(out))
+    monkeypatch.setenv("STT_BACKEND", "local")
+    return audio, out
+
+
+def _file(path, size=10, age_h=0.0):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as fw:
+        fw.write(b"\0" * size)
+    t = time.time() - age_h * HOUR
+    os.utime(path, (t, t))
+    return str(path)
+
+
+def _gc(max_bytes=0, grace=0, **ttl_h):
+    ttl = {t: ttl_h.get(t, 0) * HOUR for t in main.RETENTION_TYPES}
+    return main.RetentionGC(max_bytes, ttl, grace)
+
+
+def test_ttl_removes_only_expired_files(dirs):
+    audio, _ = dirs
+    old = _file(audio / "c1" / "chunk_1.wav", age_h=10)
+    new = _file(audio / "c1" / "chunk_2.wav", age_h=1)
+    conv = _file(audio / "c1" / "chunk_2.conv.wav", age_h=3)
+    result = _gc(raw=5, conv=2).run()
+    assert not os.path.exists(old)
+    assert not os.path.exists(conv)
+    assert os.path.exists(new)
+    assert result["evicted_by_type"]["raw"] == 1
+    assert result["reclaimed_by_type"]["conv"] == 10
+
+
+def test_meeting_chunks_are_collected(dirs):
+    audio, _ = dirs
+    old = _file(audio / "c1" / "meeting-1" / "chunk_1.wav", age_h=10)
+    part = _file(audio / "c1" / "meeting-1" / "chunk_2.wav.ab12.tmp", age_h=10)
+    result = _gc(raw=5).run()
+    assert not os.path.exists(old)
+    assert os.path.exists(part)  # 적재 중인 임시 파일은 건드리지 않는다
+    assert result["evicted_by_type"]["raw"] == 1
+
+
+def test_quota_evicts_oldest_first(dirs):
+    audio, _ = dirs
+    paths = [_file(audio / "c1" / f"chunk_{i}.wav", size=100, age_h=5 - i) for i in range(4)]
+    result = _gc(max_bytes=300).run()
+    assert [os.path.exists(p) for p in paths] == [False, False, True, True]  # 90% 인 270 바이트까지
+    assert result["usage_bytes"] == 200
+
+
+def test_grace_window_protects_recent_files(dirs):
+    audio, _ = dirs
+    recent = _file(audio / "c1" / "chunk_1.wav", age_h=0.01)
+    _gc(max_bytes=1, grace=HOUR, raw=0.001).run()
+    assert os.path.exists(recent)
+
+
+def test_unfinalized_ingest_protects_class_regardless_of_age(dirs):
+    audio, out = dirs
+    chunk = _file(audio / "c1" / "chunk_1.wav", age_h=100)
+    _file(out / "c1" / "meeting-1" / main.INGEST_STATE_NAME, age_h=100)
+    result = _gc(max_bytes=1, raw=1, workspace=1).run()
+    assert os.path.exists(chunk)
+    assert result["skipped_active_classes"] == ["c1"]
+
+    # finalize 후(manifest 가 생기면)에는 다시 대상
+    _file(out / "c1" / "meeting-1" / main.MANIFEST_NAME, age_h=100)
+    _gc(raw=1).run()
+    assert not os.path.exists(chunk)
+
+
+def test_locked_workspace_is_skipped(dirs):
+    _, out = dirs
+    ws = out / "c1" / "meeting-1"
+    _file(ws / main.MANIFEST_NAME, age_h=100)
+    lock = main._workspace_lock(str(ws))
+    with lock:
+        _gc(workspace=1).run()
+        assert os.path.isdir(ws)
+    _gc(workspace=1).run()
+    assert not os.path.exists(ws)
+
+
+def test_workspace_and_merged_wav_accounted_once(dirs):
+    _, out = dirs
+    ws = out / "c1" / "input-abc"
+    _file(ws / "Merge__c1.wav", size=1000, age_h=100)
+    _file(ws / main.MANIFEST_NAME, size=10, age_h=100)
+    result = _gc(workspace=1).run()
+    assert not os.path.exists(ws)
+    assert result["reclaimed_bytes"] == 1010
+    assert result["reclaimed_by_type"] == {"raw": 0, "conv": 0, "merged": 1000, "workspace": 10}
+
+
+def test_unrelated_directories_are_left_alone(dirs):
+    _, out = dirs
+    other = _file(out / "bench" / "default" / "notes.txt", age_h=100)
+    _gc(max_bytes=1, workspace=1).run()
+    assert os.path.exists(other)
@@ -0,0 +1,73 @@
+import threading
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def sched(monkeypatch):
+    monkeypatch.setenv("STT_SCHEDULER", "sjf")
+    monkeypatch.setenv("STT_SCHED_AGING", "4")
+    monkeypatch.setenv("STT_SCHED_PRIORITY_SEC", "1800")
+    return main.JobScheduler()
+
+
+def _drain(s):
+    return [s.get() for _ in range(s.qsize())]
+
+
+def test_shortest_job_first(sched):
+    sched.put("long", cost=600, enqueued_at=100)
+    sched.put("short", cost=30, enqueued_at=100)
+    sched.put("mid", cost=300, enqueued_at=100)
+    assert _drain(sched) == ["short", "mid", "long"]
+
+
+def test_aging_lets_old_long_job_go_first(sched):
+    # aging 4: 200초 먼저 온 600초 잡(600)이 나중에 온 30초 잡(30 + 4×200 = 830)보다 앞선다
+    sched.put("old-long", cost=600, enqueued_at=0)
+    sched.put("new-short", cost=30, enqueued_at=200)
+    assert _drain(sched) == ["old-long", "new-short"]
+
+
+def test_priority_bonus(sched):
+    sched.put("normal", cost=30, enqueued_at=0)
+    sched.put("urgent", cost=1200, priority=1, enqueued_at=0)
+    assert _drain(sched) == ["urgent", "normal"]
+
+
+def test_fifo_policy_ignores_cost(sched, monkeypatch):
+    monkeypatch.setenv("STT_SCHEDULER", "fifo")
+    sched.put("first", cost=600, enqueued_at=1)
+    sched.put("second", cost=10, enqueued_at=2)
+    assert _drain(sched) == ["first", "second"]
+
+
+def test_ties_keep_arrival_order(sched):
+    for name in ("a", "b", "c"):
+        sched.put(name, cost=10, enqueued_at=5)
+    assert _drain(sched) == ["a", "b", "c"]
+
+
+def test_get_blocks_until_put(sched):
+    got = []
+    t = threading.Thread(target=lambda: got.append(sched.get()))
+    t.start()
+    t.join(0.1)
+    assert t.is_alive()
+    sched.put("job", cost=1)
+    t.join(1)
+    assert got == ["job"]
+    assert sched.qsize() == 0
+
+
+def test_estimate_job_cost_from_wav_headers(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "BASE_AUDIO_DIR", str(tmp_path / "audio"))
+    monkeypatch.setattr(main, "MERGE_OUT_DIR", str(tmp_path / "out"))
+    d = tmp_path / "audio" / "c1"
+    d.mkdir(parents=True)
+    for i in (1, 2):
+        (d / f"chunk_{i}.wav").write_bytes(main._wav_header(1, 2, 16000, 16000 * 2 * 5) + b"\0" * (16000 * 2 * 5))
+    assert main.estimate_job_cost("c1", {}) == pytest.approx(10.0)
+    assert main.estimate_job_cost("empty", {"total_chunks": 6}) == pytest.approx(60.0)
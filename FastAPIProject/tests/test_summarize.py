@@ -0,0 +1,80 @@
+import dataclasses, json, threading, time
+
+import httpx
+import openai
+import pytest
+
+import main
+
+REQUEST = httpx.Request("POST", "http://llm.local/v1/responses")
+TRANSCRIPT = "오늘은 미분을 배웁니다. 도함수는 순간 변화율입니다. "
+
+
+def rate_limited():
+    return openai.RateLimitError("rate limited", response=httpx.Response(
+        429, request=REQUEST, headers={"retry-after": "0"}), body=None)
+
+
+@pytest.fixture
+def llm(monkeypatch, tmp_path):
+    """
+    가짜 _llm_text: calls 에 (model, max_output_tokens) 를 남기고, fail 에 든 max_output_tokens 는 한 번 429.
+    delay: max_output_tokens 별 응답 지연 (clean=2000, map=2200, 최종=3000)
+    """
+    state = {"calls": [], "fail": set(), "delay": {}}
+    guard = threading.Lock()
+
+    def fake_llm_text(oai, model, system, user, temperature, max_output_tokens=None, chat_system=None,
+                      use_cache=True, on_token=None):
+        with guard:
+            state["calls"].append((model, max_output_tokens))
+            if max_output_tokens in state["fail"]:
+                state["fail"].discard(max_output_tokens)
+                raise rate_limited()
+        time.sleep(state["delay"].get(max_output_tokens, 0))
+        return f"# 노트 {max_output_tokens}\n"
+
+    monkeypatch.setattr(main, "_llm_text", fake_llm_text)
+    monkeypatch.setattr(main, "_load_openai_clients", lambda: (None, "clean-model", "summary-model"))
+    monkeypatch.setattr(main, "settings", dataclasses.replace(main.settings, use_gms_claude=False))
+    monkeypatch.setattr(main, "render_summary_pdf", lambda md: b"%PDF-stub")
+    monkeypatch.setattr(main, "_llm_limiter", main.AdaptiveLimiter(2))
+    return state
+
+
+def _summarize(tmp_path, text):
+    path = tmp_path / "transcript.txt"
+    path.write_text(text, encoding="utf-8")
+    return main.summarize_text_auto(str(path), str(tmp_path), use_cache=False)
+
+
+def test_single_pass_retries_429(llm, tmp_path):
+    llm["fail"].add(3000)  # one-pass 최종 문서
+    result = _summarize(tmp_path, TRANSCRIPT)
+    assert result["ok"], result.get("detail")
+    assert result["summary_mode"] == "single"
+    assert llm["calls"] == [("summary-model", 3000), ("summary-model", 3000)]
+
+
+def test_openai_reduce_retries_429(llm, tmp_path, monkeypatch):
+    monkeypatch.setenv("SUMMARY_SINGLE_PASS_TOKENS", "0")
+    monkeypatch.setenv("CHUNK_TOKENS", "15")
+    llm["fail"].add(3000)  # 최종 OpenAI 리듀스
+    result = _summarize(tmp_path, TRANSCRIPT * 4)
+    assert result["ok"], result.get("detail")
+    assert result["summary_mode"] == "full" and result["reduce_provider"] == "openai"
+    # 리듀스만 다시 보내고 clean/map 은 다시 돌지 않는다
+    assert [c for c in llm["calls"] if c[1] == 3000] == [("summary-model", 3000)] * 2
+    assert llm["calls"][-2:] == [("summary-model", 3000)] * 2
+
+
+def test_clean_and_map_are_timed_separately(llm, tmp_path, monkeypatch):
+    monkeypatch.setenv("SUMMARY_SINGLE_PASS_TOKENS", "0")
+    monkeypatch.setenv("CHUNK_TOKENS", "15")
+    llm["delay"][2200] = 0.05
+    result = _summarize(tmp_path, TRANSCRIPT * 4)
+    assert result["ok"], result.get("detail")
+    stages = json.loads((tmp_path / main.MANIFEST_NAME).read_text(encoding="utf-8"))["stages"]
+    maps = len([c for c in llm["calls"] if c[1] == 2200])
+    assert stages["clean"]["took"] < 0.05
+    assert stages["map"]["took"] >= 0.05 * maps * 0.9
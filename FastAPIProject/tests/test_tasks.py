@@ -0,0 +1,125 @@
+import os, threading, time
+
+import pytest
+
+# tasks 는 import 시점에 브로커 주소를 읽는다 → Redis 없이 메모리 브로커 + 스레드 워커로 체인을 돌린다
+os.environ.setdefault("CELERY_BROKER_URL", "memory://")
+os.environ.setdefault("CELERY_RESULT_BACKEND", "cache+memory://")
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")  # redis-py Lock 은 Lua 스크립트로 돈다
+
+import main
+import tasks
+from celery.contrib.testing.worker import start_worker
+
+
+@pytest.fixture(scope="module")
+def worker():
+    tasks.celery_app.conf.broker_transport_options = {"polling_interval": 0.01}
+    with start_worker(tasks.celery_app, pool="threads", concurrency=2, perform_ping_check=False,
+                      queues=[tasks.AUDIO_QUEUE, tasks.LLM_QUEUE]):
+        yield
+
+
+@pytest.fixture
+def pipeline(worker, monkeypatch, tmp_path):
+    """단계 함수를 기록용 가짜로 바꾼다. calls: (meeting_id, stage, 시작, 끝, force_from)"""
+    state = {"calls": [], "stt_failures": 0, "merge_sec": 0.0, "merging": threading.Event()}
+    guard = threading.Lock()
+
+    def record(stage, request, manifest, started):
+        with guard:
+            state["calls"].append((request.get("meeting_id"), stage, started, time.time(), manifest.force_from))
+
+    def stage_merge(class_id, request, workspace, manifest, files, progress):
+        started = time.time()
+        state["merging"].set()
+        time.sleep(state["merge_sec"])
+        record("merge", request, manifest, started)
+        return "merge-fp"
+
+    def stage_stt(class_id, request, workspace, manifest, merge_fp, progress):
+        started = time.time()
+        record("stt", request, manifest, started)
+        with guard:
+            if state["stt_failures"]:
+                state["stt_failures"] -= 1
+                raise OSError("일시 오류")
+        path = os.path.join(workspace, "transcript.txt")
+        with open(path, "w", encoding="utf-8") as fw:
+            fw.write("전사")
+        return {"ok": True, "transcript_path": path}, None
+
+    def summarize_text_auto(transcript_path, out_dir, progress=None, use_cache=True, manifest=None, on_token=None):
+        started = time.time()
+        paths = [os.path.join(out_dir, "summary.md"), os.path.join(out_dir, "summary.pdf")]
+        for p in paths:
+            with open(p, "wb") as fw:
+                fw.write(b"x")
+        record("summarize", {"meeting_id": os.path.basename(out_dir).split("-", 1)[1]}, manifest, started)
+        return {"ok": True, "summary_path": paths[0], "summary_pdf_path": paths[1], "persist": lambda: None}
+
+    def stage_upload(class_id, meeting_id, manifest, md, pdf, progress):
+        record("upload", {"meeting_id": meeting_id}, manifest, time.time())
+        return {"ok": True}
+
+    monkeypatch.setattr(main, "MERGE_OUT_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "_pipeline_inputs", lambda class_id, meeting_id=None: (str(tmp_path), []))
+    monkeypatch.setattr(main, "stage_merge", stage_merge)
+    monkeypatch.setattr(main, "stage_stt", stage_stt)
+    monkeypatch.setattr(main, "summarize_text_auto", summarize_text_auto)
+    monkeypatch.setattr(main, "stage_upload", stage_upload)
+    monkeypatch.setattr(main, "cleanup_workspace", lambda workspace: {"ok": True})
+    monkeypatch.setattr(tasks, "_redis_client", fakeredis.FakeRedis())
+    monkeypatch.setattr(tasks, "LOCK_RETRY_SEC", 0.1)
+    monkeypatch.setattr(tasks, "ERROR_RETRY_SEC", 0.05)
+    return state
+
+
+def _wait(job):
+    return tasks.celery_app.AsyncResult(job["job_id"]).get(timeout=30)
+
+
+def test_chain_runs_stages_in_order(pipeline):
+    ctx = _wait(tasks.submit_pipeline("7", {"meeting_id": "1"}))
+    assert ctx["status"] == "done"
+    assert [c[1] for c in pipeline["calls"]] == ["merge", "stt", "summarize", "upload"]
+    assert ctx["result"]["status"] == "summary_done"
+    assert set(ctx["took"]) == {"merge", "stt", "summarize", "upload"}
+
+
+def test_transient_error_retries_stage_and_continues(pipeline):
+    pipeline["stt_failures"] = 1
+    ctx = _wait(tasks.submit_pipeline("7", {"meeting_id": "1"}))
+    assert ctx["status"] == "done"
+    assert [c[1] for c in pipeline["calls"]] == ["merge", "stt", "stt", "summarize", "upload"]
+    assert ctx["attempts"]["stt"]["errors"] == 1
+    assert ctx["attempts"]["merge"]["errors"] == 0
+
+
+def test_error_budget_exhausted_marks_failed(pipeline, monkeypatch):
+    monkeypatch.setattr(tasks, "MAX_RETRIES", 1)
+    pipeline["stt_failures"] = 2
+    ctx = _wait(tasks.submit_pipeline("7", {"meeting_id": "1"}))
+    assert ctx["status"] == "failed"
+    assert "stt 실패" in ctx["error"]["detail"]
+    assert [c[1] for c in pipeline["calls"]] == ["merge", "stt", "stt"]
+
+
+def test_same_meeting_requests_do_not_overlap(pipeline):
+    pipeline["merge_sec"] = 0.5
+    first = tasks.submit_pipeline("7", {"meeting_id": "1"})
+    assert pipeline["merging"].wait(10)  # 첫 요청이 락을 잡고 병합 중일 때
+    second = tasks.submit_pipeline("7", {"meeting_id": "1", "force_from_stage": "merge"})
+    ctx1, ctx2 = _wait(first), _wait(second)
+    assert ctx1["status"] == ctx2["status"] == "done"
+    assert first["workspace"] == second["workspace"]
+
+    # 같은 작업 공간에서 두 단계가 동시에 돈 적이 없다
+    spans = sorted((c[2], c[3]) for c in pipeline["calls"])
+    assert all(prev_end <= start for (_, prev_end), (start, _) in zip(spans, spans[1:]))
+    # 락 대기는 오류 재시도 한도에 들어가지 않고, 대기 뒤에도 force_from_stage 가 적용된다
+    assert ctx2["attempts"]["merge"]["lock_waits"] >= 1
+    assert ctx2["attempts"]["merge"]["errors"] == 0
+    forced_merges = [c for c in pipeline["calls"] if c[1] == "merge" and c[4] == 0]
+    assert len(forced_merges) == 1
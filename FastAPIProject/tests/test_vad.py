@@ -0,0 +1,81 @@
+import json, os
+
+import numpy as np
+
+import main
+
+RATE = 16000
+WIN = RATE * main.VAD_FRAME_MS // 1000  # 480 샘플
+# 기본값: VAD_MIN_SILENCE_MS=1500 → 50 프레임, VAD_KEEP_SILENCE_MS=400 → 13 프레임 (앞 6 / 뒤 7)
+
+
+def _mask(*runs):
+    """_mask((True, 10), (False, 100), ...) → 프레임별 발화 여부"""
+    return np.concatenate([np.full(n, v) for v, n in runs])
+
+
+def test_long_silence_keeps_margins_on_both_sides():
+    speech = _mask((True, 10), (False, 100), (True, 10))
+    spans = main._keep_spans(speech, WIN, len(speech) * WIN, RATE)
+    assert spans == [(0, (10 + 6) * WIN), ((110 - 7) * WIN, 120 * WIN)]
+
+
+def test_short_silence_is_not_cut():
+    speech = _mask((True, 10), (False, 50), (True, 10))
+    assert main._keep_spans(speech, WIN, len(speech) * WIN, RATE) == [(0, 70 * WIN)]
+
+
+def test_recording_edges_keep_only_the_margin_next_to_speech():
+    speech = _mask((False, 60), (True, 10), (False, 60))
+    nframes = len(speech) * WIN + 100  # 마지막 프레임에 못 미치는 꼬리 샘플도 함께 잘린다
+    assert main._keep_spans(speech, WIN, nframes, RATE) == [((60 - 7) * WIN, (70 + 6) * WIN)]
+
+
+def test_remap_segments_across_removed_silences():
+    offset_map = [[0, 0, 1000], [1000, 5000, 2000], [3000, 9000, 500]]
+    segments = [{"start": 0, "end": 999, "text": "a"}, {"start": 1000, "end": 2500},
+                {"start": 2999, "end": 3200}, {"start": 3400, "end": 9999}, {"text": "시각 없음"}]
+    assert main._remap_segments(segments, offset_map) == [
+        {"start": 0, "end": 999, "text": "a"},
+        {"start": 5000, "end": 6500},
+        {"start": 6999, "end": 9200},
+        {"start": 9400, "end": 9500},  # 마지막 구간 길이를 넘으면 구간 끝으로
+        {"text": "시각 없음"},
+    ]
+    assert segments[1] == {"start": 1000, "end": 2500}  # 원본은 그대로
+
+
+def _tone(sec):
+    t = np.arange(int(RATE * sec)) / RATE
+    return (np.sin(2 * np.pi * 440 * t) * 8000).astype("<i2")
+
+
+def test_vad_trim_writes_kept_ranges_and_offset_map(tmp_path, make_wav):
+    pcm = np.concatenate([_tone(1), np.zeros(RATE * 5, dtype="<i2"), _tone(1)]).tobytes()
+    src = tmp_path / "Merge__7.wav"
+    src.write_bytes(make_wav(pcm, before_data=[(b"LIST", b"odd")]))
+    out = tmp_path / "Merge__7.vad.wav"
+
+    result = main.vad_trim(str(src), str(out))
+    # 말소리 프레임 0..33, 무음 34..199 → 앞 6 / 뒤 7 프레임만 남긴다
+    spans = [(0, 40 * WIN), (193 * WIN, 7 * RATE)]
+    assert result["offset_map"] == [[0, 0, 1200], [1200, 5790, 1210]]
+    assert result["original_sec"] == 7.0 and result["kept_sec"] == 2.41
+
+    kept = b"".join(pcm[s * 2:e * 2] for s, e in spans)
+    data = out.read_bytes()
+    assert data[:44] == main._wav_header(1, 2, RATE, len(kept))
+    assert data[44:] == kept
+    with open(os.path.join(tmp_path, "vad_map.json"), encoding="utf-8") as f:
+        assert json.load(f) == result["offset_map"]
+    # 잘린 파일의 1.2초 지점 = 원본에서 다시 말이 시작되기 0.21초 전
+    assert main._map_trimmed_ms(1200, result["offset_map"]) == 5790
+
+
+def test_vad_trim_leaves_speech_only_audio_alone(tmp_path, make_wav):
+    src = tmp_path / "Merge__7.wav"
+    src.write_bytes(make_wav(_tone(2).tobytes()))
+    result = main.vad_trim(str(src), str(tmp_path / "Merge__7.vad.wav"))
+    assert result["path"] == str(src) and result["removed_sec"] == 0.0
+    assert result["offset_map"] == [[0, 0, 2000]]
+    assert not os.path.exists(tmp_path / "Merge__7.vad.wav")
@@ -0,0 +1,79 @@
+import os, struct, wave
+
+import pytest
+from fastapi import HTTPException
+
+import main
+from conftest import riff
+
+PCM_A = bytes(range(200)) * 8   # 1600 bytes = 800 프레임 (mono/16bit)
+PCM_B = bytes(range(50, 250)) * 4
+
+
+def _write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_list_chunk_before_data_is_skipped(tmp_path, make_wav):
+    listing = b"INFOISFT\x06\x00\x00\x00Lavf\x00\x00"  # 짝수 크기
+    path = _write(tmp_path, "a.wav", make_wav(PCM_A, before_data=[(b"LIST", listing)]))
+    info = main._read_wav_info(path)
+    assert info["data_offset"] == 12 + (8 + 16) + (8 + len(listing)) + 8
+    assert info["data_size"] == len(PCM_A)
+    with open(path, "rb") as f:
+        f.seek(info["data_offset"])
+        assert f.read(info["data_size"]) == PCM_A
+
+
+def test_odd_sized_chunk_pad_byte(tmp_path, make_wav):
+    path = _write(tmp_path, "a.wav", make_wav(PCM_A, before_data=[(b"junk", b"12345")]))
+    info = main._read_wav_info(path)
+    assert info["data_offset"] == 12 + (8 + 16) + (8 + 5 + 1) + 8  # 5바이트 청크 뒤 패드 1바이트
+
+
+def test_open_ended_data_runs_to_eof_on_frame_boundary(tmp_path, make_wav):
+    data = bytearray(make_wav(PCM_A + b"\x01"))  # 녹음 중단으로 반쪽 프레임이 남음
+    struct.pack_into("<I", data, len(data) - len(PCM_A) - 1 - 1 - 4, 0)  # data 크기 0 (스트리밍 녹음기)
+    path = _write(tmp_path, "a.wav", bytes(data)[:-1])  # 패드 바이트 없이 끝남
+    info = main._read_wav_info(path)
+    assert info["data_size"] == len(PCM_A)
+
+
+def test_rejects_non_riff_and_missing_data(tmp_path, make_wav):
+    with pytest.raises(ValueError):
+        main._read_wav_info(_write(tmp_path, "a.webm", b"\x1aE\xdf\xa3" + b"\0" * 40))
+    fmt = make_wav(b"")[12:12 + 8 + 16]
+    with pytest.raises(ValueError, match="data"):
+        main._read_wav_info(_write(tmp_path, "b.wav", riff([(b"fmt ", fmt[8:])])))
+
+
+@pytest.mark.parametrize("target_rate", ["0", "16000"])
+def test_merge_copies_pcm_ranges_behind_one_header(tmp_path, make_wav, monkeypatch, target_rate):
+    monkeypatch.setenv("AUDIO_TARGET_RATE", target_rate)
+    a = _write(tmp_path, "chunk_1.wav", make_wav(PCM_A, before_data=[(b"LIST", b"odd")]))
+    b = _write(tmp_path, "chunk_2.wav", make_wav(PCM_B))
+    out = str(tmp_path / "Merge__7.wav")
+    main.merge_wav_files([a, b], out)
+
+    with open(out, "rb") as f:
+        merged = f.read()
+    total = len(PCM_A) + len(PCM_B)
+    assert len(merged) == 44 + total
+    assert merged[:44] == main._wav_header(1, 2, 16000, total)
+    assert struct.unpack("<I", merged[4:8])[0] == 36 + total
+    assert struct.unpack("<I", merged[40:44])[0] == total
+    assert merged[44:] == PCM_A + PCM_B
+    with wave.open(out, "rb") as w:
+        assert w.getnframes() == total // 2
+
+
+def test_merge_rejects_mismatched_params_without_conversion(tmp_path, make_wav, monkeypatch):
+    monkeypatch.setenv("AUDIO_TARGET_RATE", "0")
+    a = _write(tmp_path, "chunk_1.wav", make_wav(PCM_A))
+    b = _write(tmp_path, "chunk_2.wav", make_wav(PCM_B, rate=8000))
+    with pytest.raises(HTTPException) as ei:
+        main.merge_wav_files([a, b], str(tmp_path / "out.wav"))
+    assert ei.value.status_code == 415
+    assert not os.path.exists(tmp_path / "out.wav")
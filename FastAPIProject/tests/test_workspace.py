@@ -0,0 +1,32 @@
+import os
+
+import main
+
+
+def _chunks(monkeypatch, tmp_path, names):
+    monkeypatch.setattr(main, "BASE_AUDIO_DIR", str(tmp_path))
+    d = tmp_path / "c1"
+    d.mkdir(exist_ok=True)
+    for name in names:
+        (d / name).write_bytes(b"RIFF")
+    return d
+
+
+def test_same_input_maps_to_same_workspace(monkeypatch, tmp_path):
+    _chunks(monkeypatch, tmp_path, ["chunk_1.wav", "chunk_2.wav"])
+    first = main._pipeline_workspace("c1", {}, "job-a")
+    assert os.path.basename(first).startswith("input-")
+    assert main._pipeline_workspace("c1", {"meeting_id": ""}, "job-b") == first
+
+
+def test_changed_input_maps_to_new_workspace(monkeypatch, tmp_path):
+    d = _chunks(monkeypatch, tmp_path, ["chunk_1.wav"])
+    first = main._pipeline_workspace("c1", {})
+    (d / "chunk_2.wav").write_bytes(b"RIFF")
+    assert main._pipeline_workspace("c1", {}) != first
+
+
+def test_meeting_id_and_missing_input(monkeypatch, tmp_path):
+    _chunks(monkeypatch, tmp_path, ["chunk_1.wav"])
+    assert main._pipeline_workspace("c1", {"meeting_id": 42}).endswith(os.path.join("c1", "meeting-42"))
+    assert os.path.basename(main._pipeline_workspace("empty", {}, "abc")) == "job-abc"